@@ -2,9 +2,15 @@
 from lockin7270_controller import InstrumentLockin7270
 from keithley_drivers import Keithley6221_ACSource, Keithley2400_DCSource,Keithley6221_DCSource
 from lakeshore_controller import LakeshoreController
+import async_drivers
+import visa_pool
 
 class InstrumentManager:
-    def __init__(self):
+    def __init__(self, pool=None, event_loop=None):
+        # 所有 VISA 仪器共用一个资源池，断线后只需重开对应会话
+        self.pool = pool or visa_pool.pool
+        # 所有仪器由一个事件循环驱动 (每台仪器一把锁)，这里保存的是接口不变的同步外观
+        self.loop = event_loop or async_drivers.loop
         # 保持原有的变量名，以兼容 MeasurementThread
         self.inst1 = None  # Thermometer 1 Lock-in
         self.inst2 = None  # Thermometer 2 Lock-in
@@ -20,26 +26,28 @@ class InstrumentManager:
         注意：参数既可以是 IP，也可以是 VISA 地址 (如 GPIB0::12::INSTR)
         """
         print(f"Connecting instruments for mode '{mode}'...")
-        
+        # 已连接的仪器先做存活检查，失效的会话重开 (Lakeshore 则在下面重新创建)
+        self.check_instruments()
+
         # 1. 连接锁相放大器 (7270)
         if not self.inst1 and inst1_ip:
-            self.inst1 = InstrumentLockin7270(inst1_ip)
+            self.inst1 = self._open(InstrumentLockin7270, inst1_ip, pool=self.pool)
         if not self.inst2 and inst2_ip:
-            self.inst2 = InstrumentLockin7270(inst2_ip)
+            self.inst2 = self._open(InstrumentLockin7270, inst2_ip, pool=self.pool)
             
         # 2. 连接加热器 (Lakeshore)
         if not self.my_instrument_current and heater_addr:
             print("Connecting Lakeshore controller as heater...")
-            self.my_instrument_current = LakeshoreController(ip_address=heater_addr)
+            self.my_instrument_current = self._open(LakeshoreController, ip_address=heater_addr)
 
         # 3. 只有在 fig1 (Fig.1e/1f) 模式下才连接并设置直流源
         if mode == 'fig1':
             if not self.dc_source1 and dc1_addr:
                 print(f"Connecting DC Source 1 (K6221) to {dc1_addr}...")
-                self.dc_source1 = Keithley6221_DCSource(dc1_addr)
+                self.dc_source1 = self._open(Keithley6221_DCSource, dc1_addr, pool=self.pool)
             if not self.dc_source2 and dc2_addr:
                 print(f"Connecting DC Source 2 (K6221) to {dc2_addr}...")
-                self.dc_source2 = Keithley6221_DCSource(dc2_addr)
+                self.dc_source2 = self._open(Keithley6221_DCSource, dc2_addr, pool=self.pool)
             print("Fig.1 mode instruments connected (including DC sources).")
         else:
             print("Fig.2 mode: skipping DC source connection (not required).")
@@ -52,7 +60,51 @@ class InstrumentManager:
 
         print("Instruments connected.")
 
-    # ... (类定义和 connect_instruments 方法) ...
+    def _open(self, driver_class, *args, **kwargs):
+        """在共享事件循环上连接仪器，返回接口与驱动相同的同步外观。"""
+        return async_drivers.open_instrument(driver_class, *args, event_loop=self.loop, **kwargs)
+
+    def close(self):
+        """停止驱动仪器的事件循环 (程序退出时调用)。"""
+        self.loop.stop()
+
+    def set_visa_backend(self, backend=None):
+        """
+        选择 VISA 后端 ('default' / 'py' / 'sim' 或 pyvisa 后端字符串，None 时读取 VISA_BACKEND)。
+        后端变化时资源池关闭全部会话，已创建的 VISA 仪器随之丢弃，下次 connect_instruments 重新连接。
+        """
+        if self.pool.resolve_backend(backend) == self.pool.backend:
+            return
+        print(f"Switching VISA backend to '{backend}'")
+        self.pool.configure(backend)
+        self.inst1 = self.inst2 = None
+        self.dc_source1 = self.dc_source2 = None
+
+    def check_instruments(self):
+        """
+        检查已连接仪器是否仍可通信：VISA 会话由资源池检查并在失效时重开；
+        Lakeshore 不经过 VISA，查询失败时丢弃，下次 connect_instruments 重新创建。
+
+        返回:
+            dict: 仪器名 -> 是否可用。
+        """
+        status = {}
+        sessions = self.pool.check_all()
+        for name in ('inst1', 'inst2', 'dc_source1', 'dc_source2'):
+            inst = getattr(self, name)
+            session = getattr(inst, 'inst', None)
+            if session is not None:
+                status[name] = sessions.get(session.address, False)
+        if self.my_instrument_current is not None:
+            try:
+                self.my_instrument_current.wait_complete()
+                status['my_instrument_current'] = True
+            except Exception as e:
+                print(f"Lakeshore not responding, will reconnect: {e}")
+                self.my_instrument_current = None
+                status['my_instrument_current'] = False
+        return status
+
 
     def setup_dc_sources(self, current_val=10e-6,harm1=2, harm2=4):
         """配置并开启所有直流源，并设置锁相放大器默认为 2f和4f 模式。"""
@@ -6,21 +6,42 @@ from measurement_data_logger import DataLogger
 from MeasurementGUI import MeasurementGUI
 from MeasurementThread import MeasurementThread
 from InstrumentManager import InstrumentManager
-from MultiPyVu import MultiVuClient as mvc
+from ppms_session import PPMSSession
+from ppms_telemetry import PPMSTelemetry
+from temperature_stabilizer import TemperatureStabilizer
+from measurement_plan import MeasurementPlan
+from run_journal import RunJournal
 
 class MeasurementApp:
     def __init__(self):
         self.app = QApplication(sys.argv)
-        self.data_logger = DataLogger()
+        # One PPMS connection shared by the GUI, the data logger and the measurement thread
+        self.ppms_session = PPMSSession()
+        self.data_logger = DataLogger(self.ppms_session)
+        self.telemetry = PPMSTelemetry(self.ppms_session)
+        self.data_logger.set_telemetry(self.telemetry)
         self.data_logger.init_plot()
 
         # Asserting that the data_logger has a 'fig' attribute.
         assert hasattr(self.data_logger, 'fig'), "DataLogger does not have the 'fig' attribute!"
         # Use a compatibility wrapper that accepts a `config` dict from the refactored GUI.
-        self.gui = MeasurementGUI(self.start_measurement_from_config, self.stop_program, self.data_logger, self.set_temperature)
+        self.gui = MeasurementGUI(self.start_measurement_from_config, self.stop_program, self.data_logger, self.set_temperature,
+                                  ppms_session=self.ppms_session, telemetry=self.telemetry)
         #self.measurement_thread = MeasurementThread()
         self.instrument_manager = InstrumentManager()
         self.measurement_thread=None
+        # "Set Temperature" waits for stability on this worker, not on the GUI thread
+        self.stabilizer = TemperatureStabilizer(self.ppms_session, self.telemetry)
+        self.stabilizer.progress.connect(self.gui.update_stability_progress)
+        self.stabilizer.stabilized.connect(self.gui.temperature_stabilized)
+        self.stabilizer.failed.connect(self.gui.temperature_failed)
+
+        # Start background T/F sampling against the PPMS address shown in the GUI
+        try:
+            self.ppms_session.configure(self.gui.ppms_host.text().strip(), int(self.gui.ppms_port.text().strip()))
+        except ValueError as e:
+            print(f"Invalid PPMS address: {e}")
+        self.telemetry.start()
 
     def _generate_amplitude_intervals(self, initial1, final1, step1, initial2, final2, step2, initial3, final3, step3,
                                       initial4, final4, step4):
@@ -124,29 +145,9 @@ class MeasurementApp:
         timeout_min = ppms_config["timeout_min"]
 
         try:
-            with mvc.MultiVuClient(host, port) as client:
-                print(f"Setting temperature to {target_T} K at rate {rate} K/min")
-                client.set_temperature(target_T, rate, client.temperature.approach_mode.no_overshoot)
-                # Wait for stability (simple implementation)
-                import time
-                timeout = timeout_min * 60
-                start_time = time.time()
-                while time.time() - start_time < timeout:
-                    T, sT = client.get_temperature()
-                    if abs(T - target_T) < tol:
-                        stable_count = 0
-                        for _ in range(int(stable_sec)):
-                            time.sleep(1)
-                            T, sT = client.get_temperature()
-                            if abs(T - target_T) < tol:
-                                stable_count += 1
-                            else:
-                                stable_count = 0
-                            if stable_count >= stable_sec:
-                                print(f"Temperature stabilized at {T} K")
-                                return
-                    time.sleep(1)
-                print("Temperature setting timeout")
+            self.ppms_session.configure(host, port)
+            # Returns immediately; progress/ETA and the result arrive through the stabilizer's signals
+            self.stabilizer.stabilize(target_T, rate, tol, stable_sec, timeout_min)
         except Exception as e:
             print(f"Error setting temperature: {e}")
 
@@ -154,7 +155,18 @@ class MeasurementApp:
         """Compatibility wrapper: starts a measurement using `config` dict from the refactored GUI.
 
         This maps the new GUI's config structure into the legacy measurement flow.
+        With data.resume_journal set, the journal's recorded config is used instead and the run continues.
         """
+        resume = None
+        resume_path = config["data"].get("resume_journal")
+        if resume_path:
+            try:
+                resume = RunJournal.load(resume_path)
+            except Exception as e:
+                print(f"Error loading run journal {resume_path}: {e}")
+                return
+            print(f"Resuming {resume['run_file']} ({resume['points']} completed steps)")
+            config = resume["config"] or config
         host = config["ppms"]["host"]
         port = config["ppms"]["port"]
         inst1_ip = config["lockins"]["lock1_ip"]
@@ -176,6 +188,11 @@ class MeasurementApp:
         # Save directory (GUI overrides config if filled)
         save_directory = self.gui.folder_input.text() or config["data"].get("save_folder", ".")
         self.data_logger.set_save_directory(save_directory)
+        self.data_logger.set_burst_mode(config["data"].get("burst_points", 0),
+                                        config["data"].get("burst_interval_ms", 20))
+        self.data_logger.set_binary_output(config["data"].get("binary", False), run_config=config)
+        if resume is not None:
+            self.data_logger.resume_run(resume)
 
         # Try to update GUI amplitude list (compat API)
         try:
@@ -183,16 +200,51 @@ class MeasurementApp:
         except Exception:
             pass
 
-        # Connect instruments and setup DC sources depending on mode
-        mode_key = config.get("mode_key", "fig1")
-        self.instrument_manager.connect_instruments(inst1_ip, inst2_ip, heater_addr, dc1_addr, dc2_addr, mode=mode_key, harm1=harm1, harm2=harm2)
+        # A plan file replaces the single sweep with its ordered steps
+        plan = None
+        plan_file = config["data"].get("plan_file")
+        if plan_file:
+            try:
+                plan = MeasurementPlan.load(plan_file)
+                print(f"Loaded plan with {len(plan)} steps from {plan_file}")
+            except Exception as e:
+                print(f"Error loading plan {plan_file}: {e}")
+                return
 
-        if mode_key == 'fig1':
-            current_dc_val = config["sources"].get("idc1", 1e-6)
-            self.instrument_manager.setup_dc_sources(current_val=current_dc_val)
-        else:
-            # Fig.2 modes do not use DC sources
-            current_dc_val = 0.0
+        # Connect instruments and setup DC sources depending on mode:
+        # Fig.1e/1f and R-T probe the thermometers with the DC sources, Fig.2 does not
+        mode_key = 'fig2' if config.get("mode", {}).get("mode_key") == 'fig2' else 'fig1'
+        # Probe current for the DC modes (the GUI zeroes the Idc fields in Fig.2)
+        dc_current = config["sources"].get("idc1") or 1e-6
+        # A plan that switches to a DC mode later needs the DC sources connected now
+        plan_needs_dc = plan is not None and any(
+            step.kind == 'mode' and step.params['mode_key'] in ('fig1ef', 'rt') for step in plan)
+        # A source that fails to connect or reports a configuration error stops the run here
+        try:
+            self.instrument_manager.set_visa_backend(config["lockins"].get("visa_backend"))
+            self.instrument_manager.connect_instruments(inst1_ip, inst2_ip, heater_addr, dc1_addr, dc2_addr,
+                                                        mode='fig1' if plan_needs_dc else mode_key, harm1=harm1, harm2=harm2)
+
+            if mode_key == 'fig1':
+                current_dc_val = dc_current
+                self.instrument_manager.setup_dc_sources(current_val=current_dc_val, harm1=harm1, harm2=harm2)
+            else:
+                # Fig.2 modes do not use DC sources
+                current_dc_val = 0.0
+        except Exception as e:
+            print(f"Instrument setup failed, measurement not started: {e}")
+            return
+
+        # 1f for R-T: detect 1f and the sweep harmonic together instead of switching at every point.
+        # Done last, since setting a single harmonic (connect/setup above) leaves dual mode.
+        inst1 = self.instrument_manager.inst1
+        if self.data_logger.use_1f_for_rt and inst1 is not None:
+            inst1.set_dual_harmonic(1, harm1 if harm1 != 1 else 2)
+
+        # Continuous R-T ramp replaces the step-and-wait temperature plan in R-T mode
+        rt_ramp_end = None
+        if config.get("mode", {}).get("mode_key") == "rt" and config["ppms"].get("rt_ramp", False):
+            rt_ramp_end = config["ppms"]["rt_ramp_end"]
 
         # Temperature plan
         temp_list = []
@@ -214,16 +266,33 @@ class MeasurementApp:
             temp_list,
             rate,
             current_dc_val,
-            frequency
+            frequency,
+            adaptive_settle=config["data"].get("adaptive_settle", False),
+            settle_tol=config["data"].get("settle_tol", 0.01),
+            settle_interval=config["data"].get("settle_interval", 2.0),
+            rt_ramp_end=rt_ramp_end,
+            rt_interval=config["ppms"].get("rt_interval", 1.0),
+            rt_tol=config["ppms"].get("rt_tol", 0.1),
+            stable_tol=config["ppms"].get("tol", 0.02),
+            stable_sec=config["ppms"].get("stable_sec", 60),
+            stable_timeout_min=config["ppms"].get("timeout_min", 30),
+            plan=plan,
+            resume=resume,
+            dc_sources=(self.instrument_manager.dc_source1, self.instrument_manager.dc_source2),
+            dc_current=dc_current,
         )
         self.measurement_thread.measurementDone.connect(self.handle_measurement_done)
         self.measurement_thread.updatePlotSignal.connect(self.gui.refresh_plot)
+        self.measurement_thread.stabilityProgress.connect(self.gui.update_stability_progress)
+        self.measurement_thread.planProgress.connect(self.gui.update_plan_progress)
+        self.measurement_thread.modeRequested.connect(self.gui.select_mode)
         self.data_logger.updateTemperatureAmplitude.connect(self.gui.update_temperature_amplitude)
         self.measurement_thread.start()
 
     def stop_program(self, event=None):
         if self.measurement_thread:
             self.measurement_thread.stop_requested=True
+        self.stabilizer.cancel()
         self.gui.turn_off_indicator()
         self.gui.refresh_plot()
 
@@ -232,5 +301,12 @@ class MeasurementApp:
 
     def run(self):
         self.gui.show()
-        sys.exit(self.app.exec_())
+        exit_code = self.app.exec_()
+        self.stabilizer.cancel()
+        self.stabilizer.wait(2000)
+        self.telemetry.stop(timeout=2)
+        self.data_logger.shutdown()
+        self.instrument_manager.close()
+        self.ppms_session.close()
+        sys.exit(exit_code)
 
@@ -1,4 +1,5 @@
 
+import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel, QGroupBox,
     QFileDialog, QComboBox, QCheckBox, QListWidget, QMessageBox, QTabWidget, QFormLayout
@@ -8,7 +9,8 @@ from PyQt5.QtCore import pyqtSlot, QTimer
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import numpy as np
-from MultiPyVu import MultiVuClient as mvc
+from ppms_session import PPMSSession
+from live_plot import BlitPlotRenderer
 
 
 class MeasurementGUIRefactored(QWidget):
@@ -25,13 +27,17 @@ class MeasurementGUIRefactored(QWidget):
       - stop_callback()
     """
 
-    def __init__(self, start_callback, stop_callback, data_logger, set_temp_callback=None):
+    def __init__(self, start_callback, stop_callback, data_logger, set_temp_callback=None, ppms_session=None,
+                 telemetry=None):
         super().__init__()
 
         self.start_callback = start_callback
         self.stop_callback = stop_callback
         self.set_temp_callback = set_temp_callback
         self.data_logger = data_logger
+        self.ppms_session = ppms_session or PPMSSession()
+        self.telemetry = telemetry  # PPMSTelemetry; the status box only reads its cached samples
+        self.run_active = False  # set while a measurement runs (indicator on)
     
         # Defaults (kept from your current GUI)
         self.DEFAULT_PPMS_HOST = "10.16.28.160"
@@ -52,7 +58,7 @@ class MeasurementGUIRefactored(QWidget):
         # Start temperature update timer
         self.temp_timer = QTimer(self)
         self.temp_timer.timeout.connect(self._update_ppms_temp)
-        self.temp_timer.start(5000)  # Update every 5 seconds
+        self.temp_timer.start(1000)  # Cheap: only reads the telemetry cache
     # ---------------- UI ----------------
     def _build_ui(self):
         main_layout = QHBoxLayout(self)
@@ -69,6 +75,8 @@ class MeasurementGUIRefactored(QWidget):
         right = QVBoxLayout()
         self.canvas = FigureCanvas(self.data_logger.fig)
         self.toolbar = NavigationToolbar(self.canvas, self)
+        # Appends new points by blitting; full redraw only when data leaves the axis limits
+        self.plot_renderer = BlitPlotRenderer(self.canvas, self.data_logger)
         right.addWidget(self.toolbar)
         right.addWidget(self.canvas)
         main_layout.addLayout(right, 4)
@@ -91,10 +99,12 @@ class MeasurementGUIRefactored(QWidget):
         self.status_line = QLabel("Idle", self)
         self.temp_line = QLabel("T: -- K", self)
         self.ih_line = QLabel("Ih: -- A", self)
+        self.io_line = QLabel("Writer: --", self)
 
         layout.addWidget(self.status_line)
         layout.addWidget(self.temp_line)
         layout.addWidget(self.ih_line)
+        layout.addWidget(self.io_line)
 
         box.setLayout(layout)
         parent_layout.addWidget(box)
@@ -137,6 +147,9 @@ class MeasurementGUIRefactored(QWidget):
         self.ppms_port = QLineEdit(self.DEFAULT_PPMS_PORT, self)
         form.addRow("PPMS Host:", self.ppms_host)
         form.addRow("PPMS Port:", self.ppms_port)
+        # The shared session is reconfigured only when an edit is finished, never by the status timer
+        self.ppms_host.editingFinished.connect(self._on_ppms_address_changed)
+        self.ppms_port.editingFinished.connect(self._on_ppms_address_changed)
 
         self.ppms_enable = QCheckBox("Control temperature before measurement", self)
         self.ppms_enable.setChecked(True)
@@ -147,6 +160,10 @@ class MeasurementGUIRefactored(QWidget):
         form.addRow("Target T (K):", self.ppms_target_T)
         form.addRow("Rate (K/min):", self.ppms_rate)
 
+        self.ppms_poll = QLineEdit("0.5", self)
+        self.ppms_poll.editingFinished.connect(self._on_poll_interval_changed)
+        form.addRow("Telemetry interval (s):", self.ppms_poll)
+
         # "Advanced but useful"
         self.ppms_tol = QLineEdit("0.02", self)      # K
         self.ppms_stable_sec = QLineEdit("60", self) # seconds
@@ -155,6 +172,15 @@ class MeasurementGUIRefactored(QWidget):
         form.addRow("Stable for (s):", self.ppms_stable_sec)
         form.addRow("Timeout (min):", self.ppms_timeout_min)
 
+        # R-T mode only: sample continuously during one ramp instead of step-and-wait
+        self.rt_ramp_enable = QCheckBox("Continuous R-T ramp (R-T mode)", self)
+        self.rt_ramp_enable.setChecked(False)
+        form.addRow(self.rt_ramp_enable)
+        self.rt_ramp_end = QLineEdit("300", self)
+        self.rt_interval = QLineEdit("1", self)
+        form.addRow("Ramp end T (K):", self.rt_ramp_end)
+        form.addRow("R-T sample interval (s):", self.rt_interval)
+
         self.set_temp_btn = QPushButton("Set Temperature", self)
         self.set_temp_btn.clicked.connect(self._on_set_temperature)
         form.addRow(self.set_temp_btn)
@@ -177,6 +203,12 @@ class MeasurementGUIRefactored(QWidget):
         for cb in (self.lock1_harm, self.lock2_harm):
             cb.addItems([str(i) for i in range(1, 9)])
 
+        # VISA backend shared by the lock-ins and the Keithley sources (editable: a pyvisa backend string also works)
+        self.visa_backend = QComboBox(self)
+        self.visa_backend.setEditable(True)
+        self.visa_backend.addItems(["default", "py", "sim"])
+        self.visa_backend.setCurrentText(os.environ.get("VISA_BACKEND", "default"))
+
         lock_form.addRow("Lock-in 1 IP:", self.lock1_ip)
         lock_form.addRow("Lock-in 1 harmonic:", self.lock1_harm)
         lock_form.addRow("Lock-in 2 IP:", self.lock2_ip)
@@ -189,6 +221,7 @@ class MeasurementGUIRefactored(QWidget):
         self.lock_auto_sen = QCheckBox("Auto sensitivity", self)
         self.lock_auto_sen.setChecked(True)
         lock_form.addRow(self.lock_auto_sen)
+        lock_form.addRow("VISA backend:", self.visa_backend)
 
         # DC sources (K6221)
         # 存为 self.dc_box 以便在模式切换时显示/隐藏
@@ -269,7 +302,27 @@ class MeasurementGUIRefactored(QWidget):
         form = QFormLayout(w)
 
         self.wait_time = QLineEdit("70", self)
-        form.addRow("Wait time per point (s):", self.wait_time)
+        form.addRow("Max wait per point (s):", self.wait_time)
+
+        # Adaptive settle: poll the lock-ins and move on once the signal stops changing;
+        # the wait time above is then only the maximum
+        self.settle_enable = QCheckBox("Adaptive settle (wait time = max)", self)
+        self.settle_enable.setChecked(False)
+        form.addRow(self.settle_enable)
+        self.settle_tol = QLineEdit("0.01", self)
+        self.settle_interval = QLineEdit("2", self)
+        form.addRow("Settle tolerance (rel.):", self.settle_tol)
+        form.addRow("Settle poll interval (s):", self.settle_interval)
+
+        # Curve-buffer burst: many averaged samples per point in one transfer
+        self.burst_points = QLineEdit("0", self)
+        self.burst_interval = QLineEdit("20", self)
+        form.addRow("Burst samples/point (0 = off):", self.burst_points)
+        form.addRow("Burst interval (ms):", self.burst_interval)
+
+        self.binary_enable = QCheckBox("Also write binary run (.json + .f64 chunks)", self)
+        self.binary_enable.setChecked(False)
+        form.addRow(self.binary_enable)
 
         self.r0_enable = QCheckBox("Use R0 inputs to compute ΔR/R (Fig.1e)", self)
         self.r0_enable.setChecked(False)
@@ -292,6 +345,28 @@ class MeasurementGUIRefactored(QWidget):
         wrap.setLayout(row)
         form.addRow("Save folder:", wrap)
 
+        # Optional measurement plan (JSON list of steps); overrides the single sweep when set
+        plan_row = QHBoxLayout()
+        self.plan_input = QLineEdit(self)
+        self.plan_browse_btn = QPushButton("Browse", self)
+        self.plan_browse_btn.clicked.connect(self._browse_plan)
+        plan_row.addWidget(self.plan_input)
+        plan_row.addWidget(self.plan_browse_btn)
+        plan_wrap = QWidget(self)
+        plan_wrap.setLayout(plan_row)
+        form.addRow("Plan file (optional):", plan_wrap)
+
+        # Resume an interrupted run from its journal (<run file>.journal)
+        resume_row = QHBoxLayout()
+        self.resume_input = QLineEdit(self)
+        self.resume_browse_btn = QPushButton("Browse", self)
+        self.resume_browse_btn.clicked.connect(self._browse_journal)
+        resume_row.addWidget(self.resume_input)
+        resume_row.addWidget(self.resume_browse_btn)
+        resume_wrap = QWidget(self)
+        resume_wrap.setLayout(resume_row)
+        form.addRow("Resume journal (optional):", resume_wrap)
+
         return w
 
     def _init_run_controls(self, parent_layout):
@@ -358,6 +433,9 @@ class MeasurementGUIRefactored(QWidget):
             if hasattr(self, 'data_logger'):
                 self.data_logger.set_use_1f_for_rt(use_1f)
                 self.data_logger.set_mode(mode_key)
+            if hasattr(self, 'plot_renderer'):
+                # New axes are shown: rescale them to the data on the next refresh
+                self.plot_renderer.invalidate()
         except Exception as e:
             print(f"Error switching mode on data logger: {e}")
 
@@ -380,6 +458,16 @@ class MeasurementGUIRefactored(QWidget):
         if folder_path:
             self.folder_input.setText(folder_path)
 
+    def _browse_plan(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Plan", "", "Plan (*.json)")
+        if path:
+            self.plan_input.setText(path)
+
+    def _browse_journal(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Run Journal", "", "Run journal (*.journal)")
+        if path:
+            self.resume_input.setText(path)
+
     def _on_set_temperature(self):
         try:
             ppms_config = {
@@ -416,18 +504,44 @@ class MeasurementGUIRefactored(QWidget):
 
         self.turn_on_indicator()
         self.status_line.setText("Running...")
+        # Start the run's plot from fresh limits rather than the previous run's
+        self.plot_renderer.invalidate()
         self.start_callback(config)
 
     def _update_ppms_temp(self):
+        # Read-only: the telemetry cache, never the session itself
         try:
-            host = self.ppms_host.text().strip()
-            port = int(self.ppms_port.text().strip())
-            with mvc.MultiVuClient(host, port) as client:
-                T, sT = client.get_temperature()
-                self.temp_line.setText(f"T: {T:.2f} K")
+            sample = self.telemetry.latest() if self.telemetry is not None else None
+            if sample is None:
+                self.temp_line.setText("T: -- K")
+                return
+            t, T, sT, F, sF = sample
+            self.temp_line.setText(f"T: {T:.2f} K ({self.telemetry.status_name(sT)})")
         except Exception as e:
             self.temp_line.setText("T: -- K")
 
+    def _on_ppms_address_changed(self):
+        """Point the shared PPMS session at the edited address (not while a measurement is running)."""
+        try:
+            host = self.ppms_host.text().strip()
+            port = int(self.ppms_port.text().strip())
+        except ValueError:
+            return
+        if (host, port) == (self.ppms_session.host, self.ppms_session.port):
+            return
+        if self.run_active:
+            print("PPMS address edited during a run; it applies from the next run")
+            return
+        self.ppms_session.configure(host, port)
+
+    def _on_poll_interval_changed(self):
+        try:
+            interval = float(self.ppms_poll.text().strip())
+        except ValueError:
+            return
+        if self.telemetry is not None and interval > 0:
+            self.telemetry.interval = interval
+
     # ---------------- helpers ----------------
     def _collect_config(self) -> dict:
         # PPMS
@@ -440,6 +554,9 @@ class MeasurementGUIRefactored(QWidget):
             "tol": float(self.ppms_tol.text().strip()),
             "stable_sec": float(self.ppms_stable_sec.text().strip()),
             "timeout_min": float(self.ppms_timeout_min.text().strip()),
+            "rt_ramp": self.rt_ramp_enable.isChecked(),
+            "rt_ramp_end": float(self.rt_ramp_end.text().strip()),
+            "rt_interval": float(self.rt_interval.text().strip()),
         }
 
         lockins = {
@@ -449,6 +566,7 @@ class MeasurementGUIRefactored(QWidget):
             "lock2_harm": int(self.lock2_harm.currentText()),
             "apply_phase_preset": self.lock_phase_preset.isChecked(),
             "auto_sensitivity": self.lock_auto_sen.isChecked(),
+            "visa_backend": self.visa_backend.currentText().strip(),
         }
 
         sources = {
@@ -467,7 +585,15 @@ class MeasurementGUIRefactored(QWidget):
 
         data = {
             "wait_time": float(self.wait_time.text().strip()),
+            "adaptive_settle": self.settle_enable.isChecked(),
+            "settle_tol": float(self.settle_tol.text().strip()),
+            "settle_interval": float(self.settle_interval.text().strip()),
+            "burst_points": int(float(self.burst_points.text().strip())),
+            "burst_interval_ms": int(float(self.burst_interval.text().strip())),
+            "binary": self.binary_enable.isChecked(),
             "save_folder": self.folder_input.text().strip(),
+            "plan_file": self.plan_input.text().strip(),
+            "resume_journal": self.resume_input.text().strip(),
             "use_r0": self.r0_enable.isChecked(),
             "r0_1": float(self.r0_1.text().strip()) if self.r0_enable.isChecked() and self.r0_1.text().strip() else None,
             "r0_2": float(self.r0_2.text().strip()) if self.r0_enable.isChecked() and self.r0_2.text().strip() else None,
@@ -539,22 +665,51 @@ class MeasurementGUIRefactored(QWidget):
         return pixmap
 
     def turn_on_indicator(self):
+        self.run_active = True
         self.indicator_light.setPixmap(self._indicator_pixmap(QColor("green")))
 
     def turn_off_indicator(self):
+        self.run_active = False
         self.indicator_light.setPixmap(self._indicator_pixmap(QColor("red")))
 
     # ---------------- external updates ----------------
     def refresh_plot(self):
         # Called in the GUI thread via signal from the worker thread.
-        # Let the data logger recompute line data and autoscale, then draw once.
+        # The renderer blits only the new points and redraws fully only when needed.
         try:
-            if hasattr(self, 'data_logger') and hasattr(self.data_logger, 'plot_data'):
-                self.data_logger.plot_data()
+            self.plot_renderer.refresh()
         except Exception as e:
             print(f"Error in refresh_plot: {e}")
-        # Draw the canvas in the GUI thread only
-        self.canvas.draw()
+        self.update_writer_status()
+
+    def update_writer_status(self):
+        try:
+            stats = self.data_logger.writer_stats()
+        except Exception:
+            return
+        last = stats['last_latency']
+        last_text = f"{last * 1000:.1f} ms" if last is not None else "--"
+        self.io_line.setText(f"Writer: queue {stats['depth']} (max {stats['max_depth']}), "
+                             f"last write {last_text}, mean {stats['mean_latency'] * 1000:.1f} ms")
+
+    def select_mode(self, mode_key):
+        """Switch the mode combo (and thereby the DataLogger plot mode) by DataLogger mode key."""
+        texts = {"fig1ef": "Fig.1e/1f", "rt": "R-T", "fig2": "Fig.2a/2b"}
+        if mode_key in texts:
+            self.mode_combo.setCurrentText(texts[mode_key])
+
+    def update_plan_progress(self, step, total, description):
+        self.status_line.setText(f"Plan step {step}/{total}: {description}")
+
+    def update_stability_progress(self, progress, eta, temperature):
+        eta_text = f"{eta:.0f} s" if eta >= 0 else "--"
+        self.status_line.setText(f"Stabilizing: T = {temperature:.3f} K, {progress * 100:.0f}% stable, ETA {eta_text}")
+
+    def temperature_stabilized(self, target):
+        self.status_line.setText(f"Temperature stable at {target} K")
+
+    def temperature_failed(self, message):
+        self.status_line.setText(f"Temperature: {message}")
 
     def update_temperature_display(self, temperature):
         self.temp_line.setText(f"T: {temperature} K")
@@ -1,13 +1,35 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
-from MultiPyVu import MultiVuClient as mvc
+from lockin7270_controller import SensitivityPredictor
+from temperature_stabilizer import StabilityCriterion, wait_until_stable, temperature_reader
+from run_journal import RunJournal
+from measurement_plan import MeasurementPlan
 
 class MeasurementThread(QThread):
     measurementDone = pyqtSignal()  # Signal to notify when measurement is complete
     updatePlotSignal = pyqtSignal()  # New signal, used to request graphical updates
+    stabilityProgress = pyqtSignal(float, float, float)  # progress 0~1, ETA (s, -1 = unknown), T (K)
+    planProgress = pyqtSignal(int, int, str)  # step number, total steps, description
+    modeRequested = pyqtSignal(str)  # DataLogger mode key for the GUI to switch to
+    # Waits in the gain ritual, in multiples of the lock-ins' filter settling time
+    ACGAIN_SETTLE = 1.0
+    FINAL_SETTLE = 3.0
+    POINT_SETTLE = 5.0  # wait after each amplitude step; wait_time caps it
+    SEN_ATTEMPTS = 26  # search-loop budget when a demodulator is found out of range
+    SETTLE_FLOOR = 1e-9  # V, settle-test floor when a reading's full scale is unknown
+    # Continuous R-T ramp: timeout = RT_RAMP_MARGIN x the nominal ramp time (span / rate) + RT_RAMP_GRACE
+    RT_RAMP_MARGIN = 1.5
+    RT_RAMP_GRACE = 600.0  # s
+    RT_STATUS_BAND = 1.0  # K, the PPMS reporting Stable/Near at the end setpoint ends the ramp within this band
 
     def __init__(self, gui, data_logger, host, port, inst1,
-                 inst2, my_instrument_current,amplitude_values,wait_time,temperature_changing,temp_list,rate,current_dc_val,frequency=17.777):
+                 inst2, my_instrument_current,amplitude_values,wait_time,temperature_changing,temp_list,rate,current_dc_val,frequency=17.777,
+                 ppms_session=None, adaptive_settle=False, settle_tol=0.01, settle_interval=2.0, settle_window=5,
+                 predictive_sensitivity=True, rt_ramp_end=None, rt_interval=1.0, rt_tol=0.1,
+                 stable_tol=0.02, stable_sec=60, stable_timeout_min=30, plan=None, resume=None,
+                 dc_sources=(), dc_current=1e-6):
         super().__init__()
         self.gui = gui
         self.data_logger = data_logger
@@ -27,87 +49,484 @@ class MeasurementThread(QThread):
         self.temp_list = temp_list
         self.rate = rate
         self.frequency = frequency
+        # Reuse the data logger's PPMS connection instead of opening one per temperature
+        self.ppms_session = ppms_session or data_logger.ppms_session
+        # wait_time is the upper bound of the per-point wait (POINT_SETTLE settling times,
+        # or the adaptive settle when enabled)
+        self.adaptive_settle = adaptive_settle
+        self.settle_tol = settle_tol
+        self.settle_interval = settle_interval
+        self.settle_window = settle_window
+        self.settle_time = None  # effective settling time of both lock-ins (s), read at run start
+        self.settle_unknown = False  # TC/slope could not be read: waits fall back to wait_time
+        # Predictive SEN: choose each demodulator's range from V ∝ I^n before stepping the current
+        self.predictive_sensitivity = predictive_sensitivity
+        self.sen_predictors = []  # [(inst, demod, SensitivityPredictor), ...]
+        # Continuous R-T: ramp to rt_ramp_end at `rate` and sample every rt_interval s (None = step mode)
+        self.rt_ramp_end = rt_ramp_end
+        self.rt_interval = rt_interval
+        self.rt_tol = rt_tol
+        # Temperature stability (PPMS tab): start sweeping as soon as T is stable instead of a fixed wait
+        self.stable_tol = stable_tol
+        self.stable_sec = stable_sec
+        self.stable_timeout_min = stable_timeout_min
+        # Optional MeasurementPlan; when given, run() executes its steps instead of a single sweep
+        self.plan = plan
+        # Checkpointing: every completed (T setpoint, amplitude) step goes to the run journal;
+        # `resume` is RunJournal.load() output whose completed steps are skipped
+        self.resume = resume
+        self.completed = set(resume['done']) if resume else set()
+        self.current_setpoint = None
+        self.setpoint_unstable = False  # last wait_stable timed out; the plan skips this setpoint's sweeps
+        # Thermometer DC sources and their current, (re)configured by plan 'mode' steps
+        self.dc_sources = [source for source in dc_sources if source is not None]
+        self.dc_current = dc_current
     
     def _measure_for_amplitude(self, amplitude):
+        """Step to `amplitude` and wait; returns False (and stops the run) when the heater source fails."""
         try:
             print("begin")
-            self.my_instrument_current.output_sine_current(amplitude, self.frequency)
-            time.sleep(5)
-            self.my_instrument_current.enable_output()
-            time.sleep(self.wait_time)  # Reduced sleep time for better responsiveness
+            if self.predictive_sensitivity:
+                self._preset_sensitivity(amplitude)
+            try:
+                self._apply_amplitude(amplitude)
+            except Exception as e:
+                print(f"Heater source error at amplitude {amplitude}, stopping the run: {e}")
+                self.stop_requested = True
+                return False
+            if self.adaptive_settle:
+                self._wait_settled()
+            else:
+                # Wait a fixed number of filter settling times, capped at wait_time
+                time.sleep(min(self._settle(self.POINT_SETTLE), self.wait_time))
+            self._manage_gain(amplitude)
         except Exception as e:
             print(f"Error during measurement for amplitude {amplitude}: {e}")
+        return True
 
-    def _update_data(self, count,amplitude):
+    def _apply_amplitude(self, amplitude):
+        """Step the heater current; while the sine is already running only its amplitude is changed."""
+        source = self.my_instrument_current
+        if getattr(source, 'output_enabled', False) and getattr(source, 'frequency', None) == self.frequency:
+            source.set_amplitude(amplitude)
+        else:
+            source.output_sine_current(amplitude, self.frequency)
+            source.enable_output()
+
+    def _init_sensitivity_predictors(self):
+        """One predictor per lock-in demodulator; the exponent is the detected harmonic (2ω ∝ I², 4ω ∝ I⁴)."""
+        self.sen_predictors = []
+        for inst in (self.inst1, self.inst2):
+            try:
+                if inst.harmonic is None:
+                    inst.query_harmonic()
+            except Exception as e:
+                print(f"Error reading harmonic, assuming 2ω: {e}")
+            for demod in (1, 2):
+                harmonic = inst.demod_harmonic(demod) or 2
+                self.sen_predictors.append((inst, demod, SensitivityPredictor(harmonic)))
+
+    def _preset_sensitivity(self, amplitude):
+        """Set SEN for the signal expected at `amplitude` before the current is stepped."""
+        for inst, demod, predictor in self.sen_predictors:
+            expected = predictor.predict(amplitude)
+            if expected is None:
+                continue
+            try:
+                predictor.sensitivity = inst.preset_sensitivity(demod, expected, predictor.sensitivity)
+            except Exception as e:
+                print(f"Error presetting SEN{demod}: {e}")
+
+    def _manage_gain(self, amplitude):
+        """Check ranges with one acquire() per lock-in and re-range only what is overloaded or under-ranged.
+
+        Input overload steps ACGAIN down; a demodulator whose output is overloaded or outside
+        [10 %, 90 %] of full scale gets the SEN search loop; a signal still below 10 % on the most
+        sensitive SEN range steps ACGAIN up. A lock-in that is in range is not touched.
+        """
+        for inst in (self.inst1, self.inst2):
+            try:
+                record = inst.acquire()
+                if record.input_overload:
+                    print("Lock-in input overload, lowering ACGAIN")
+                    if inst.step_acgain(-1) is not None:
+                        record = inst.acquire()
+                elif inst.input_underranged(record.demod(inst.signal_demod())):
+                    print("Lock-in input under-ranged, raising ACGAIN")
+                    if inst.step_acgain(+1) is not None:
+                        record = inst.acquire()
+                for demod in (1, 2):
+                    reading = record.demod(demod)
+                    if not inst.sensitivity_ok(reading):
+                        print(f"SEN{demod} out of range (|V|={abs(reading.magnitude):.3e} V), searching")
+                        getattr(inst, f"set_sensitivity{demod}")(max_attempts=self.SEN_ATTEMPTS)
+                        reading = inst.acquire().demod(demod)
+                    for owner, d, predictor in self.sen_predictors:
+                        if owner is inst and d == demod:
+                            predictor.update(amplitude, reading)
+            except Exception as e:
+                print(f"Error managing lock-in gain: {e}")
+
+    def _initial_gain(self):
+        """Automatic ACGAIN once at the start of a run, then fixed at the optimized value."""
+        try:
+            for inst in (self.inst1, self.inst2):
+                inst.set_automatic_acgain()
+                time.sleep(self._settle(self.ACGAIN_SETTLE))
+            for inst in (self.inst1, self.inst2):
+                inst.optimize_acgain()
+            time.sleep(self._settle(self.FINAL_SETTLE))
+        except Exception as e:
+            print(f"Error setting initial ACGAIN: {e}")
+
+    def _reset_sensitivity_predictors(self):
+        for inst, demod, predictor in self.sen_predictors:
+            predictor.reset()
+
+    def _wait_settled(self):
+        """Sample both lock-ins until their signals stop drifting, capped at wait_time.
+
+        The estimate is the mean |MAG| of the sweep-harmonic demodulator over the last `settle_window` samples of each lock-in; the point is
+        settled when it differs from the estimate one window earlier by less than `settle_tol` (relative,
+        with 1% of full scale as the floor so near-zero signals do not stall, SETTLE_FLOOR when the
+        sensitivity is unknown). Returns the elapsed time (s).
+        """
+        start = time.monotonic()
+        history = []
+        while not self.stop_requested:
+            elapsed = time.monotonic() - start
+            if elapsed >= self.wait_time:
+                print(f"Settle cap reached after {elapsed:.1f} s")
+                return elapsed
+            readings = [inst.acquire().demod(inst.signal_demod()) for inst in (self.inst1, self.inst2)]
+            history.append([r.magnitude for r in readings])
+            w = self.settle_window
+            if len(history) >= 2 * w:
+                recent = np.mean(history[-w:], axis=0)
+                earlier = np.mean(history[-2 * w:-w], axis=0)
+                floor = np.array([0.01 * r.full_scale if r.full_scale else self.SETTLE_FLOOR for r in readings])
+                change = np.abs(recent - earlier) / np.maximum(np.abs(recent), floor)
+                if np.all(change < self.settle_tol):
+                    print(f"Settled after {elapsed:.1f} s (relative change {change.max():.2e})")
+                    return elapsed
+            time.sleep(self.settle_interval)
+        return time.monotonic() - start
+
+    def _read_settle_time(self, refresh=True):
+        """Query TC and slope of both lock-ins and cache the slower settling time (None if unreadable)."""
+        times = [inst.settling_time(refresh=refresh, fallback=None) for inst in (self.inst1, self.inst2)]
+        if None in times:
+            self.settle_time = None
+            if not self.settle_unknown:
+                print(f"Warning: lock-in filter settings unreadable, waiting the full wait_time "
+                      f"({self.wait_time} s) until they can be read")
+            self.settle_unknown = True
+            return
+        self.settle_time = max(times)
+        self.settle_unknown = False
+        print(f"Lock-in settling time: {self.settle_time:.3f} s")
+
+    def _settle(self, multiples=1.0):
+        """`multiples` lock-in settling times; the conservative wait_time while TC/slope are unknown."""
+        if self.settle_time is None:
+            # Retried at most every FILTER_RETRY_INTERVAL by the lock-ins themselves
+            self._read_settle_time(refresh=False)
+        if self.settle_time is None:
+            return self.wait_time
+        return multiples * self.settle_time
+
+    def _update_data(self, amplitude):
+        """Acquire, store and queue one point; returns True when the point was saved with both lock-in readings.
+
+        A point with a failed lock-in read is still saved (NaN columns) but returns False, so it is not
+        journaled and a resumed run measures it again.
+        """
         try:
-            if count % 10 == 0:
-                self.inst1.set_automatic_acgain()
-                time.sleep(10)
-                self.inst2.set_automatic_acgain()
-                time.sleep(10)
-                self.inst1.set_sensitivity1(max_attempts=26)
-                self.inst2.set_sensitivity1(max_attempts=26)
-                self.inst1.set_sensitivity2(max_attempts=26)
-                self.inst2.set_sensitivity2(max_attempts=26)
-                #self.inst1.disable_automatic_acgain()
-                self.inst1.optimize_acgain()
-                time.sleep(10)
-                #self.inst2.disable_automatic_acgain()
-                self.inst2.optimize_acgain()
-                time.sleep(60)
-                self.inst1.set_sensitivity2(max_attempts=22)
-                self.inst2.set_sensitivity2(max_attempts=22)
             # Update data in data_logger (safe to do in worker thread)
-            self.data_logger.update_measurements(self.inst1, self.inst2, amplitude, self.host, self.port,self.current_dc_val)
+            complete = self.data_logger.update_measurements(self.inst1, self.inst2, amplitude, self.host, self.port,self.current_dc_val)
             # Request GUI thread to update/refresh plot via signal
             self.updatePlotSignal.emit()
-            # Save data (can remain in worker thread; consider moving to background if slow)
-            self.data_logger.save_data_to_txt()
+            # Append this point to the run file (header is written once per run)
+            self.data_logger.append_row_to_txt()
+            if not complete:
+                print(f"Lock-in read failed at {amplitude} A, point not journaled")
+            return complete
         except Exception as e:
             print(f"Error updating data: {e}")
+            return False
+
+    def _wait_temperature_stable(self, target, tol=None, stable_sec=None, timeout_min=None):
+        """Block until T is stable at `target` (or timeout/stop), reporting progress via stabilityProgress.
+
+        tol / stable_sec / timeout_min default to the thread's PPMS-tab settings.
+        """
+        telemetry = self.data_logger.telemetry
+        interval = telemetry.interval if telemetry is not None else 1.0
+        tol = self.stable_tol if tol is None else tol
+        stable_sec = self.stable_sec if stable_sec is None else stable_sec
+        timeout_min = self.stable_timeout_min if timeout_min is None else timeout_min
+        return wait_until_stable(
+            StabilityCriterion(target, tol, stable_sec),
+            temperature_reader(self.ppms_session, telemetry),
+            interval=interval, timeout=timeout_min * 60,
+            should_stop=lambda: self.stop_requested,
+            on_progress=lambda progress, eta, T, slope: self.stabilityProgress.emit(
+                progress, -1.0 if eta is None else eta, T))
+
+    def _rt_ramp(self, end, rate, interval):
+        """Stream R-T samples while the PPMS ramps to `end`; no per-temperature stabilization."""
+        print(f"Continuous R-T ramp to {end} K at {rate} K/min")
+        if self.inst1.demod_harmonic(1) != 1:  # dual 1f/nf mode already detects 1f on demod1
+            self.inst1.set_harmonic(1)
+        self.ppms_session.configure(self.host, self.port)
+        self.ppms_session.set_temperature(end, rate, 'no_overshoot')
+        ramp_start = time.monotonic()
+        # Until a first temperature is read the span is unknown; RT_RAMP_GRACE bounds that too
+        deadline = ramp_start + self.RT_RAMP_GRACE
+        timed = False
+        while not self.stop_requested:
+            start = time.monotonic()
+            try:
+                T = self.data_logger.record_rt_sample(self.inst1, self.inst2, self.current_dc_val)
+                self.updatePlotSignal.emit()
+                self.data_logger.append_row_to_txt()
+            except Exception as e:
+                print(f"Error recording R-T sample: {e}")
+                T = np.nan
+            if not timed and np.isfinite(T):
+                deadline = ramp_start + self._ramp_timeout(T, end, rate)
+                timed = True
+            if abs(T - end) <= self.rt_tol:
+                print(f"R-T ramp reached {T} K")
+                break
+            status = self._temperature_status() if abs(T - end) <= self.RT_STATUS_BAND else None
+            if status in ('stable', 'near'):
+                print(f"R-T ramp ended at {T} K: PPMS reports the end setpoint {status}")
+                break
+            if time.monotonic() > deadline:
+                print(f"Warning: R-T ramp to {end} K timed out at {T} K")
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+        self._finish_run_file()
+
+    def _ramp_timeout(self, start_T, end, rate):
+        """Time allowed for a ramp from start_T to end at `rate` K/min (s)."""
+        nominal = 60.0 * abs(end - start_T) / rate if rate > 0 else 0.0
+        return self.RT_RAMP_MARGIN * nominal + self.RT_RAMP_GRACE
+
+    def _temperature_status(self):
+        """Latest PPMS temperature status in lower case ('stable', 'near', ...), None when unknown."""
+        telemetry = self.data_logger.telemetry
+        try:
+            if telemetry is not None and telemetry.is_alive():
+                sample = telemetry.latest()
+                if sample is None or time.monotonic() - sample[0] > 3 * telemetry.interval:
+                    return None
+                status = telemetry.status_name(sample[2])
+            else:
+                T, status = self.ppms_session.get_temperature()
+        except Exception as e:
+            print(f"Error reading PPMS temperature status: {e}")
+            return None
+        return str(status).strip().lower() if status is not None else None
+
+    def _pending(self, amplitudes):
+        """Amplitudes of the current setpoint that are not yet in the journal."""
+        return [a for a in amplitudes if RunJournal.step_key(self.current_setpoint, a) not in self.completed]
+
+    def _sweep(self, amplitudes):
+        """Heater amplitude sweep into one run file, skipping steps already completed."""
+        pending = self._pending(amplitudes)
+        if len(pending) < len(amplitudes):
+            print(f"Skipping {len(amplitudes) - len(pending)} completed steps")
+        for amplitude in pending:
+            if self.stop_requested:
+                break
+            if not self._measure_for_amplitude(amplitude):
+                break
+            if self._update_data(amplitude):
+                self.data_logger.journal_point(self.current_setpoint, amplitude, (self.inst1, self.inst2))
+                self.completed.add(RunJournal.step_key(self.current_setpoint, amplitude))
+        self.my_instrument_current.disable_output()
+        self._finish_run_file()
+
+    def _finish_run_file(self):
+        self.data_logger.close_run_file()
+        self.data_logger.flush_writes()
+
+    def _prepare_lockins(self):
+        self._read_settle_time()
+        if self.predictive_sensitivity:
+            self._init_sensitivity_predictors()
+        self._initial_gain()
+
+    def _restore_lockins(self):
+        """On resume, put the lock-ins back into the state recorded with the last completed point."""
+        states = self.resume.get('lockins') if self.resume else None
+        if not states:
+            return
+        for inst, state in zip((self.inst1, self.inst2), states):
+            try:
+                inst.restore_state(state)
+            except Exception as e:
+                print(f"Error restoring lock-in state {state}: {e}")
+
+    def _run_step(self, step):
+        """Execute one PlanStep on this thread."""
+        p = step.params
+        if step.kind == 'set_temperature':
+            self.ppms_session.configure(self.host, self.port)
+            self.ppms_session.set_temperature(p['T'], p.get('rate', self.rate), 'no_overshoot')
+            self.current_setpoint = p['T']
+            self.setpoint_unstable = False
+        elif step.kind == 'wait_stable':
+            stable = self._wait_temperature_stable(p['T'], p.get('tol'), p.get('stable_sec'), p.get('timeout_min'))
+            if not stable and not self.stop_requested:
+                print(f"Warning: temperature not stable at {p['T']} K, skipping its sweeps")
+                self.setpoint_unstable = True
+            # The sample changed, so the previous temperature's V(I) no longer applies
+            self._reset_sensitivity_predictors()
+        elif step.kind == 'mode':
+            self._apply_mode(p['mode_key'])
+        elif step.kind == 'harmonic':
+            for inst, key in ((self.inst1, 'lock1'), (self.inst2, 'lock2')):
+                if key in p:
+                    inst.set_harmonic(p[key])
+            # New harmonic: new filter/SEN situation
+            self._prepare_lockins()
+        elif step.kind == 'sweep':
+            if self.setpoint_unstable:
+                print("Temperature not stable, skipping sweep")
+                return
+            if not self._pending(p['points']):
+                print("Sweep already completed, skipping")
+                return
+            # A sweep's own wait_time applies to that sweep only
+            default_wait = self.wait_time
+            self.wait_time = p.get('wait_time', default_wait)
+            try:
+                self._sweep(p['points'])
+            finally:
+                self.wait_time = default_wait
+        elif step.kind == 'rt_ramp':
+            self._rt_ramp(p['end'], p.get('rate', self.rate), p.get('interval', self.rt_interval))
+
+    def _apply_mode(self, mode_key):
+        """Switch the measurement mode on this thread before the next step runs.
+
+        Sets the lock-in harmonics (R-T: 1f and the sweep harmonic together in dual-harmonic mode,
+        otherwise the sweep harmonic alone), the DC sources and the logger's 1f flag; the GUI is only
+        asked to switch its plots.
+        """
+        rt = mode_key == 'rt'
+        uses_dc = mode_key in ('fig1ef', 'rt')
+        harmonic = self.inst1.demod_harmonic(self.inst1.signal_demod())
+        retuned = True
+        if rt and self.inst1.signal_demod() != 2:
+            self.inst1.set_dual_harmonic(1, harmonic if harmonic != 1 else 2)
+        elif not rt and self.inst1.dual_harmonics is not None:
+            self.inst1.set_harmonic(harmonic)
+        else:
+            retuned = False
+        if uses_dc and not self.dc_sources:
+            print(f"Warning: mode {mode_key} needs the DC sources, but none are connected")
+        for source in self.dc_sources:
+            if uses_dc:
+                source.setup_current_source(self.dc_current)
+                source.enable_output()
+            else:
+                source.disable_output()
+        self.current_dc_val = self.dc_current if uses_dc and self.dc_sources else 0.0
+        self.data_logger.set_use_1f_for_rt(rt)
+        if retuned:
+            # New harmonics: new filter/SEN situation
+            self._prepare_lockins()
+        self.modeRequested.emit(mode_key)  # plot changes belong to the GUI thread
+
+    def _completed_setpoints(self, steps):
+        """Indices of set_temperature/wait_stable steps whose setpoint's sweeps are all in the journal.
+
+        A setpoint runs from its set_temperature step to the next one; it is skipped on resume only when it
+        has sweeps and none of them has pending amplitudes (rt_ramp steps are not journaled, so never skipped).
+        """
+        skip = set()
+        if not self.completed:
+            return skip
+        setpoint, members, sweeps, done = None, [], 0, True
+        for index, step in enumerate(steps + [None]):
+            if step is None or step.kind == 'set_temperature':
+                if members and sweeps and done:
+                    skip.update(members)
+                if step is None:
+                    break
+                setpoint, members, sweeps, done = step.params['T'], [index], 0, True
+            elif step.kind == 'wait_stable':
+                members.append(index)
+            elif step.kind == 'sweep':
+                sweeps += 1
+                done = done and not [a for a in step.params['points']
+                                     if RunJournal.step_key(setpoint, a) not in self.completed]
+            elif step.kind == 'rt_ramp':
+                done = False
+        return skip
+
+    def _run_plan(self):
+        """Run the plan in order; preparation steps right after a wait run concurrently with that wait."""
+        steps = list(self.plan)
+        completed_setpoints = self._completed_setpoints(steps)
+        i = 0
+        with ThreadPoolExecutor(max_workers=1) as prep_pool:
+            while i < len(steps) and not self.stop_requested:
+                step = steps[i]
+                i += 1
+                self.planProgress.emit(i, len(steps), step.describe())
+                print(f"Plan step {i}/{len(steps)}: {step.describe()}")
+                if i - 1 in completed_setpoints:
+                    if step.kind == 'set_temperature':
+                        self.current_setpoint = step.params['T']
+                    print("Setpoint already completed, skipping")
+                    continue
+                prepared = None
+                if step.kind == 'wait_stable':
+                    preparation = []
+                    while i < len(steps) and steps[i].is_preparation:
+                        preparation.append(steps[i])
+                        i += 1
+                    if preparation:
+                        print(f"Running {len(preparation)} preparation step(s) during the wait")
+                        prepared = prep_pool.submit(lambda steps=preparation: [self._run_step(s) for s in steps])
+                try:
+                    self._run_step(step)
+                    if prepared is not None:
+                        prepared.result()
+                except Exception as e:
+                    print(f"Error in plan step {step.describe()}: {e}")
 
     def run(self):
+        if self.plan is None and self.rt_ramp_end is None and self.temperature_changing:
+            # A temperature list is the plan "set -> wait stable -> sweep" for each temperature
+            self.plan = MeasurementPlan.temperature_series(self.temp_list, self.amplitude_values, self.rate)
+        if self.plan is not None:
+            self._prepare_lockins()
+            self._restore_lockins()
+            self._run_plan()
+            self.data_logger.close_journal()
+            self.measurementDone.emit()
+            return
+        if self.rt_ramp_end is not None:
+            self._rt_ramp(self.rt_ramp_end, self.rate, self.rt_interval)
+            self.measurementDone.emit()
+            return
         #self._setup_instruments()
         #amplitude_values = self.generate_amplitude_intervals()
         print(self.temperature_changing)
         print(self.temp_list)
-        if self.temperature_changing:
-            for temp in self.temp_list:
-                print(f"Setting temperature to: {temp}")
-                with mvc.MultiVuClient(self.host, self.port) as client:
-                    time.sleep(5)
-                    temperature_set=temp
-                    print(f"prepare set temperature: {temperature_set}")
-                    client.set_temperature(temperature_set,
-                                           self.rate,
-                                           client.temperature.approach_mode.no_overshoot)
-                    time.sleep(100)
-                count = 0
-                for amplitude in self.amplitude_values:
-                    if self.stop_requested:
-                        break
-                    self._measure_for_amplitude(amplitude)
-                    self._update_data(count, amplitude)
-                    count += 1
-                    if count == 10:
-                        count = 0
-                self.my_instrument_current.disable_output()
-                self.measurementDone.emit()
-        else:
-            count = 0
-            print("without temperature control")
-            for amplitude in self.amplitude_values:
-                if self.stop_requested:
-                    break
-                self._measure_for_amplitude(amplitude)
-                self._update_data(count, amplitude)
-                count += 1
-                if count == 10:
-                    count = 0
-            self.my_instrument_current.disable_output()
-            self.measurementDone.emit()
-
-
+        self._prepare_lockins()
+        self._restore_lockins()
+        print("without temperature control")
+        self._sweep(self.amplitude_values)
+        self.measurementDone.emit()
+        self.data_logger.close_journal()
 
     def get_amplitude_values(self):
         return self.amplitude_values
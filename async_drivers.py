@@ -0,0 +1,178 @@
+# 文件名: async_drivers.py
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InstrumentLoop:
+    """
+    所有仪器共用的 asyncio 事件循环，运行在一个后台线程中。
+
+    pyvisa 和 lakeshore 只提供阻塞 I/O，这些调用在事件循环的线程池中执行：线程数固定为
+    max_workers，与仪器数量无关，事件循环本身不会被 I/O 或驱动内部的等待阻塞。
+    """
+    MAX_WORKERS = 8
+
+    def __init__(self, max_workers=None):
+        """
+        参数:
+            max_workers (int): 执行阻塞调用的线程数，默认 MAX_WORKERS。
+        """
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动事件循环线程 (已启动时不做任何事)。"""
+        with self._lock:
+            if self._thread is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop.set_default_executor(
+                    ThreadPoolExecutor(self.max_workers, thread_name_prefix='instrument-io'))
+                self._thread = threading.Thread(target=self.loop.run_forever, name='instrument-loop', daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, coro):
+        """把协程交给事件循环，返回 concurrent.futures.Future。"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """阻塞等待协程完成并返回结果；不能在事件循环线程内调用。"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("InstrumentLoop.run() called from the event loop thread")
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """停止事件循环并关闭线程池。"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.run_until_complete(self.loop.shutdown_default_executor())
+            self.loop.close()
+            self.loop = None
+            self._thread = None
+
+
+class AsyncInstrument:
+    """
+    阻塞驱动 (InstrumentLockin7270、Keithley*、LakeshoreController) 的异步版本。
+
+    - 驱动的任何方法都可以 await 调用: await lockin.call('acquire')。
+    - 每台仪器一把 asyncio.Lock，同一仪器的命令不会交错；不同仪器的调用在事件循环上并发执行。
+    - write / query 直接收发一条命令，sleep 是不阻塞事件循环的等待。
+    """
+
+    def __init__(self, driver):
+        """
+        参数:
+            driver: 已连接的阻塞驱动。
+        """
+        self.driver = driver
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, factory, *args, **kwargs):
+        """在线程池中构造驱动 (连接、复位等阻塞操作不占用事件循环)。"""
+        driver = await asyncio.get_running_loop().run_in_executor(None, functools.partial(factory, *args, **kwargs))
+        return cls(driver)
+
+    async def call(self, name, *args, **kwargs):
+        """持有本仪器的锁，在线程池中执行驱动方法 name 并返回结果。"""
+        method = functools.partial(getattr(self.driver, name), *args, **kwargs)
+        async with self.lock:
+            return await asyncio.get_running_loop().run_in_executor(None, method)
+
+    def _io(self):
+        """驱动的 (write, query) 命令通道。"""
+        driver = self.driver
+        if hasattr(driver, '_query_device'):   # 7270: NULL 终止的套接字协议
+            return driver._write_command, driver._query_device
+        if hasattr(driver, 'instrument'):       # Lakeshore PrecisionSource
+            return driver.instrument.command, driver.instrument.query
+        return driver.inst.write, driver.inst.query
+
+    async def write(self, cmd):
+        """发送一条命令。"""
+        write, _ = self._io()
+        async with self.lock:
+            await asyncio.get_running_loop().run_in_executor(None, write, cmd)
+
+    async def query(self, cmd):
+        """发送查询并返回应答。"""
+        _, query = self._io()
+        async with self.lock:
+            return await asyncio.get_running_loop().run_in_executor(None, query, cmd)
+
+    @staticmethod
+    async def sleep(seconds):
+        await asyncio.sleep(seconds)
+
+
+async def gather_calls(*calls):
+    """
+    并发执行多台仪器上的调用，按顺序返回结果。
+
+    参数:
+        calls: (AsyncInstrument, 方法名, 参数...) 元组。
+    """
+    return await asyncio.gather(*(instrument.call(name, *args) for instrument, name, *args in calls))
+
+
+class SyncInstrument:
+    """
+    AsyncInstrument 的同步外观，接口与原阻塞驱动相同：方法调用在共享事件循环上执行并阻塞到完成，
+    属性读写直接转给驱动。MeasurementThread、DataLogger 等现有调用方无需修改。
+    """
+
+    def __init__(self, instrument, event_loop=None):
+        """
+        参数:
+            instrument (AsyncInstrument): 异步驱动。
+            event_loop (InstrumentLoop): 执行调用的事件循环，默认使用进程内共享的 async_drivers.loop。
+        """
+        object.__setattr__(self, 'instrument', instrument)
+        object.__setattr__(self, 'loop', event_loop or loop)
+
+    def __getattr__(self, name):
+        attr = getattr(self.instrument.driver, name)
+        if not inspect.ismethod(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.loop.run(self.instrument.call(name, *args, **kwargs))
+        call.__name__ = name
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self.instrument.driver, name, value)
+
+    def __repr__(self):
+        return f"SyncInstrument({self.instrument.driver!r})"
+
+
+def open_instrument(factory, *args, event_loop=None, **kwargs):
+    """
+    在事件循环的线程池中构造驱动，返回它的同步外观。
+
+    参数:
+        factory: 驱动类，例如 InstrumentLockin7270。
+        args, kwargs: 传给驱动构造函数的参数。
+        event_loop (InstrumentLoop): 默认使用进程内共享的 async_drivers.loop。
+
+    返回:
+        SyncInstrument: 接口与驱动相同。
+    """
+    event_loop = event_loop or loop
+    return SyncInstrument(event_loop.run(AsyncInstrument.connect(factory, *args, **kwargs)), event_loop)
+
+
+# 进程内默认的事件循环，open_instrument 未指定 event_loop 时使用 (首次调用时启动)
+loop = InstrumentLoop()
@@ -0,0 +1,76 @@
+# 文件名: column_store.py
+import numpy as np
+
+
+class ColumnStore:
+    """
+    以命名 float64 列保存测量数据的预分配存储。
+
+    - 底层为 (列数, 容量) 的数组，每列在内存中连续；容量不足时按倍数扩展，追加一行为均摊 O(1)。
+    - store[name] 返回长度为 len(store) 的零拷贝视图，可直接用于绘图和拟合。
+      视图在下一次扩容后不再随新数据更新，使用时应每次重新获取。
+    - 某一行未提供的列保持为 NaN。
+    """
+
+    def __init__(self, columns, capacity=1024, growth=2.0):
+        """
+        参数:
+            columns (iterable): 列名 (顺序即导出顺序)。
+            capacity (int): 初始预分配的行数。
+            growth (float): 扩容倍数。
+        """
+        self._names = list(columns)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self._growth = growth
+        self._buf = np.full((len(self._names), max(1, int(capacity))), np.nan)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        return self._buf[self._index[name], :self._n]
+
+    @property
+    def capacity(self):
+        return self._buf.shape[1]
+
+    def keys(self):
+        return list(self._names)
+
+    def items(self):
+        for name in self._names:
+            yield name, self[name]
+
+    def _grow(self, min_capacity):
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity = int(capacity * self._growth) + 1
+        buf = np.full((len(self._names), capacity), np.nan)
+        buf[:, :self._n] = self._buf[:, :self._n]
+        self._buf = buf
+
+    def append(self, row):
+        """追加一行。row 为 {列名: 数值}，未知列名抛出 KeyError。"""
+        if self._n == self.capacity:
+            self._grow(self._n + 1)
+        for name, value in row.items():
+            self._buf[self._index[name], self._n] = value
+        self._n += 1
+
+    def last_row(self):
+        """返回最后一行 {列名: float}。"""
+        if self._n == 0:
+            raise IndexError('ColumnStore is empty')
+        return {name: float(self._buf[i, self._n - 1]) for i, name in enumerate(self._names)}
+
+    def to_dict(self):
+        """{列名: 视图}，可直接传给 pd.DataFrame。"""
+        return dict(self.items())
+
+    def clear(self):
+        self._buf[:, :self._n] = np.nan
+        self._n = 0
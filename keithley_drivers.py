@@ -1,68 +1,153 @@
 # 文件名: keithley_drivers.py
 import pyvisa
 import time
+import visa_pool
 
-class Keithley6221_ACSource:
+
+class KeithleySCPI:
+    """
+    Keithley 电流源驱动的公共部分：配置命令用分号拼成一次写入，随后用 *OPC 与状态字节轮询
+    (接口不支持串行轮询时改用 *OPC?) 在超时内确认执行完毕，最后读一次错误队列。
+    """
+    NAME = 'Keithley'
+    RESET_TIMEOUT = 5.0     # *RST 完成的超时 (s)
+    CONFIG_TIMEOUT = 2.0    # 普通配置完成的超时 (s)
+    POLL_INTERVAL = 0.005   # 状态字节轮询间隔 (s)
+    ESB = 0x20              # 状态字节中的标准事件汇总位 (*ESE 1 时对应 OPC)
+    ERROR_QUEUE_DEPTH = 10
+
+    def __init__(self, resource_name, pool=None):
+        """
+        连接并复位仪器。连接、复位超时或错误队列非空时抛出异常 (setup_* / set_amplitude 同样)，
+        由调用方停止测量，而不是带着错误配置继续采集。
+
+        参数:
+            resource_name (str): VISA 地址, 例如 'GPIB0::12::INSTR'
+            pool (VisaPool): 提供会话的资源池，默认使用进程内共享的 visa_pool.pool
+        """
+        self.pool = pool or visa_pool.pool
+        self.inst = self.pool.open(resource_name)
+        print(f"已连接 {self.NAME}: {self.inst.query('*IDN?')}")
+        self.reset()
+
+    @staticmethod
+    def join_commands(commands):
+        """用分号拼接命令；非公共命令补上前导冒号，使每条命令都从根路径解析。"""
+        return ';'.join(c if c.startswith(('*', ':')) else ':' + c for c in commands)
+
+    def configure(self, commands, timeout=None):
+        """
+        一次写入全部命令，等待执行完毕并检查错误队列。
+
+        参数:
+            commands (list): SCPI 命令列表。
+            timeout (float): 等待完成的超时 (s)，默认 CONFIG_TIMEOUT。
+        """
+        self.inst.write(self.join_commands(list(commands) + ['*ESE 1', '*OPC']))
+        self._wait_opc(self.CONFIG_TIMEOUT if timeout is None else timeout)
+        self.check_errors()
+
+    def reset(self):
+        """复位并清除状态，确认复位完成 (不再固定等待 1 s)。"""
+        self.configure(['*RST', '*CLS'], self.RESET_TIMEOUT)
+
+    def wait_complete(self, timeout=None):
+        """等待之前的命令全部执行完毕。"""
+        self.inst.write('*ESE 1;*OPC')
+        self._wait_opc(self.CONFIG_TIMEOUT if timeout is None else timeout)
+
+    def _wait_opc(self, timeout):
+        """轮询状态字节的 ESB 位直到 *OPC 置位；串行轮询不可用时退回 *OPC? 查询。"""
+        deadline = time.monotonic() + timeout
+        try:
+            while not self.inst.read_stb() & self.ESB:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{self.NAME}: operation not complete within {timeout} s")
+                time.sleep(self.POLL_INTERVAL)
+        except (pyvisa.errors.VisaIOError, NotImplementedError):
+            self._query_opc(timeout)
+            return
+        self.inst.query('*ESR?')  # 读取并清除事件寄存器，ESB 位随之复位
+
+    def _query_opc(self, timeout):
+        previous = self.inst.timeout
+        self.inst.timeout = timeout * 1000
+        try:
+            response = self.inst.query('*OPC?').strip()
+        finally:
+            self.inst.timeout = previous
+        if response != '1':
+            raise RuntimeError(f"Unexpected *OPC? response: {response}")
+
+    def check_errors(self):
+        """读空错误队列；有错误时抛出 RuntimeError。"""
+        errors = []
+        for _ in range(self.ERROR_QUEUE_DEPTH):
+            response = self.inst.query('SYST:ERR?').strip()
+            if int(response.split(',')[0]) == 0:
+                break
+            errors.append(response)
+        if errors:
+            raise RuntimeError(f"{self.NAME} error: {'; '.join(errors)}")
+
+
+class Keithley6221_ACSource(KeithleySCPI):
     """
     用于控制 Keithley 6221 交流电流源 (对应论文中的加热器 Heater 电源)。
     论文参数: Sine wave, Frequency = 17.777 Hz.
     """
-    def __init__(self, resource_name):
+    NAME = 'Keithley 6221'
+
+    def __init__(self, resource_name, pool=None):
         """
         参数:
             resource_name (str): VISA 地址, 例如 'GPIB0::12::INSTR'
+            pool (VisaPool): 提供会话的资源池，默认使用进程内共享的 visa_pool.pool
         """
-        self.rm = pyvisa.ResourceManager()
-        try:
-            self.inst = self.rm.open_resource(resource_name)
-            print(f"已连接 Keithley 6221: {self.inst.query('*IDN?')}")
-            self.inst.write('*RST') # 复位
-            time.sleep(1)
-        except Exception as e:
-            print(f"连接 Keithley 6221 失败: {e}")
+        # 当前正弦输出设置，用于判断能否只更新幅度
+        self.output_enabled = False
+        self.frequency = None
+        super().__init__(resource_name, pool)
 
     def setup_sine_wave(self, frequency=17.777, amplitude=0):
         """配置输出波形为正弦波，并设置频率和初始幅度"""
-        try:
-            self.inst.write('SOUR:WAVE:FUNC SIN')      # 设置为正弦波
-            self.inst.write(f'SOUR:WAVE:FREQ {frequency}') # 设置频率 (论文: 17.777 Hz)
-            self.inst.write(f'SOUR:WAVE:AMPL {amplitude}') # 设置幅度 (单位: Amp)
-            self.inst.write('SOUR:WAVE:PMAR:STAT ON')  # 开启相位标记 (用于触发锁相放大器)
-            self.inst.write('SOUR:WAVE:PMAR:OLIN 1')   # 输出触发信号到 Trigger Link 1
-            print(f"Keithley 6221 configured: Sine, {frequency}Hz, {amplitude}A")
-        except Exception as e:
-            print(f"配置波形失败: {e}")
+        self.configure([
+            'SOUR:WAVE:FUNC SIN',           # 设置为正弦波
+            f'SOUR:WAVE:FREQ {frequency}',  # 设置频率 (论文: 17.777 Hz)
+            f'SOUR:WAVE:AMPL {amplitude}',  # 设置幅度 (单位: Amp)
+            'SOUR:WAVE:PMAR:STAT ON',       # 开启相位标记 (用于触发锁相放大器)
+            'SOUR:WAVE:PMAR:OLIN 1',        # 输出触发信号到 Trigger Link 1
+        ])
+        self.frequency = frequency
+        print(f"Keithley 6221 configured: Sine, {frequency}Hz, {amplitude}A")
+
+    def output_sine_current(self, amplitude, frequency, offset=0.0, phase=0.0):
+        """与 LakeshoreController.output_sine_current 相同的接口 (offset/phase 不使用)。"""
+        self.setup_sine_wave(frequency, amplitude)
 
     def set_amplitude(self, amplitude):
-        """更新电流幅度 (用于扫描电流 I_h)"""
-        self.inst.write(f'SOUR:WAVE:AMPL {amplitude}')
+        """更新电流幅度 (用于扫描电流 I_h)；波形运行中直接修改，频率不变，确认完成并检查错误"""
+        self.configure([f'SOUR:WAVE:AMPL {amplitude}'])
 
     def enable_output(self):
         """开启输出 (Arm and Start)"""
-        self.inst.write('SOUR:WAVE:ARM')
-        self.inst.write('SOUR:WAVE:INIT')
+        self.configure(['SOUR:WAVE:ARM', 'SOUR:WAVE:INIT'])
+        self.output_enabled = True
         print("Keithley 6221 Output ENABLED")
 
     def disable_output(self):
         """关闭输出"""
         self.inst.write('SOUR:WAVE:ABORT')
+        self.output_enabled = False
         print("Keithley 6221 Output DISABLED")
 
 
-class Keithley2400_DCSource:
+class Keithley2400_DCSource(KeithleySCPI):
     """
     用于控制 Keithley 2400 直流源表 (对应论文中的温度计 Thermometer 探针电流)。
     论文中使用了两台此类仪器 。
     """
-    def __init__(self, resource_name):
-        self.rm = pyvisa.ResourceManager()
-        try:
-            self.inst = self.rm.open_resource(resource_name)
-            print(f"已连接 Keithley 2400: {self.inst.query('*IDN?')}")
-            self.inst.write('*RST')
-            time.sleep(1)
-        except Exception as e:
-            print(f"连接 Keithley 2400 失败: {e}")
+    NAME = 'Keithley 2400'
 
     def setup_current_source(self, current_level=10e-6, voltage_compliance=21):
         """
@@ -71,14 +156,13 @@ class Keithley2400_DCSource:
             current_level (float): 输出电流 (Amp), 例如 10uA
             voltage_compliance (float): 电压保护限值 (Volt)
         """
-        try:
-            self.inst.write(':SOUR:FUNC CURR')        # 设置为电流源
-            self.inst.write(':SOUR:CURR:MODE FIX')    # 固定模式
-            self.inst.write(f':SENS:VOLT:PROT {voltage_compliance}') # 设置电压保护
-            self.inst.write(f':SOUR:CURR:LEV {current_level}')       # 设置电流值
-            print(f"Keithley 2400 configured: DC Current {current_level}A")
-        except Exception as e:
-            print(f"配置电流源失败: {e}")
+        self.configure([
+            ':SOUR:FUNC CURR',                       # 设置为电流源
+            ':SOUR:CURR:MODE FIX',                   # 固定模式
+            f':SENS:VOLT:PROT {voltage_compliance}', # 设置电压保护
+            f':SOUR:CURR:LEV {current_level}',       # 设置电流值
+        ])
+        print(f"Keithley 2400 configured: DC Current {current_level}A")
 
     def enable_output(self):
         self.inst.write(':OUTP ON')
@@ -87,21 +171,14 @@ class Keithley2400_DCSource:
     def disable_output(self):
         self.inst.write(':OUTP OFF')
         print("Keithley 2400 Output OFF")
-class Keithley6221_DCSource:
+
+
+class Keithley6221_DCSource(KeithleySCPI):
     """
     用于控制 Keithley 6221 作为直流电流源 (替代 Keithley 2400 的功能)。
     用于给温度计提供恒定的直流探测电流。
     """
-    def __init__(self, resource_name):
-        self.rm = pyvisa.ResourceManager()
-        try:
-            self.inst = self.rm.open_resource(resource_name)
-            # 查询 IDN 确认连接
-            print(f"已连接 Keithley 6221 (DC Mode): {self.inst.query('*IDN?')}")
-            self.inst.write('*RST') # 复位仪器，默认回到 DC 模式
-            time.sleep(1)
-        except Exception as e:
-            print(f"连接 Keithley 6221 (DC) 失败: {e}")
+    NAME = 'Keithley 6221 (DC Mode)'
 
     def setup_current_source(self, current_level=10e-6, voltage_compliance=10):
         """
@@ -110,16 +187,15 @@ class Keithley6221_DCSource:
             current_level (float): 输出电流 (Amp), 例如 10uA
             voltage_compliance (float): 电压保护限值 (Volt)
         """
-        try:
-            # 6221 专用指令
-            self.inst.write('SOUR:WAVE:OFF')        # 确保关闭波形模式，进入标准 DC 模式
-            self.inst.write('SOUR:CURR:RANG:AUTO ON') # 开启自动量程
-            self.inst.write(f'SOUR:CURR:COMP {voltage_compliance}') # 设置电压顺从/保护值 (Compliance)
-            self.inst.write(f'SOUR:CURR {current_level}')           # 设置直流电流值
-            
-            print(f"Keithley 6221 (DC) configured: {current_level}A, Compliance {voltage_compliance}V")
-        except Exception as e:
-            print(f"配置 6221 直流源失败: {e}")
+        # 6221 专用指令。停止波形用 SOUR:WAVE:ABOR：6221 没有 SOUR:WAVE:OFF (OFF 也不是 OFFSet 的
+        # 缩写)，原来的写法只是被忽略，现在 configure() 检查错误队列时会报 -113 并终止测量
+        self.configure([
+            'SOUR:WAVE:ABOR',                        # 确保停止波形输出，进入标准 DC 模式
+            'SOUR:CURR:RANG:AUTO ON',                # 开启自动量程
+            f'SOUR:CURR:COMP {voltage_compliance}',  # 设置电压顺从/保护值 (Compliance)
+            f'SOUR:CURR {current_level}',            # 设置直流电流值
+        ])
+        print(f"Keithley 6221 (DC) configured: {current_level}A, Compliance {voltage_compliance}V")
 
     def enable_output(self):
         """开启输出"""
@@ -129,4 +205,4 @@ class Keithley6221_DCSource:
     def disable_output(self):
         """关闭输出"""
         self.inst.write('OUTP OFF')
-        print("Keithley 6221 (DC) Output OFF")
\ No newline at end of file
+        print("Keithley 6221 (DC) Output OFF")
@@ -1,36 +1,40 @@
 from lakeshore import PrecisionSource
-import time
 
 class LakeshoreController:
     def __init__(self, ip_address='10.16.87.186', voltage_limit=5, max_voltage=3):
         """
         初始化Lakeshore PrecisionSource并进行基本设置。
 
+        设置命令依次发送后用一次 *OPC? 确认全部完成，不再在每条命令之间固定等待。
+
         参数:
             ip_address (str): 仪器的IP地址。
             voltage_limit (float): 设置的电压限制。
             max_voltage (float): 电流模式下的电压保护的最大值。
         """
         self.instrument = PrecisionSource(ip_address=ip_address)
-        time.sleep(0.08)
         print(self.instrument.query('*IDN?'))
-        time.sleep(0.08)
         self.instrument.reset_measurement_settings()
-        time.sleep(0.08)
         self.instrument.route_terminals(output_connections_location='FRONT')
-        time.sleep(0.08)
         self.instrument.set_voltage_limit(voltage_limit)
-        time.sleep(0.08)
         self.instrument.set_current_mode_voltage_protection(max_voltage)
-        time.sleep(0.08)
         self.instrument.disable_output()
-        time.sleep(0.08)
         self.instrument.enable_autorange()
-        time.sleep(0.08)
+        self.wait_complete()
+        # 当前正弦输出设置，用于判断能否只更新幅度
+        self.output_enabled = False
+        self.frequency = None
+
+    def wait_complete(self):
+        """用 *OPC? 等待之前的命令全部执行完毕。"""
+        response = self.instrument.query('*OPC?').strip()
+        if response != '1':
+            raise RuntimeError(f"Unexpected *OPC? response: {response}")
 
     def enable_output(self):
         """开启仪器输出。"""
         self.instrument.enable_output()
+        self.output_enabled = True
         print("Instrument output enabled.")
 
     def output_sine_current(self, amplitude, frequency, offset=0.0, phase=0.0):
@@ -44,8 +48,23 @@ class LakeshoreController:
             phase (float): 正弦电流的相位。默认为0.0。
         """
         self.instrument.output_sine_current(amplitude, frequency, offset, phase)
+        self.wait_complete()
+        self.frequency = frequency
         print(f"Sine current output set. Amplitude: {amplitude}, Frequency: {frequency}, Offset: {offset}, Phase: {phase}")
+
+    def set_amplitude(self, amplitude):
+        """
+        只修改正弦电流幅度，输出保持开启，频率、相位和偏移不变 (不会因开关输出产生热冲击)。
+
+        参数:
+            amplitude (float): 新的正弦电流幅度。
+        """
+        self.instrument.command(f'SOURce:CURRent:AMPLitude {amplitude}')
+        self.wait_complete()
+        print(f"Sine current amplitude set to {amplitude}")
+
     def disable_output(self):
         """关闭仪器输出。"""
         self.instrument.disable_output()
-        print("Instrument output disabled.")
\ No newline at end of file
+        self.output_enabled = False
+        print("Instrument output disabled.")
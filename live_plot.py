@@ -0,0 +1,217 @@
+# 文件名: live_plot.py
+import numpy as np
+from matplotlib.lines import Line2D
+
+
+def minmax_indices(y, n_bins):
+    """
+    min/max 降采样：把样本按顺序均分为 n_bins 段，每段保留 y 最小和最大的两个样本。
+
+    返回按原顺序排列的样本下标 (不超过 2 * n_bins 个)，峰值和尖刺都会被保留。NaN 被忽略。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_bins:
+        return np.arange(n)
+    k = -(-n // n_bins)  # 每段样本数 (向上取整)
+    padded = np.full(n_bins * k, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_bins, k)
+    nan = np.isnan(blocks)
+    i_min = np.argmin(np.where(nan, np.inf, blocks), axis=1)
+    i_max = np.argmax(np.where(nan, -np.inf, blocks), axis=1)
+    base = np.arange(n_bins) * k
+    idx = np.unique(np.concatenate((base + i_min, base + i_max)))
+    return idx[idx < n]
+
+
+class BlitPlotRenderer:
+    """
+    DataLogger 2x2 实时图的增量渲染器。
+
+    每个坐标轴保存一帧已包含全部已绘点的背景；新数据到来时只把新增的线段 (连同上一个点)
+    画到这帧上并 blit 该坐标轴区域，渲染开销与数据总量无关。以下情况做一次完整重绘并按数据
+    自动缩放，坐标范围额外留出 headroom 比例的余量，避免单调扫描中每个点都触发重绘:
+    新点超出当前坐标范围；尚无背景 (例如开始测量、切换模式、缩放窗口后，见 invalidate())；
+    一次测量的前 warmup 个点；数据范围在某一方向上不到坐标范围的 loose 比例 (默认坐标范围
+    只适合 ±0.05 量级的数据，需要收紧到实际数据)。
+
+    完整重绘时每条线只保留当前可见 x 范围内、约每个像素两个点的 min/max 降采样数据；
+    坐标范围改变 (工具栏缩放/平移或自动缩放) 时按新范围重新降采样，绘制开销与运行时长无关。
+    """
+
+    def __init__(self, canvas, data_logger, headroom=0.25, lod=True, warmup=3, loose=0.5):
+        """
+        参数:
+            canvas (FigureCanvas): 显示 data_logger.fig 的画布。
+            data_logger (DataLogger): 提供 line_data() 的数据源。
+            headroom (float): 完整重绘时在数据范围两侧额外留出的比例。
+            lod (bool): 是否启用 min/max 降采样。
+            warmup (int): 每条线的前 warmup 个点总是完整重绘。
+            loose (float): 数据范围小于坐标范围的该比例时收紧坐标。
+        """
+        self.canvas = canvas
+        self.data_logger = data_logger
+        self.headroom = headroom
+        self.lod = lod
+        self.warmup = warmup
+        self.loose = loose
+        self.full_redraws = 0
+        self._source = {}   # line -> 完整数据 (x, y)，降采样和缩放后重算都基于它
+        self._watched = set()
+        self._frames = {}   # axis -> 已包含全部已绘点的背景
+        self._drawn = {}    # line -> 背景中已包含的点数
+        self._tails = {}    # line -> 只用于绘制新增线段的 animated 副本
+        self._bounds = {}   # axis -> 已绘数据的范围 (xmin, xmax, ymin, ymax)，增量更新
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # 任何一次完整绘制 (包括缩放、平移、窗口大小变化) 之后重新截取背景
+        self._frames = {ax: self.canvas.copy_from_bbox(ax.bbox)
+                        for ax in self.canvas.figure.axes if ax.get_visible()}
+        self._drawn = {line: len(self._source[line][0]) if line in self._source else len(line.get_xdata())
+                       for ax in self.canvas.figure.axes for line in ax.lines if line not in self._tails.values()}
+
+    def invalidate(self):
+        """丢弃背景，下一次 refresh() 做完整重绘并按数据重新缩放。开始测量或切换模式时调用。"""
+        self._frames = {}
+        self._bounds = {}
+
+    def _watch_limits(self, ax):
+        if ax in self._watched:
+            return
+        ax.callbacks.connect('xlim_changed', self._on_limits_changed)
+        ax.callbacks.connect('ylim_changed', self._on_limits_changed)
+        self._watched.add(ax)
+
+    def _on_limits_changed(self, ax):
+        # 缩放/平移后按新的可见范围重新降采样，随后的完整绘制使用新数据
+        for line in ax.lines:
+            if line in self._source:
+                line.set_data(*self._decimated(ax, *self._source[line]))
+
+    def _decimated(self, ax, x, y):
+        """可见 x 范围内的样本 (两侧各多留一个以保持连线)，超过约每像素两个点时做 min/max 降采样。"""
+        if not self.lod:
+            return x, y
+        n_bins = max(1, int(ax.bbox.width))
+        if len(x) <= 2 * n_bins:
+            return x, y
+        x0, x1 = sorted(ax.get_xlim())
+        visible = (x >= x0) & (x <= x1)
+        keep = visible.copy()
+        keep[1:] |= visible[:-1]
+        keep[:-1] |= visible[1:]
+        idx = np.flatnonzero(keep)
+        idx = idx[minmax_indices(y[idx], n_bins)]
+        return x[idx], y[idx]
+
+    def _set_line_data(self, ax, line, x, y):
+        self._watch_limits(ax)
+        self._source[line] = (x, y)
+        line.set_data(*self._decimated(ax, x, y))
+
+    def _tail(self, line):
+        tail = self._tails.get(line)
+        if tail is None:
+            tail = Line2D([], [], color=line.get_color(), linestyle=line.get_linestyle(),
+                          linewidth=line.get_linewidth(), marker=line.get_marker(),
+                          markersize=line.get_markersize(), animated=True)
+            line.axes.add_line(tail)
+            self._tails[line] = tail
+        return tail
+
+    @staticmethod
+    def _out_of_view(ax, x, y):
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.any():
+            return False
+        x, y = x[finite], y[finite]
+        x0, x1 = sorted(ax.get_xlim())
+        y0, y1 = sorted(ax.get_ylim())
+        return bool(np.any((x < x0) | (x > x1) | (y < y0) | (y > y1)))
+
+    @staticmethod
+    def _extent(x, y, bounds=None):
+        """把 (x, y) 中的有限点并入范围 bounds (xmin, xmax, ymin, ymax)。"""
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.any():
+            return bounds
+        x, y = x[finite], y[finite]
+        extent = (x.min(), x.max(), y.min(), y.max())
+        if bounds is None:
+            return extent
+        return (min(bounds[0], extent[0]), max(bounds[1], extent[1]),
+                min(bounds[2], extent[2]), max(bounds[3], extent[3]))
+
+    def _too_loose(self, ax, bounds):
+        """数据在 x 或 y 方向上的范围不到坐标范围的 loose 比例 (范围为零的方向不计)。"""
+        if bounds is None:
+            return False
+        for lo, hi, lim in ((bounds[0], bounds[1], ax.get_xlim()), (bounds[2], bounds[3], ax.get_ylim())):
+            span = hi - lo
+            if 0 < span < self.loose * abs(lim[1] - lim[0]):
+                return True
+        return False
+
+    def _add_headroom(self, ax):
+        for get, set_ in ((ax.get_xlim, ax.set_xlim), (ax.get_ylim, ax.set_ylim)):
+            lo, hi = get()
+            pad = (hi - lo) * self.headroom
+            set_(lo - pad, hi + pad)
+
+    def _full_redraw(self, items):
+        # 自动缩放基于完整数据，设置新范围时 xlim_changed 回调会重新降采样
+        for ax, line, x, y in items:
+            line.set_data(x, y)
+        self._bounds = {}
+        for ax, line, x, y in items:
+            self._bounds[ax] = self._extent(x, y, self._bounds.get(ax))
+        for tail in self._tails.values():
+            tail.set_data([], [])  # 旧的新增线段不参与自动缩放
+        for ax in {ax for ax, line, x, y in items}:
+            # 上一次设置带余量的范围时关闭了自动缩放，这里重新打开
+            ax.set_autoscale_on(True)
+            ax.relim()
+            ax.autoscale_view()
+            self._add_headroom(ax)
+            self._on_limits_changed(ax)
+        self.full_redraws += 1
+        self.canvas.draw()  # draw_event 会重新截取背景
+
+    def refresh(self):
+        """把 DataLogger 的最新数据画到图上，只在必要时完整重绘。"""
+        items = self.data_logger.line_data()
+        if not items:
+            return
+        for ax, line, x, y in items:
+            self._set_line_data(ax, line, x, y)
+
+        need_full = False
+        bounds = dict(self._bounds)
+        for ax, line, x, y in items:
+            start = self._drawn.get(line, 0)
+            if (ax not in self._frames or start > len(x) or start < self.warmup
+                    or self._out_of_view(ax, x[start:], y[start:])):
+                need_full = True
+                break
+            bounds[ax] = self._extent(x[start:], y[start:], bounds.get(ax))
+        if not need_full:
+            need_full = any(self._too_loose(ax, bounds.get(ax)) for ax in {ax for ax, line, x, y in items})
+        if need_full:
+            self._full_redraw(items)
+            return
+
+        for ax, line, x, y in items:
+            drawn = self._drawn.get(line, 0)
+            if drawn >= len(x):
+                continue
+            start = max(0, drawn - 1)  # 带上最后一个已绘点，新线段才能接上
+            tail = self._tail(line)
+            tail.set_data(x[start:], y[start:])
+            self.canvas.restore_region(self._frames[ax])
+            ax.draw_artist(tail)
+            self.canvas.blit(ax.bbox)
+            self._frames[ax] = self.canvas.copy_from_bbox(ax.bbox)
+            self._drawn[line] = len(x)
+        self._bounds = bounds
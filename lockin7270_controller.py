@@ -1,5 +1,128 @@
+import re
 import time
+from dataclasses import dataclass
+import numpy as np
 import pyvisa
+import visa_pool
+
+
+@dataclass
+class LockinReading:
+    """单个解调器在一次采集中的输出。"""
+    magnitude: float
+    phase: float
+    x: float
+    y: float
+    sensitivity: int   # SEN 档位编号 (1~27)
+    overload: bool
+
+    @property
+    def full_scale(self):
+        return InstrumentLockin7270.SENSITIVITY_SCALE.get(self.sensitivity)
+
+
+@dataclass
+class LockinRecord:
+    """一次往返得到的两个解调器输出及过载字节。timestamp 为 time.monotonic()。"""
+    demod1: LockinReading
+    demod2: LockinReading
+    overload_byte: int
+    timestamp: float
+
+    COLUMN_FIELDS = ('MAG', 'PHA', 'X', 'Y', 'SEN', 'OVL')
+
+    def demod(self, n):
+        return self.demod1 if n == 1 else self.demod2
+
+    @property
+    def input_overload(self):
+        return bool(self.overload_byte & (1 << InstrumentLockin7270.OVERLOAD_BITS['input']))
+
+    @property
+    def reference_unlocked(self):
+        return bool(self.overload_byte & (1 << InstrumentLockin7270.OVERLOAD_BITS['reference_unlock']))
+
+    @classmethod
+    def column_names(cls, prefix):
+        return [f"{prefix}{field}{n}" for n in (1, 2) for field in cls.COLUMN_FIELDS]
+
+    def to_columns(self, prefix):
+        """按 column_names(prefix) 的顺序展开为 {列名: 数值}，便于 DataLogger 按行保存。"""
+        columns = {}
+        for n in (1, 2):
+            r = self.demod(n)
+            values = (r.magnitude, r.phase, r.x, r.y, float(r.sensitivity), float(r.overload))
+            for field, value in zip(self.COLUMN_FIELDS, values):
+                columns[f"{prefix}{field}{n}"] = value
+        return columns
+
+
+@dataclass
+class BurstCapture:
+    """曲线缓存一次导出的全部采样。values 形状为 (输出数, 点数)，t 为相对 start 的时间 (s)。"""
+    outputs: tuple
+    t: np.ndarray
+    values: np.ndarray
+    start: float        # TD 启动时刻 (time.monotonic())
+    overload_byte: int
+
+    def column(self, name):
+        return self.values[self.outputs.index(name)]
+
+    def to_record(self, means):
+        """
+        用每个输出的平均值 (顺序同 outputs) 构造 LockinRecord；SEN 取最后一个采样点的档位。
+        """
+        means = dict(zip(self.outputs, means))
+        readings = []
+        for n, overload in zip((1, 2), InstrumentLockin7270.demod_overloads(self.overload_byte)):
+            readings.append(LockinReading(
+                magnitude=means[f'MAG{n}'],
+                phase=means[f'PHA{n}'],
+                x=means[f'X{n}'],
+                y=means[f'Y{n}'],
+                sensitivity=int(self.column(f'SEN{n}')[-1]) % 32,
+                overload=overload,
+            ))
+        return LockinRecord(readings[0], readings[1], self.overload_byte, self.start + float(self.t.mean()))
+
+
+class SensitivityPredictor:
+    """
+    按 V ∝ I^n 由前几个测量点外推下一个电流幅值下的信号，用于在改变电流之前选好 SEN 档位。
+
+    n 为检测谐波次数 (2ω 信号 ∝ I²，4ω 信号 ∝ I⁴)；系数 V / I^n 取最近 history 个点的中位数。
+    """
+
+    def __init__(self, exponent, history=3):
+        """
+        参数:
+            exponent (float): 幅值对电流的幂次 n。
+            history (int): 用于估计系数的最近点数。
+        """
+        self.exponent = exponent
+        self.history = history
+        self.sensitivity = None  # 最近一次读到的 SEN 档位
+        self._points = []        # [(I, |V|), ...]
+
+    def update(self, current, reading):
+        """记录电流 current 下的读数 (LockinReading)。"""
+        self.sensitivity = reading.sensitivity
+        magnitude = abs(reading.magnitude)
+        if current > 0 and magnitude > 0 and not reading.overload and np.isfinite(magnitude):
+            self._points = (self._points + [(current, magnitude)])[-self.history:]
+
+    def predict(self, current):
+        """返回电流 current 下的预计幅值 (V)；尚无数据时返回 None。"""
+        if not self._points or current <= 0:
+            return None
+        coeff = float(np.median([v / i ** self.exponent for i, v in self._points]))
+        return coeff * current ** self.exponent
+
+    def reset(self):
+        """清空历史 (例如温度改变后)。"""
+        self._points = []
+
 
 class InstrumentLockin7270:
 
@@ -11,8 +134,44 @@ class InstrumentLockin7270:
         25: 200.0e-3, 26: 500.0e-3, 27: 1.0
     }
 
-    def __init__(self, s_ip_address):
-        self.rm = pyvisa.ResourceManager('C:/Windows/System32/visa32.dll')  # 32 bit windows
+    QUERY_TIMEOUT = 2.0      # 单次查询的默认超时预算 (s)
+    READ_CHUNK = 1024        # 每次批量读取的最大字节数
+    RESPONSE_TERMINATOR = '\0'  # Ethernet 模式下每条应答以 NULL 结尾 (VISA 读取在此结束)
+    RESPONSE_SEPARATORS = re.compile('[\0\r]')  # 与原逐字符解析器相同，NULL 和 CR 都视为应答结束
+
+    # CBD (curve buffer define) 位定义；'?.' 按位序返回被选中的输出
+    OUTPUT_BITS = {
+        'X1': 0, 'Y1': 1, 'MAG1': 2, 'PHA1': 3, 'SEN1': 4,
+        'X2': 16, 'Y2': 17, 'MAG2': 18, 'PHA2': 19, 'SEN2': 20,
+    }
+    ACQUIRE_OUTPUTS = ('X1', 'Y1', 'MAG1', 'PHA1', 'SEN1', 'X2', 'Y2', 'MAG2', 'PHA2', 'SEN2')
+    # SLOPE 返回值 -> 滤波器滚降 (dB/oct)
+    SLOPE_DB = {0: 6, 1: 12, 2: 18, 3: 24}
+    # 阶跃响应达到终值 99% 所需的时间常数倍数
+    SETTLE_TC_99 = {6: 5.0, 12: 7.0, 18: 9.0, 24: 10.0}
+    FALLBACK_SETTLE = 1.0  # 无法读取滤波器设置时使用的稳定时间 (s)
+    FILTER_QUERY_RETRIES = 2  # 读取 TC/SLOPE 的重试次数 (失败时用 FALLBACK_SETTLE，不长时间阻塞)
+    FILTER_RETRY_INTERVAL = 30.0  # 读取失败后，至少间隔这么久 (s) 才再次自动查询
+    ACGAIN_MAX = 11        # 手动 ACGAIN 的上限档位
+    # N 命令返回的过载字节
+    OVERLOAD_BITS = {'ch1_output': 1, 'ch2_output': 2, 'y_output': 3, 'x_output': 4,
+                     'input': 6, 'reference_unlock': 7}
+
+    def __init__(self, s_ip_address, query_timeout=None, pool=None, terminator=None):
+        self.pool = pool or visa_pool.pool  # 共享的 VISA 资源池 (后端由配置或 VISA_BACKEND 决定)
+        self.query_timeout = query_timeout if query_timeout is not None else self.QUERY_TIMEOUT
+        self.last_query_latency = None
+        self.query_stats = {'count': 0, 'total': 0.0, 'max': 0.0}
+        self._output_mask = None  # 当前已写入仪器的 CBD 位掩码
+        self._burst = None        # 最近一次 arm_burst() 的设置
+        self._filter = None       # 缓存的 [(TC, slope dB/oct), ...]，每个解调器一项
+        self._filter_retry_at = 0.0  # 读取失败后下一次自动查询的时刻 (time.monotonic())
+        self.harmonic = None      # 最近一次 set_harmonic() 设置的谐波次数
+        self.acgain = None        # 最近一次 set_acgain() 设置的档位
+        self.dual_harmonics = None  # 双谐波模式下 (解调器1, 解调器2) 的谐波次数；单参考模式为 None
+        # VISA 读取的终止符；仪器设置为以 CR 结束应答时传入 '\r'
+        self.terminator = terminator or self.RESPONSE_TERMINATOR
+        self._responses = []      # 一次读取中 CR 之后多出的应答，留给下一次 _read_response()
         self.inst = self._connection_open_ethernet(s_ip_address)
 
     def _connection_open_ethernet(self, s_ip_address):
@@ -33,50 +192,296 @@ class InstrumentLockin7270:
                 return None
 
             print('通过Ethernet开启连接...')
-            inst = self.rm.open_resource('TCPIP0::' + s_ip_address + '::50001::SOCKET')
+            inst = self.pool.open('TCPIP0::' + s_ip_address + '::50001::SOCKET', probe=self.probe)
+            # 让 VISA 在终止符处结束读取，这样一次 read 就能取回整条应答
+            inst.read_termination = self.terminator
             return inst
 
         except Exception as e:
             print(f"打开连接时出错: {e}")
             return None
-        # 使用 self.rm 替代 rm, 返回 inst 而不是将其设置为属性
 
-    def _query_device(self, cdm, retries=10, delay=3):
+    @classmethod
+    def probe(cls, resource):
+        """资源池的存活检查：7270 不支持 *IDN?，用 ID 查询型号，跳过之前留下的 NULL 确认。"""
+        resource.write_raw(b'ID\r')
+        for _ in range(4):
+            response = resource.read_raw(cls.READ_CHUNK).decode('utf8', errors='replace').replace('\0', '').strip()
+            if response:
+                return response
+        raise RuntimeError('No response to ID')
+
+    def _write_command(self, cmd):
+        """发送一条命令 (自动追加 CR 终止符)；上一次交互遗留的应答作废。"""
+        self._responses = []
+        self.inst.write_raw((cmd + '\r').encode('ascii'))
+
+    def _read_response(self, timeout=None):
+        """
+        批量读取一条应答，直到终止符为止，没有逐字符的等待。NULL 和 CR 都结束一条应答：
+        VISA 读到终止符为止，一帧中以 CR 分隔的多条应答依次返回，应答末尾的 CR 被去掉。
+
+        参数:
+            timeout (float): 本次读取的总超时预算 (s)，默认使用 self.query_timeout。
+
+        返回:
+            str: 去掉终止符和首尾空白后的应答；超时则返回空字符串。
+        """
+        if self._responses:
+            return self._responses.pop(0)
+        budget = self.query_timeout if timeout is None else timeout
+        deadline = time.perf_counter() + budget
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return ''
+            self.inst.timeout = max(1, int(remaining * 1000))
+            try:
+                raw = self.inst.read_raw(self.READ_CHUNK)
+            except pyvisa.errors.VisaIOError as e:
+                if e.error_code == pyvisa.constants.StatusCode.error_timeout:
+                    return ''
+                raise
+            text = raw.decode('utf8', errors='replace')
+            responses = [r.strip() for r in self.RESPONSE_SEPARATORS.split(text) if r.strip()]
+            if responses:
+                self._responses = responses[1:]
+                return responses[0]
+            # 空帧是之前设置命令留下的 NULL 确认，跳过后继续读取
+
+    def _record_latency(self, latency):
+        self.last_query_latency = latency
+        self.query_stats['count'] += 1
+        self.query_stats['total'] += latency
+        self.query_stats['max'] = max(self.query_stats['max'], latency)
+
+    def query_latency_stats(self):
+        """
+        返回查询延迟统计，用于对比优化前后的通信耗时。
+
+        返回:
+            dict: count (次数), mean / max / last (s)。
+        """
+        count = self.query_stats['count']
+        return {
+            'count': count,
+            'mean': self.query_stats['total'] / count if count else 0.0,
+            'max': self.query_stats['max'],
+            'last': self.last_query_latency,
+        }
+
+    def reset_query_stats(self):
+        self.last_query_latency = None
+        self.query_stats = {'count': 0, 'total': 0.0, 'max': 0.0}
+
+    def _query_device(self, cdm, retries=10, delay=3, timeout=None):
+        response = ''
         for attempt in range(retries):
-            self.inst.clear()
-            time.sleep(0.1)
-            print(f'Send query command: {cdm}')
-            self.inst.write_raw(cdm + '\r')
-            time.sleep(1)  # Wait for 100 milliseconds
-
-            response = ''
-            while True:
-                try:
-                    char = self.inst.read_bytes(1).decode('utf8')
-                    if char == '\0' or char == '\r':
-                        break
-                    response += char
-                    time.sleep(0.05)
-                except pyvisa.errors.VisaIOError as e:
-                    if e.error_code == pyvisa.constants.StatusCode.error_timeout:
-                        print('Read timeout, retrying...')
-                        time.sleep(0.05)
-                        continue  # If timeout, continue trying to read
-                    else:
-                        raise  # If it's another error, raise the exception
-
-            print(f'Raw Response: {response}')  # Debug: Print raw response string
-            self.inst.clear()
+            start = time.perf_counter()
+            self._write_command(cdm)
+            response = self._read_response(timeout)
+            latency = time.perf_counter() - start
+            self._record_latency(latency)
+            print(f'Query {cdm.strip()} -> {response} ({latency * 1000:.1f} ms)')
             if response:  # Check if response is not empty
                 return response
-            else:
-                print(f'No response, retrying in {delay} seconds... (Attempt {attempt + 1}/{retries})')
-                time.sleep(delay)
+            print(f'No response, retrying in {delay} seconds... (Attempt {attempt + 1}/{retries})')
+            self.inst.clear()  # 超时后清空缓冲区，重新与仪器同步
+            self._responses = []
+            time.sleep(delay)
 
         print(f'Error: No response from device after {retries} attempts')
         return response
         # 使用 self.inst 替代 inst
 
+    def _query_fields(self, cmd, n_fields, timeout=None, retries=3, delay=1):
+        """
+        发送一条 (复合) 查询命令，收集至少 n_fields 个数值字段。
+
+        复合命令的各段应答可能在同一帧中以逗号分隔，也可能分多帧返回，这里统一按分隔符拆分。
+        """
+        budget = self.query_timeout if timeout is None else timeout
+        fields = []
+        for attempt in range(retries):
+            start = time.perf_counter()
+            deadline = start + budget
+            self._write_command(cmd)
+            fields = []
+            while len(fields) < n_fields:
+                remaining = deadline - time.perf_counter()
+                response = self._read_response(remaining) if remaining > 0 else ''
+                if not response:
+                    break
+                fields.extend(f for f in re.split(r'[,;\s]+', response) if f)
+            self._record_latency(time.perf_counter() - start)
+            if len(fields) >= n_fields:
+                return fields[:n_fields]
+            print(f'Incomplete response to {cmd}: {fields} (Attempt {attempt + 1}/{retries})')
+            self.inst.clear()
+            self._responses = []
+            time.sleep(delay)
+        raise RuntimeError(f'No complete response to {cmd} after {retries} attempts')
+
+    def _select_outputs(self, outputs):
+        """设置 CBD 位掩码，选择 '?.' 与曲线缓存记录的输出；掩码未变时不重复写入。"""
+        mask = 0
+        for name in outputs:
+            mask |= 1 << self.OUTPUT_BITS[name]
+        if mask != self._output_mask:
+            self._write_command(f'CBD {mask}')
+            self._output_mask = mask
+
+    def acquire(self, timeout=None):
+        """
+        一次往返读取两个解调器的 X、Y、MAG、PHA、SEN 以及过载字节。
+
+        使用 CBD 选定输出后发送复合命令 '?.;N'，替代逐个 MAG/PHA/SEN 查询。
+
+        返回:
+            LockinRecord: 两个解调器的读数、过载字节和采集时刻 (time.monotonic())。
+        """
+        self._select_outputs(self.ACQUIRE_OUTPUTS)
+        start = time.monotonic()
+        fields = self._query_fields('?.;N', len(self.ACQUIRE_OUTPUTS) + 1, timeout)
+        timestamp = (start + time.monotonic()) / 2
+        return self.record_from_fields(fields, timestamp)
+
+    @classmethod
+    def record_from_fields(cls, fields, timestamp):
+        """把 '?.;N' 的应答字段 (ACQUIRE_OUTPUTS 顺序，最后为过载字节) 解析为 LockinRecord。"""
+        values = dict(zip(cls.ACQUIRE_OUTPUTS, (float(f) for f in fields[:-1])))
+        overload_byte = int(float(fields[-1]))
+        readings = []
+        for n, overload in zip((1, 2), cls.demod_overloads(overload_byte)):
+            readings.append(LockinReading(
+                magnitude=values[f'MAG{n}'],
+                phase=values[f'PHA{n}'],
+                x=values[f'X{n}'],
+                y=values[f'Y{n}'],
+                # SEN 位返回 "档位 + 32 × IMODE"
+                sensitivity=int(values[f'SEN{n}']) % 32,
+                overload=overload,
+            ))
+        return LockinRecord(readings[0], readings[1], overload_byte, timestamp)
+
+    @classmethod
+    def demod_overloads(cls, overload_byte):
+        """由过载字节得到 (解调器1 过载, 解调器2 过载)；输入过载对两者都有效。"""
+        def bit(name):
+            return bool(overload_byte & (1 << cls.OVERLOAD_BITS[name]))
+
+        demod1 = bit('input') or bit('ch1_output') or bit('x_output') or bit('y_output')
+        demod2 = bit('input') or bit('ch2_output')
+        return demod1, demod2
+
+    def query_overload_byte(self):
+        """读取过载字节 (N)，位定义见 OVERLOAD_BITS。"""
+        return int(float(self._query_device('N')))
+
+    def arm_burst(self, n_points, interval_ms, outputs=None):
+        """
+        设置并启动内部曲线缓存采集 (burst 模式)。
+
+        参数:
+            n_points (int): 每条曲线的采样点数 (LEN)。
+            interval_ms (int): 采样间隔 (STR, ms)。
+            outputs (tuple): 要记录的输出，默认与 acquire() 相同，避免来回改写 CBD。
+        """
+        outputs = tuple(outputs or self.ACQUIRE_OUTPUTS)
+        self._select_outputs(outputs)
+        self._write_command(f'LEN {int(n_points)}')
+        self._write_command(f'STR {int(interval_ms)}')
+        self._write_command('NC')   # 清空曲线缓存
+        self._write_command('TD')   # 开始采集
+        self._burst = {'outputs': outputs, 'n_points': int(n_points),
+                       'interval': interval_ms / 1000.0, 'start': time.monotonic()}
+
+    def wait_burst(self, timeout=None, poll_interval=0.05):
+        """
+        等待 arm_burst() 启动的采集结束。先按预计时长休眠，再用 M 命令轮询曲线状态。
+
+        返回:
+            bool: 采集在超时前完成则为 True。
+        """
+        burst = self._burst
+        duration = burst['n_points'] * burst['interval']
+        timeout = timeout if timeout is not None else duration + 5.0
+        remaining = burst['start'] + duration - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        deadline = burst['start'] + timeout
+        while time.monotonic() < deadline:
+            # M 返回: 曲线状态, 扫描次数, 状态字节, 已采集点数；状态 0 表示采集结束
+            status = self._query_fields('M', 4)
+            if int(float(status[0])) == 0:
+                return True
+            time.sleep(poll_interval)
+        print('Warning: curve buffer acquisition did not finish before timeout')
+        return False
+
+    def read_burst(self, timeout=None):
+        """
+        一次批量导出曲线缓存 (DCT: 按表格输出 CBD 选中的全部曲线，每行一个采样点)。
+
+        返回:
+            BurstCapture: 全部采样与过载字节。
+        """
+        burst = self._burst
+        outputs, n_points = burst['outputs'], burst['n_points']
+        # 导出量与点数成正比，超时预算随之放大
+        budget = timeout if timeout is not None else self.query_timeout + n_points * 0.002
+        fields = self._query_fields('DCT', n_points * len(outputs), timeout=budget)
+        values = np.asarray(fields, dtype=float).reshape(n_points, len(outputs)).T
+        t = np.arange(n_points) * burst['interval']
+        return BurstCapture(outputs, t, values, burst['start'], self.query_overload_byte())
+
+    def _read_magnitude_and_fs(self, demod):
+        """一次采集同时返回指定解调器的 MAG 和满量程 FS (V)。"""
+        reading = self.acquire().demod(demod)
+        return reading.magnitude, reading.full_scale
+
+    def query_time_constant(self, demod=None, retries=10, delay=3):
+        """读取时间常数 (s)。demod 为 1/2 时查询双模式下对应解调器。"""
+        suffix = '' if demod is None else str(demod)
+        return float(self._query_device(f'TC{suffix}.', retries, delay))
+
+    def query_filter_slope(self, demod=None, retries=10, delay=3):
+        """读取输出滤波器滚降 (dB/oct)。"""
+        suffix = '' if demod is None else str(demod)
+        return self.SLOPE_DB[int(float(self._query_device(f'SLOPE{suffix}', retries, delay)))]
+
+    def filter_settings(self, refresh=False):
+        """
+        返回两个解调器的 [(TC (s), slope (dB/oct)), ...]，结果缓存，refresh=True 时重新读取。
+        读取失败时返回空列表且不缓存；失败后 FILTER_RETRY_INTERVAL 内不再自动查询
+        (否则每次 settling_time() 都会重走 _query_device 的重试)，之后或 refresh=True 时重新读取。
+        """
+        if refresh or (self._filter is None and time.monotonic() >= self._filter_retry_at):
+            try:
+                self._filter = [(self.query_time_constant(d, self.FILTER_QUERY_RETRIES, 0.5),
+                                 self.query_filter_slope(d, self.FILTER_QUERY_RETRIES, 0.5)) for d in (1, 2)]
+                print(f'Lock-in filter settings (TC s, dB/oct): {self._filter}')
+            except Exception as e:
+                print(f"读取滤波器设置时出错: {e}")
+                self._filter = None
+                self._filter_retry_at = time.monotonic() + self.FILTER_RETRY_INTERVAL
+        return self._filter or []
+
+    def settling_time(self, multiples=1.0, refresh=False, fallback=FALLBACK_SETTLE):
+        """
+        输出滤波器的有效稳定时间 (达到 99%) 乘以 multiples，单位 s；取两个解调器中较慢的一个。
+
+        参数:
+            multiples (float): 稳定时间的倍数。
+            refresh (bool): 是否重新读取 TC 与 SLOPE。
+            fallback (float): 无法读取滤波器设置时使用的稳定时间 (s)；为 None 时返回 None，
+                              由调用方选择更保守的等待。
+        """
+        settings = self.filter_settings(refresh)
+        if not settings:
+            return None if fallback is None else multiples * fallback
+        return multiples * max(self.SETTLE_TC_99[slope] * tc for tc, slope in settings)
+
     # 文件名: lockin7270_controller.py
 # 在 InstrumentLockin7270 类中添加以下方法
 
@@ -87,13 +492,53 @@ class InstrumentLockin7270:
             harmonic_order (int): 1 表示基频 (1f), 2 表示倍频 (2f) 等。
         """
         try:
+            if self.dual_harmonics is not None:
+                self._write_command('REFMODE 0')  # 回到单参考模式
+                self.dual_harmonics = None
             command = f'REFN {harmonic_order}' 
             print(f'Setting harmonic detection to: {harmonic_order}omega')
-            self.inst.write_raw(command + '\r')
-            time.sleep(1) # 等待设置生效
+            self._write_command(command)
+            self.harmonic = harmonic_order
+            time.sleep(self.settling_time())  # 等待输出滤波器重新稳定
         except Exception as e:
             print(f"设置谐波次数时出错: {e}")
 
+    def set_dual_harmonic(self, harmonic1, harmonic2):
+        """
+        双谐波模式 (REFMODE 1)：两个解调器同时检测同一参考的不同谐波，一次 acquire() 同时得到两者。
+        只需设置一次，之后每个测量点不再切换谐波、不再等待滤波器重新稳定。
+
+        参数:
+            harmonic1 (int): 解调器 1 的谐波次数 (例如 1)。
+            harmonic2 (int): 解调器 2 的谐波次数 (例如 2)。
+        """
+        try:
+            print(f'Setting dual harmonic mode: demod1 {harmonic1}omega, demod2 {harmonic2}omega')
+            self._write_command('REFMODE 1')
+            self._write_command(f'REFN1 {harmonic1}')
+            self._write_command(f'REFN2 {harmonic2}')
+            self.dual_harmonics = (harmonic1, harmonic2)
+            self.harmonic = harmonic2
+            time.sleep(self.settling_time(refresh=True))  # 两个解调器的 TC 可能不同，重新读取
+        except Exception as e:
+            print(f"设置双谐波模式时出错: {e}")
+            self.dual_harmonics = None
+
+    def demod_harmonic(self, demod):
+        """解调器 demod (1/2) 当前检测的谐波次数。"""
+        if self.dual_harmonics is not None:
+            return self.dual_harmonics[demod - 1]
+        return self.harmonic
+
+    def signal_demod(self):
+        """携带扫描谐波的解调器：1f/nf 双谐波模式下为解调器 2 (解调器 1 检测 1f)，否则为解调器 1。"""
+        return 2 if self.dual_harmonics is not None and self.dual_harmonics[0] == 1 else 1
+
+    def query_harmonic(self):
+        """读取当前检测谐波次数 (REFN) 并缓存。"""
+        self.harmonic = int(float(self._query_device('REFN')))
+        return self.harmonic
+
     def set_reference_phase(self, phase):
         """
         设置参考相位 (可选，用于对齐信号)。
@@ -131,13 +576,50 @@ class InstrumentLockin7270:
             raise ValueError('Error: No suitable sensitivity found')
         return max(suitable_keys)
 
+    def best_sensitivity_key(self, value, high_ratio=0.90):
+        """满足 value <= high_ratio * FS 的最小档位；超出最大量程时返回最大档位。"""
+        for key, fs in sorted(self.SENSITIVITY_SCALE.items(), key=lambda kv: kv[1]):
+            if value <= high_ratio * fs:
+                return key
+        return max(self.SENSITIVITY_SCALE)
+
+    def sensitivity_ok(self, reading, low_ratio=0.10, high_ratio=0.90):
+        """
+        判断读数 (LockinReading) 的档位是否合适：无过载、不超过 high_ratio * FS，
+        且不低于 low_ratio * FS (已在最小档位时除外)。
+        """
+        fs = reading.full_scale
+        if fs is None or reading.overload:
+            return False
+        value = abs(reading.magnitude)
+        if value > high_ratio * fs:
+            return False
+        return value >= low_ratio * fs or reading.sensitivity == min(self.SENSITIVITY_SCALE)
+
+    def preset_sensitivity(self, demod, expected, current_key=None, high_ratio=0.90):
+        """
+        按预计幅值 expected (V) 设置解调器 demod 的 SEN 档位；与 current_key 相同时不发送命令。
+
+        返回:
+            int: 设置后的档位。
+        """
+        key = self.best_sensitivity_key(expected, high_ratio)
+        if key != current_key:
+            print(f"Presetting SEN{demod} {key} for expected {expected:.3e} V")
+            self._write_command(f"SEN{demod} {key}")
+        return key
+
     def adjust_sensitivity(self, sen_function, query_function, cmd_prefix, max_attempts=3,
-                       low_ratio=0.10, high_ratio=0.90, settle_time=1.0):
+                       low_ratio=0.10, high_ratio=0.90, settle_time=None, read_function=None):
         """
     自动调整灵敏度(SEN)，让信号幅值落在 [low_ratio, high_ratio] * FS 范围内。
     注意：这里假设 sen_function() 返回的是满量程电压 FS (V)，
          所以 query_sensitivity1/2 需要做 key->FS 映射（上面已给出）。
+    若给出 read_function()，则用它一次性返回 (幅值, FS)，代替分别调用两个查询函数。
+    settle_time 默认为一个滤波器稳定时间 (见 settling_time())。
     """
+        if settle_time is None:
+            settle_time = self.settling_time()
         attempts = 0
 
         # 按 FS 从小到大排序
@@ -145,9 +627,14 @@ class InstrumentLockin7270:
         min_key, min_fs = scale_items[0]
         max_key, max_fs = scale_items[-1]
 
+        def read_value_and_fs():
+            if read_function is not None:
+                value, fs = read_function()
+                return float(value), float(fs)
+            return float(query_function()), float(sen_function())
+
         while attempts < max_attempts:
-            target_value = float(query_function())   # e.g. MAG1 (V)
-            current_fs = float(sen_function())       # FS (V)
+            target_value, current_fs = read_value_and_fs()   # e.g. MAG1 (V), FS (V)
 
             # 当前档位已合适
             if (low_ratio * current_fs) <= target_value <= (high_ratio * current_fs):
@@ -170,14 +657,11 @@ class InstrumentLockin7270:
 
             command = f"{cmd_prefix.strip()} {suitable_key}"
             print(f"Send set sensitivity command: {command}")
-            self.inst.clear()
-            time.sleep(0.05)
-            self.inst.write_raw(command + "\r")
-            time.sleep(settle_time)  # 原来 60s 太长，这里默认 1s，可按 time constant 调大
+            self._write_command(command)
+            time.sleep(settle_time)
 
             # 验证设置是否合理
-            updated_fs = float(sen_function())
-            updated_value = float(query_function())
+            updated_value, updated_fs = read_value_and_fs()
             print(f"Updated sensitivity FS: {updated_fs}, Updated value: {updated_value}")
 
             if (low_ratio * updated_fs) <= updated_value <= (high_ratio * updated_fs):
@@ -190,36 +674,77 @@ class InstrumentLockin7270:
     print("Warning: Unable to find suitable sensitivity setting after multiple attempts.")
 
     def set_sensitivity1(self, max_attempts=3):
-        self.adjust_sensitivity(self.query_sensitivity1, self.query_voltage1, 'SEN1 ', max_attempts)
+        self.adjust_sensitivity(self.query_sensitivity1, self.query_voltage1, 'SEN1 ', max_attempts,
+                                read_function=lambda: self._read_magnitude_and_fs(1))
 
     def set_sensitivity2(self, max_attempts=3):
-        self.adjust_sensitivity(self.query_sensitivity2, self.query_voltage2, 'SEN2 ', max_attempts)
+        self.adjust_sensitivity(self.query_sensitivity2, self.query_voltage2, 'SEN2 ', max_attempts,
+                                read_function=lambda: self._read_magnitude_and_fs(2))
 
     def disable_automatic_acgain(self):
         """Disables the automatic AC gain."""
-        self.inst.write_raw("AUTOMATIC 0" +'\r')
-        time.sleep(1)
+        self._write_command("AUTOMATIC 0")
+        time.sleep(self.settling_time())
 
     def query_acgain(self):
        return self._query_device(cdm='ACGAIN')
 
     def set_acgain(self, gain_key):
         """Sets the AC gain to the provided key value."""
-        command = f"ACGAIN {gain_key}"+'\r'
+        command = f"ACGAIN {gain_key}"
         print(command)
-        self.inst.write_raw(command)
-        time.sleep(1)
+        self._write_command(command)
+        self.acgain = int(gain_key)
+        time.sleep(self.settling_time())
 
     def optimize_acgain(self):
         """Optimizes the AC gain."""
         self.disable_automatic_acgain()
         current_gain_key = self.query_acgain()
         optimized_gain_key = int(current_gain_key) + 5
-        if optimized_gain_key>11:
-            self.set_acgain(11)
+        if optimized_gain_key > self.ACGAIN_MAX:
+            self.set_acgain(self.ACGAIN_MAX)
         else:
             self.set_acgain(optimized_gain_key)
-        time.sleep(1)
+
+    def restore_state(self, state):
+        """
+        恢复运行日志中记录的仪器状态 (见 run_journal.lockin_state)。
+
+        参数:
+            state (dict): harmonic、dual_harmonics、acgain、sen1、sen2，值为 None 的项跳过。
+        """
+        if state.get('dual_harmonics'):
+            self.set_dual_harmonic(*state['dual_harmonics'])
+        elif state.get('harmonic') is not None:
+            self.set_harmonic(state['harmonic'])
+        if state.get('acgain') is not None:
+            self._write_command("AUTOMATIC 0")
+            self.set_acgain(state['acgain'])
+        for n in (1, 2):
+            if state.get(f'sen{n}') is not None:
+                self._write_command(f"SEN{n} {state[f'sen{n}']}")
+
+    def step_acgain(self, step):
+        """
+        关闭自动 ACGAIN 并将其相对调整 step 档 (限制在 0 ~ ACGAIN_MAX)。
+
+        返回:
+            int: 新档位；已在边界无需调整时返回 None。
+        """
+        self._write_command("AUTOMATIC 0")
+        current = int(float(self.query_acgain()))
+        new = min(max(current + step, 0), self.ACGAIN_MAX)
+        if new == current:
+            return None
+        self.set_acgain(new)
+        return new
+
+    def input_underranged(self, reading, low_ratio=0.10):
+        """已在最小 SEN 档位但幅值仍低于 low_ratio * FS，说明 ACGAIN 偏低。"""
+        fs = reading.full_scale
+        return (fs is not None and reading.sensitivity == min(self.SENSITIVITY_SCALE)
+                and abs(reading.magnitude) < low_ratio * fs)
 
 
     def set_automatic_acgain(self):
@@ -231,10 +756,8 @@ class InstrumentLockin7270:
             """
         try:
             print('开启 ACGAIN 自动调整...')
-            self.inst.clear()
-            time.sleep(0.05)
-            self.inst.write_raw('AUTOMATIC 1\r')
-            time.sleep(1)  # 等待一会儿以确保命令已经生效
+            self._write_command('AUTOMATIC 1')
+            time.sleep(self.settling_time())  # 等待输出滤波器重新稳定
             print('ACGAIN 自动调整已开启')
         except Exception as e:
             print(f"设置 ACGAIN 自动调整时出错: {e}")
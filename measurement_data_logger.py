@@ -3,9 +3,15 @@ import pandas as pd
 import time
 import os
 from PyQt5.QtCore import QObject, pyqtSignal
-from MultiPyVu import MultiVuClient as mvc
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from lockin7270_controller import LockinRecord
+from ppms_session import PPMSSession
+from run_writer import RunFileWriter, AsyncRowWriter
+from column_store import ColumnStore
+from run_binary import BinaryRunWriter
+from run_journal import RunJournal, lockin_state
 
 
 class DataLogger(QObject):
@@ -19,24 +25,58 @@ class DataLogger(QObject):
 
     updateTemperatureAmplitude = pyqtSignal(float, float)
 
-    def __init__(self):
+    LOCKIN_PREFIXES = ('L1_', 'L2_')
+    BURST_COLUMNS = ('Voltage1_std', 'Voltage1_slope', 'Voltage3_std', 'Voltage3_slope', 'Burst-Samples')
+
+    def __init__(self, ppms_session=None):
         super().__init__()
+        # Shared long-lived PPMS connection (also used by MeasurementThread and the GUI)
+        self.ppms_session = ppms_session or PPMSSession()
+        self.telemetry = None  # Optional PPMSTelemetry; T/F are then interpolated to the lock-in read time
         # Only store the essential channels used by the measurement
         # We keep two voltage channels (Voltage1 = longitudinal, Voltage3 = transverse)
         # and basic measurement metadata (temperature, field, currents).
-        self.data = {
-            'Temperature': [], 'Field': [],
-            'Current-AC': [],
-            'Current-AC-Squared': [],
-            'Current-DC': [],
-            'Voltage1': [],  # Longitudinal (used for Fig.1e/1f & Fig.2a)
-            'Voltage3': [],  # Transverse (used for Fig.2b)
-            'Voltage1_1f': [],  # 1f voltage for R-T
-        }
+        columns = [
+            'Temperature', 'Field',
+            'Current-AC',
+            'Current-AC-Squared',
+            'Current-DC',
+            'Voltage1',  # Longitudinal (used for Fig.1e/1f & Fig.2a)
+            'Voltage3',  # Transverse (used for Fig.2b)
+            'Voltage1_1f',  # 1f voltage for R-T
+        ]
+        # Full lock-in records (both demodulators): L1_* from inst1, L2_* from inst2
+        for prefix in self.LOCKIN_PREFIXES:
+            columns.extend(LockinRecord.column_names(prefix))
+        # Burst statistics (NaN when the point was taken with a single read)
+        columns.extend(self.BURST_COLUMNS)
+        # float64 columnar store: O(1) append, zero-copy column views for plotting/fitting
+        self.data = ColumnStore(columns)
+        self.burst_points = 0  # 0 = single acquire() per point
+        self.burst_interval_ms = 20
         self.lines = []
         self.fig = None
         self.axes = None
         self.save_directory = os.getcwd()
+        # Streaming run file: opened on the first point, one row appended per point
+        self.run_writer = None
+        self.flush_every = 1
+        self.fsync = False
+        # Disk writes happen on this worker so filesystem latency never delays acquisition
+        self.row_writer = AsyncRowWriter()
+        self.row_writer.start()
+        # Both lock-ins (and the PPMS when there is no telemetry) are read in parallel each point
+        self.acquisition_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='acquire')
+        # Optional binary run (float64 chunks + JSON sidecar) next to the text file;
+        # in burst mode the raw curve-buffer samples go to a second binary run (<name>_burst)
+        self.write_binary = False
+        self.run_config = {}
+        self.binary_writer = None
+        self.burst_writer = None
+        self._pending_burst = None
+        self._binary_suffix = ''  # set when resuming, so existing binary chunks are not overwritten
+        # Run journal next to the run file: one record per completed (T setpoint, amplitude) step
+        self.journal = None
         self.use_1f_for_rt = False  # Initialize here
 
     def init_plot(self):
@@ -91,59 +131,46 @@ class DataLogger(QObject):
         self.active_mode = None
         self.set_mode('fig1ef')
 
-    def plot_data(self):
-        L = len(self.data['Current-AC'])
-        if L == 0:
-            return
-
-        I = np.array(self.data['Current-AC'][:L])
-        V_long = np.array(self.data['Voltage1'][:L])   # 2ω
-        V_trans = np.array(self.data['Voltage3'][:L])  # 4ω
-        V_1f = np.array(self.data['Voltage1_1f'][:L])   # 1f for R-T
-        T = np.array(self.data['Temperature'][:L]) if self.data['Temperature'] else np.array([])
-        I_dc_arr = np.array(self.data['Current-DC'][:L]) if self.data['Current-DC'] else np.zeros(L)
-
+    def line_data(self):
+        """(axis, line, x, y) for every line of the active mode, computed from zero-copy column views."""
+        L = len(self.data)
+        if L == 0 or self.active_mode not in self.modes:
+            return []
+
+        # Slice every column to the same L: the measurement thread may append a row meanwhile
+        I = self.data['Current-AC'][:L]
+        V_long = self.data['Voltage1'][:L]   # 2ω
+        V_trans = self.data['Voltage3'][:L]  # 4ω
+        V_1f = self.data['Voltage1_1f'][:L]   # 1f for R-T
+        T = self.data['Temperature'][:L]
+        I_dc_arr = self.data['Current-DC'][:L]
+
+        axes = self.modes[self.active_mode]['axes']
+        lines = self.modes[self.active_mode]['lines']
         if self.active_mode == 'fig1ef':
-            lines = self.modes['fig1ef']['lines']
-            lines[0].set_data(I, V_long)       # 1e
-            lines[1].set_data(I**2, V_long)    # 1f
-
-            # Autoscale axes used by fig1ef
-            for ax in self.modes['fig1ef']['axes']:
-                ax.relim()
-                ax.autoscale_view()
+            return [(axes[0], lines[0], I, V_long),       # 1e
+                    (axes[1], lines[1], I**2, V_long)]    # 1f
 
         elif self.active_mode == 'rt':
-            lines = self.modes['rt']['lines']
-            if len(T) > 0:
-                V_for_R = V_1f if self.use_1f_for_rt and len(V_1f) > 0 else V_long
-                with np.errstate(divide='ignore', invalid='ignore'):
-                    R = np.where(I_dc_arr != 0, V_for_R / I_dc_arr, np.nan)
-                lines[2].set_data(T, R)       # R-T
-
-            # Autoscale axes used by rt
-            for ax in self.modes['rt']['axes']:
-                ax.relim()
-                ax.autoscale_view()
+            V_for_R = V_1f if self.use_1f_for_rt else V_long
+            with np.errstate(divide='ignore', invalid='ignore'):
+                R = np.where(I_dc_arr != 0, V_for_R / I_dc_arr, np.nan)
+            return [(axes[2], lines[2], T, R)]           # R-T
 
         elif self.active_mode == 'fig2':
-            lines = self.modes['fig2']['lines']
-            lines[0].set_data(I, V_long)       # 2a
-            lines[1].set_data(I, V_trans)      # 2b
+            return [(axes[0], lines[0], I, V_long),       # 2a
+                    (axes[1], lines[1], I, V_trans)]      # 2b
+        return []
 
-            # Autoscale axes used by fig2 (top row axes)
-            for ax in self.modes['fig2']['axes']:
+    def plot_data(self):
+        """Set the full line data and autoscale the active axes (the GUI normally uses BlitPlotRenderer)."""
+        for ax, line, x, y in self.line_data():
+            line.set_data(x, y)
+        if self.active_mode in self.modes:
+            for ax in self.modes[self.active_mode]['axes']:
                 ax.relim()
                 ax.autoscale_view()
 
-        return
-
-    def _update_data(self, key, value):
-        try:
-            self.data[key].append(value)
-        except KeyError:
-            print(f"Error: Key '{key}' not found in data dictionary.")
-
     def set_mode(self, mode_key: str):
 
         print(f"set_mode called with: {mode_key}")
@@ -228,68 +255,317 @@ class DataLogger(QObject):
         self.use_1f_for_rt = use_1f
 
     def save_data_to_txt(self, filename_prefix=None):
+        """Rewrite the whole dataset in one go (snapshot export; per-point saving uses append_row_to_txt)."""
         try:
-            filename_prefix = filename_prefix or self.DEFAULT_FILENAME_PREFIX
-            last_temp = self.data['Temperature'][-1] if self.data['Temperature'] else 'Unknown'
-            temperature_suffix = f"{round(last_temp, 2)}K"
-            current_date = datetime.datetime.now().strftime('%Y-%m-%d')
-            filename = f"{filename_prefix}_{temperature_suffix}_{current_date}.txt"
-
             # 将文件名与保存目录结合
-            full_path = os.path.join(self.save_directory, filename)
+            full_path = self._run_filename(filename_prefix)
 
-            df = pd.DataFrame(self.data)
+            df = pd.DataFrame(self.data.to_dict())
             df.to_csv(full_path, sep='\t', index=False)
             print(f"Data saved to {full_path}.")
         except Exception as e:
             print(f"Error saving data: {e}")
 
+    def set_telemetry(self, telemetry):
+        self.telemetry = telemetry
+
+    def _temperature_and_field_at(self, t):
+        """T/F at monotonic time `t` from the telemetry buffer, or a direct PPMS read without telemetry.
+
+        When the telemetry has no sample within one poll interval of `t` (PPMS polling failing or
+        stalled) the PPMS is read directly; if that fails too, T/F are NaN rather than a stale value.
+        """
+        if self.telemetry is not None and self.telemetry.is_alive():
+            interval = self.telemetry.interval
+            if self.telemetry.wait_until(t, timeout=2 * interval + 1.0):
+                values = self.telemetry.interpolate(t, max_gap=interval)
+                if values is not None:
+                    return values
+            print("PPMS telemetry has no recent sample, reading T/F directly")
+        try:
+            T, sT, F, sF = self.ppms_session.get_temperature_and_field()
+        except Exception as e:
+            print(f"Error reading PPMS, storing NaN for T/F: {e}")
+            return np.nan, np.nan
+        return T, F
+
+    def _run_filename(self, filename_prefix=None):
+        filename_prefix = filename_prefix or self.DEFAULT_FILENAME_PREFIX
+        last_temp = self.data['Temperature'][-1] if len(self.data) else 'Unknown'
+        temperature_suffix = f"{round(last_temp, 2)}K" if last_temp != 'Unknown' else last_temp
+        # Time of day keeps two runs at the same temperature on the same day in separate files
+        current_date = datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S')
+        base = os.path.join(self.save_directory, f"{filename_prefix}_{temperature_suffix}_{current_date}")
+        # Run files are only ever appended to on resume, so never hand out a name that exists
+        path, n = base + '.txt', 1
+        while os.path.exists(path):
+            path, n = f"{base}_{n}.txt", n + 1
+        return path
+
+    def set_write_policy(self, flush_every=1, fsync=False):
+        """flush_every: rows between flushes (0 = only on close); fsync: also force data to disk."""
+        self.flush_every = flush_every
+        self.fsync = fsync
+
+    def set_binary_output(self, enabled, run_config=None):
+        """Also write each run as a binary run (see run_binary.py); `run_config` goes into its JSON sidecar."""
+        self.write_binary = enabled
+        self.run_config = run_config or {}
+
+    def append_row_to_txt(self, filename_prefix=None):
+        """Queue the latest point for the run file(s); the writer thread opens them and writes headers on first use.
+
+        Blocks only when the write queue is full (backpressure).
+        """
+        try:
+            if len(self.data) == 0:
+                return
+            row = self.data.last_row()
+            if self.run_writer is None:
+                self.run_writer = RunFileWriter(self._run_filename(filename_prefix), self.data.keys(),
+                                                flush_every=self.flush_every, fsync=self.fsync)
+                print(f"Writing data to {self.run_writer.path}.")
+                if self.journal is None:
+                    self.journal = RunJournal(self.run_writer.path, self.run_config)
+            self.row_writer.submit(self.run_writer, row)
+
+            if self.write_binary:
+                base_path = os.path.splitext(self.run_writer.path)[0] + self._binary_suffix
+                if self.binary_writer is None:
+                    self.binary_writer = BinaryRunWriter(base_path, self.data.keys(), self.run_config, fsync=self.fsync)
+                self.row_writer.submit(self.binary_writer, row)
+                if self._pending_burst is not None:
+                    columns, samples = self._pending_burst
+                    if self.burst_writer is None:
+                        self.burst_writer = BinaryRunWriter(base_path + '_burst', columns, self.run_config,
+                                                            fsync=self.fsync)
+                    self.row_writer.submit(self.burst_writer, samples)
+            self._pending_burst = None
+        except Exception as e:
+            print(f"Error saving data: {e}")
+
+    def close_run_file(self):
+        """Queue closing of the current run file(s); the next point starts new ones."""
+        for attr in ('binary_writer', 'burst_writer', 'run_writer'):
+            writer = getattr(self, attr)
+            if writer is not None:
+                self.row_writer.submit(writer, None)
+                print(f"Data saved to {writer.path}.")
+                setattr(self, attr, None)
+
+    def journal_point(self, T_set, amplitude, lockins):
+        """Queue a journal record for the point just saved.
+
+        The run file is fsync'd first in the same queue, so a point is only marked done once its row is on disk,
+        whatever the run file's flush policy.
+        """
+        if self.journal is None or len(self.data) == 0:
+            return
+        row = self.data.last_row()
+        states = [lockin_state(inst, row, prefix) for inst, prefix in zip(lockins, self.LOCKIN_PREFIXES)]
+        self.row_writer.submit(self.run_writer, AsyncRowWriter.SYNC)
+        self.row_writer.submit(self.journal, RunJournal.point_record(self.run_writer.path, T_set, amplitude,
+                                                                     len(self.data) - 1, states))
+
+    def close_journal(self):
+        """Queue closing of the run journal; it spans every run file of one measurement."""
+        if self.journal is not None:
+            self.row_writer.submit(self.journal, None)
+            self.journal = None
+
+    def resume_run(self, info):
+        """Continue the run described by RunJournal.load(): reload its rows and append to the same files."""
+        path = info['run_file']
+        self.close_run_file()
+        self.data.clear()
+        try:
+            previous = pd.read_csv(path, sep='\t')
+            for record in previous.to_dict('records'):
+                self._append_row({k: v for k, v in record.items() if k in self.data})
+            columns = list(previous.columns)
+        except Exception as e:
+            print(f"Error reloading {path}: {e}")
+            columns = self.data.keys()
+        self.save_directory = os.path.dirname(path)
+        self.run_writer = RunFileWriter(path, columns, flush_every=self.flush_every, fsync=self.fsync, resume=True)
+        self.close_journal()
+        self.journal = RunJournal(path, self.run_config, path=info['path'])
+        self._binary_suffix = datetime.datetime.now().strftime('_resumed-%H%M%S')
+        print(f"Resuming {path}: {len(self.data)} rows, {info['points']} completed steps")
+
+    def flush_writes(self):
+        """Wait until every queued row has been written."""
+        self.row_writer.drain()
+
+    def writer_stats(self):
+        return self.row_writer.stats()
+
+    def shutdown(self):
+        """Close the run file and stop the writer thread after draining its queue."""
+        self.close_run_file()
+        self.close_journal()
+        self.row_writer.stop()
+        self.acquisition_pool.shutdown(wait=True)
+
     def set_save_directory(self, directory):
         self.save_directory = directory
 
     def update_measurements(self, inst1, inst2, amplitude, host, port,current_dc_value):
+        """Measure and append one point; returns True when both lock-ins returned data."""
         print("begin")
-        with mvc.MultiVuClient(host, port) as client:
-            time.sleep(5)
-            T, sT = client.get_temperature()
-            F, sF = client.get_field()
-        #T, F = 300, 0  # Placeholder values for temperature and field
+        self.ppms_session.configure(host, port)
 
-        temperature=T
         amplitude=amplitude
         current_ac_sq = amplitude ** 2
         current_dc= current_dc_value
+        row = {
+            'Current-AC': amplitude,
+            'Current-DC': current_dc,
+            'Current-AC-Squared': current_ac_sq,  # 存储平方值
+        }
+        # The instruments sit on separate sockets: read them concurrently so the point costs
+        # the slowest instrument rather than the sum of all of them.
+        # - inst1 MAG1 -> data['Voltage1']
+        # - inst2 MAG1 -> data['Voltage3'] (mapped name)
+        acquired_at = time.monotonic()
+        lockins = [self.acquisition_pool.submit(self._read_lockin, inst1, 'Voltage1', self.use_1f_for_rt),
+                   self.acquisition_pool.submit(self._read_lockin, inst2, 'Voltage3')]
+        ppms = None
+        if self.telemetry is None or not self.telemetry.is_alive():
+            ppms = self.acquisition_pool.submit(self.ppms_session.get_temperature_and_field)
+        # Collect each lock-in on its own: a failed instrument leaves only its columns NaN
+        results = self._collect_lockins(lockins)
+        records = [result[0] for result in results if result is not None]
+        for prefix, result in zip(self.LOCKIN_PREFIXES, results):
+            if result is not None:
+                record, capture, part = result
+                row.update(part)
+                row.update(record.to_columns(prefix))
+        if self.burst_points > 0 and records:
+            row['Burst-Samples'] = self.burst_points
+            if len(records) == len(results):
+                self._stage_burst_samples([result[1] for result in results])
+        if records:
+            # Shared timestamp of the point: the lock-in reads now overlap in time
+            acquired_at = sum(record.timestamp for record in records) / len(records)
+        if ppms is not None:
+            try:
+                T, sT, F, sF = ppms.result()
+            except Exception as e:
+                print(f"Error reading PPMS: {e}")
+                T, F = np.nan, np.nan
+        else:
+            T, F = self._temperature_and_field_at(acquired_at)
+        row['Temperature'] = T
+        row['Field'] = F
         # 发射信号
-        self.updateTemperatureAmplitude.emit(temperature, amplitude)
-        self._update_data('Temperature', T)
-        self._update_data('Field', F)
-        self._update_data('Current-AC', amplitude)
-        self._update_data('Current-DC', current_dc)
-        self._update_data('Current-AC-Squared', current_ac_sq) # 存储平方值
-        try:
-            # Fetch and update only the two voltage channels we need:
-            # - inst1 Voltage1 -> data['Voltage1']
-            # - inst2 Voltage1 -> data['Voltage3'] (mapped name)
-            self._fetch_and_update(inst1, ['Voltage1'])
-            self._fetch_and_update(inst2, ['Voltage1'], ['Voltage3'])
-            
-            # Fetch 1f voltage if needed for R-T
-            if self.use_1f_for_rt:
-                inst1.set_harmonic(1)
-                time.sleep(1)  # Wait for harmonic change
-                V1f = float(inst1.query_voltage1())
-                self._update_data('Voltage1_1f', V1f)
-                inst1.set_harmonic(2)  # Back to 2f
-            
-            self.plot_data()
-        except Exception as e:
-            print(f"Error during device query: {e}")
-
-    def _fetch_and_update(self, inst, query_keys, data_keys=None):
-        if data_keys is None:
-            data_keys = query_keys
-
-        for query_key, data_key in zip(query_keys, data_keys):
-            value = float(getattr(inst, f"query_{query_key.lower()}")())
-            time.sleep(self.DELAY)
-            self._update_data(data_key, value)
+        self.updateTemperatureAmplitude.emit(T, amplitude)
+        self._append_row(row)
+        # Plotting is done by the GUI thread (refresh_plot) on updatePlotSignal
+        return len(records) == len(results)
+
+    def record_rt_sample(self, inst1, inst2, current_dc_value):
+        """Append one continuous R-T sample (heater off, inst1 already detecting 1f).
+
+        Both lock-ins are read concurrently; T/F are interpolated to the read time from telemetry.
+        Returns the sample's temperature.
+        """
+        row = {'Current-DC': current_dc_value}
+        lockins = [self.acquisition_pool.submit(inst.acquire) for inst in (inst1, inst2)]
+        acquired_at = time.monotonic()
+        records = self._collect_lockins(lockins)
+        for column, prefix, record in zip(('Voltage1_1f', 'Voltage3'), self.LOCKIN_PREFIXES, records):
+            if record is not None:
+                row[column] = record.demod1.magnitude
+                row.update(record.to_columns(prefix))
+        acquired = [record.timestamp for record in records if record is not None]
+        if acquired:
+            acquired_at = sum(acquired) / len(acquired)
+        T, F = self._temperature_and_field_at(acquired_at)
+        row['Temperature'] = T
+        row['Field'] = F
+        self.updateTemperatureAmplitude.emit(T, 0.0)
+        self._append_row(row)
+        return T
+
+    def set_burst_mode(self, n_points, interval_ms=20):
+        """Use the lock-in curve buffer for `n_points` samples per point (0 disables burst mode)."""
+        self.burst_points = max(0, int(n_points))
+        self.burst_interval_ms = interval_ms
+
+    @staticmethod
+    def reduce_burst(t, values):
+        """Per-channel mean, sample std and linear drift slope (units/s) of a burst capture.
+
+        `values` has shape (channels, samples); all channels are reduced in one vectorized pass.
+        """
+        values = np.asarray(values, dtype=float)
+        n_channels, n_samples = values.shape
+        if n_samples == 0:
+            # Empty capture (burst not filled): NaN, not a mean-of-empty warning
+            empty = np.full(n_channels, np.nan)
+            return empty, empty.copy(), empty.copy()
+        mean = values.mean(axis=1)
+        if n_samples < 2:
+            return mean, np.zeros(n_channels), np.zeros(n_channels)
+        std = values.std(axis=1, ddof=1)
+        tc = t - t.mean()
+        slope = (values - mean[:, None]) @ tc / (tc @ tc)
+        return mean, std, slope
+
+    def _collect_lockins(self, futures):
+        """Result of each lock-in read, None for an instrument whose read failed."""
+        results = []
+        for prefix, future in zip(self.LOCKIN_PREFIXES, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error during device query ({prefix.rstrip('_')}): {e}")
+                results.append(None)
+        return results
+
+    def _read_lockin(self, inst, column, with_1f=False):
+        """Runs on the acquisition pool: one lock-in's record and its share of the row.
+
+        One round trip returns MAG/PHA/X/Y/SEN/overload of both demodulators (or a curve-buffer
+        burst in burst mode). Returns (record, capture or None, {column: value}).
+        """
+        part = {}
+        capture = None
+        # Dual-harmonic 1f mode: demod1 detects 1f and demod2 the sweep harmonic in the same read
+        demod = inst.signal_demod()
+        dual_1f = demod == 2
+        if self.burst_points > 0:
+            inst.arm_burst(self.burst_points, self.burst_interval_ms)
+            inst.wait_burst()
+            capture = inst.read_burst()
+            mean, std, slope = self.reduce_burst(capture.t, capture.values)
+            mag = capture.outputs.index(f'MAG{demod}')
+            part[f'{column}_std'] = std[mag]
+            part[f'{column}_slope'] = slope[mag]
+            record = capture.to_record(mean)
+        else:
+            record = inst.acquire()
+        part[column] = record.demod(demod).magnitude
+        if dual_1f:
+            part[f'{column}_1f'] = record.demod1.magnitude
+        elif with_1f:
+            # Fetch 1f voltage if needed for R-T by switching harmonics (dual-harmonic mode off)
+            inst.set_harmonic(1)  # waits one filter settling time
+            part[f'{column}_1f'] = inst.acquire().demod1.magnitude
+            inst.set_harmonic(2)  # Back to 2f
+        return record, capture, part
+
+    def _stage_burst_samples(self, captures):
+        """Keep the raw burst samples of this point for the next append_row_to_txt()."""
+        if self.write_binary:
+            # Raw samples of both lock-ins, tagged with the index of the point they belong to
+            columns = ['Point', 't'] + [f"{prefix}{name}" for prefix, capture in zip(self.LOCKIN_PREFIXES, captures)
+                                        for name in capture.outputs]
+            point = np.full(len(captures[0].t), len(self.data), dtype=float)
+            samples = np.column_stack([point, captures[0].t] + [capture.values.T for capture in captures])
+            self._pending_burst = (columns, samples)
+
+    def _append_row(self, row):
+        """Append one point to every column; channels not measured this point are stored as NaN."""
+        self.data.append(row)
@@ -0,0 +1,103 @@
+# 文件名: measurement_plan.py
+import json
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PlanStep:
+    """
+    测量计划中的一步。kind 与参数:
+
+    set_temperature  T (K), rate (K/min)             设置目标温度，不等待
+    wait_stable      T (K), tol, stable_sec, timeout_min (可选，默认取线程设置)
+    mode             mode_key ('fig1ef' / 'rt' / 'fig2')
+    harmonic         lock1, lock2 (谐波次数，可只给一个)
+    sweep            points (加热电流幅值列表), wait_time (可选)
+    rt_ramp          end (K), rate (K/min), interval (s)
+    """
+    kind: str
+    params: dict = field(default_factory=dict)
+
+    KINDS = ('set_temperature', 'wait_stable', 'mode', 'harmonic', 'sweep', 'rt_ramp')
+    # 只改变仪器设置、不采集数据的步骤，可以与前面的等待步骤并行执行
+    PREPARATION = ('mode', 'harmonic')
+
+    def __post_init__(self):
+        if self.kind not in self.KINDS:
+            raise ValueError(f"Unknown plan step: {self.kind}")
+
+    @property
+    def is_preparation(self):
+        return self.kind in self.PREPARATION
+
+    def describe(self):
+        args = ', '.join(f"{k}={v}" for k, v in self.params.items() if k != 'points')
+        if 'points' in self.params:
+            args = ', '.join(filter(None, (args, f"{len(self.params['points'])} points")))
+        return f"{self.kind}({args})"
+
+
+class MeasurementPlan:
+    """
+    按顺序执行的测量步骤列表 (温度 × 模式 × 扫描)，由 MeasurementThread 执行。
+
+    JSON 格式:
+        {"steps": [{"step": "set_temperature", "T": 10, "rate": 2},
+                   {"step": "wait_stable", "T": 10},
+                   {"step": "harmonic", "lock1": 2, "lock2": 4},
+                   {"step": "sweep", "points": [0.001, 0.002]}]}
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    @classmethod
+    def from_dict(cls, data):
+        steps = []
+        for entry in data['steps']:
+            entry = dict(entry)
+            steps.append(PlanStep(entry.pop('step'), entry))
+        return cls(steps)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self):
+        return {'steps': [dict(step=s.kind, **s.params) for s in self.steps]}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def temperature_series(cls, temperatures, points, rate, mode_key=None, harmonics=None):
+        """
+        生成 "每个温度: 设温 → 等待稳定 → 扫描" 的计划。
+
+        参数:
+            temperatures (list): 温度列表 (K)。
+            points (list): 每个温度下的加热电流幅值。
+            rate (float): 变温速率 (K/min)。
+            mode_key (str): 可选，开始时切换的模式。
+            harmonics (tuple): 可选，开始时设置的 (lock1, lock2) 谐波次数。
+        """
+        steps = []
+        for i, T in enumerate(temperatures):
+            steps.append(PlanStep('set_temperature', {'T': T, 'rate': rate}))
+            steps.append(PlanStep('wait_stable', {'T': T}))
+            if i == 0:
+                # 放在第一次等待之后，与等待并行完成
+                if mode_key is not None:
+                    steps.append(PlanStep('mode', {'mode_key': mode_key}))
+                if harmonics is not None:
+                    steps.append(PlanStep('harmonic', {'lock1': harmonics[0], 'lock2': harmonics[1]}))
+            steps.append(PlanStep('sweep', {'points': list(points)}))
+        return cls(steps)
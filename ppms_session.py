@@ -0,0 +1,112 @@
+# 文件名: ppms_session.py
+import threading
+import time
+from MultiPyVu import MultiVuClient as mvc
+
+
+class PPMSSession:
+    """
+    长连接的 MultiVu 客户端，供 GUI、测量线程和 DataLogger 共用。
+
+    - 所有调用通过同一把锁串行化，可在多个线程中安全使用。
+    - 调用失败时丢弃旧连接并自动重连，不再在每次连接后固定等待。
+    """
+
+    def __init__(self, host=None, port=None, retries=2, retry_delay=1.0):
+        """
+        参数:
+            host (str): MultiVu 服务器地址。
+            port (int): MultiVu 服务器端口。
+            retries (int): 调用失败后的重连次数。
+            retry_delay (float): 两次重连之间的等待 (s)。
+        """
+        self.host = host
+        self.port = port
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._client = None
+        self._lock = threading.RLock()
+
+    def configure(self, host, port):
+        """更新服务器地址；地址变化时关闭旧连接，下次调用时按新地址重连。"""
+        # 地址未变时直接返回，不去争用可能正被后台采样占用的锁
+        if (host, port) == (self.host, self.port):
+            return
+        with self._lock:
+            if (host, port) != (self.host, self.port):
+                self.close()
+                self.host, self.port = host, port
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def _connect(self):
+        print(f"Connecting to MultiVu server {self.host}:{self.port}...")
+        client = mvc.MultiVuClient(self.host, self.port)
+        client.open()
+        self._client = client
+
+    def close(self):
+        """关闭连接 (可重复调用)。"""
+        with self._lock:
+            if self._client is None:
+                return
+            try:
+                self._client.close_client()
+            except Exception as e:
+                print(f"Error closing MultiVu client: {e}")
+            self._client = None
+
+    def call(self, func):
+        """
+        在持有锁的情况下执行 func(client)，失败时重连并重试。
+
+        参数:
+            func (callable): 接收 MultiVuClient 的函数。
+
+        返回:
+            func 的返回值；重试次数用尽后抛出最后一次的异常。
+        """
+        with self._lock:
+            for attempt in range(self.retries + 1):
+                try:
+                    if self._client is None:
+                        self._connect()
+                    return func(self._client)
+                except Exception as e:
+                    print(f"PPMS call failed: {e} (Attempt {attempt + 1}/{self.retries + 1})")
+                    self.close()
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(self.retry_delay)
+
+    def get_temperature(self):
+        """返回 (T, status)。"""
+        return self.call(lambda client: client.get_temperature())
+
+    def get_field(self):
+        """返回 (F, status)。"""
+        return self.call(lambda client: client.get_field())
+
+    def get_temperature_and_field(self):
+        """在一次加锁内读取温度和磁场，返回 (T, sT, F, sF)。"""
+        def read(client):
+            T, sT = client.get_temperature()
+            F, sF = client.get_field()
+            return T, sT, F, sF
+        return self.call(read)
+
+    def set_temperature(self, set_point, rate, approach='no_overshoot'):
+        """
+        设置 PPMS 目标温度。
+
+        参数:
+            set_point (float): 目标温度 (K)。
+            rate (float): 变温速率 (K/min)。
+            approach (str): client.temperature.approach_mode 中的模式名。
+        """
+        def set_temp(client):
+            mode = getattr(client.temperature.approach_mode, approach)
+            client.set_temperature(set_point, rate, mode)
+        return self.call(set_temp)
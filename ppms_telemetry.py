@@ -0,0 +1,117 @@
+# 文件名: ppms_telemetry.py
+import threading
+import time
+import numpy as np
+
+
+class PPMSTelemetry(threading.Thread):
+    """
+    后台采样线程：按固定间隔读取 PPMS 温度、磁场及其状态，写入定长 NumPy 环形缓冲区。
+
+    每行为 (t, T, T_status, F, F_status)，t 为 time.monotonic()，状态字符串编码为整数
+    (见 status_name())。GUI 通过 latest() 无阻塞地读取最新值，DataLogger 通过
+    interpolate() 取得任意采集时刻的 T/F。
+    """
+    COLUMNS = ('t', 'T', 'T_status', 'F', 'F_status')
+
+    def __init__(self, session, interval=0.5, capacity=4096):
+        """
+        参数:
+            session (PPMSSession): 共享的 PPMS 连接。
+            interval (float): 采样间隔 (s)。
+            capacity (int): 环形缓冲区容量 (采样点数)。
+        """
+        super().__init__(daemon=True)
+        self.session = session
+        self.interval = interval
+        self.capacity = capacity
+        self._buf = np.full((capacity, len(self.COLUMNS)), np.nan)
+        self._count = 0  # 累计写入的采样数
+        self._status_codes = {}
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            if self.session.host is not None:
+                try:
+                    T, sT, F, sF = self.session.get_temperature_and_field()
+                    # 以读取过程的中点作为采样时刻
+                    t = (start + time.monotonic()) / 2
+                    self._push((t, T, self._status_code(sT), F, self._status_code(sF)))
+                except Exception as e:
+                    print(f"PPMS telemetry read failed: {e}")
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def _status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self._status_codes)
+            self._status_codes[status] = code
+        return code
+
+    def status_name(self, code):
+        for name, c in self._status_codes.items():
+            if c == code:
+                return name
+        return None
+
+    def _push(self, row):
+        with self._cond:
+            self._buf[self._count % self.capacity] = row
+            self._count += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        """返回最新一行 (t, T, T_status, F, F_status)；尚无数据时返回 None。"""
+        with self._cond:
+            if self._count == 0:
+                return None
+            return tuple(self._buf[(self._count - 1) % self.capacity])
+
+    def snapshot(self):
+        """按时间顺序返回缓冲区内全部有效采样的副本，形状 (n, 5)。"""
+        with self._cond:
+            n = min(self._count, self.capacity)
+            if self._count <= self.capacity:
+                return self._buf[:n].copy()
+            i = self._count % self.capacity
+            return np.concatenate((self._buf[i:], self._buf[:i]))
+
+    def wait_until(self, t, timeout):
+        """等待出现时刻不早于 t 的采样，保证 interpolate(t) 是内插而非外推。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._count and self._buf[(self._count - 1) % self.capacity, 0] >= t:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def interpolate(self, t, max_gap=None):
+        """
+        将温度和磁场线性插值到时刻 t (time.monotonic())；超出缓冲区范围时取端点值。
+
+        参数:
+            t (float): 时刻 (time.monotonic())。
+            max_gap (float): t 超出缓冲区时间范围的最大允许距离 (s)；超出时返回 None，
+                             而不是把早已过时的端点值当作当前值。None 表示不限制。
+
+        返回:
+            tuple: (T, F)；尚无数据或超出 max_gap 时返回 None。
+        """
+        samples = self.snapshot()
+        if len(samples) == 0:
+            return None
+        ts = samples[:, 0]
+        if max_gap is not None and (t > ts[-1] + max_gap or t < ts[0] - max_gap):
+            return None
+        return float(np.interp(t, ts, samples[:, 1])), float(np.interp(t, ts, samples[:, 3]))
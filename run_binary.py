@@ -0,0 +1,156 @@
+# 文件名: run_binary.py
+import datetime
+import json
+import os
+import numpy as np
+
+
+class BinaryRunWriter:
+    """
+    紧凑的二进制测量文件：定宽 float64 (小端) 行，按块写入多个 .f64 文件，另附 JSON 描述文件。
+
+    <base>.json       运行配置、列名、dtype、每块行数和块文件列表
+    <base>_00000.f64  第 0 块，每行 len(columns) 个 float64
+    ...
+
+    接口与 RunFileWriter 相同 (open / write_row / flush / close)，可直接交给 AsyncRowWriter。
+    """
+    DTYPE = '<f8'
+    FORMAT_VERSION = 1
+
+    def __init__(self, base_path, columns, config=None, rows_per_chunk=1 << 20, fsync=False):
+        """
+        参数:
+            base_path (str): 不含扩展名的文件路径前缀。
+            columns (list): 列名，决定每行的字段顺序。
+            config (dict): 运行配置，原样写入 JSON (需可序列化)。
+            rows_per_chunk (int): 每个块文件的行数上限。
+            fsync (bool): flush 时是否 os.fsync。
+        """
+        self.base_path = base_path
+        self.path = base_path + '.json'
+        self.columns = list(columns)
+        self.config = config or {}
+        self.rows_per_chunk = rows_per_chunk
+        self.fsync = fsync
+        self.rows_written = 0
+        self._chunks = []
+        self._chunk_rows = 0
+        self._file = None
+
+    def _write_sidecar(self):
+        meta = {
+            'format': 'nne-run',
+            'version': self.FORMAT_VERSION,
+            'dtype': self.DTYPE,
+            'columns': self.columns,
+            'rows_per_chunk': self.rows_per_chunk,
+            'chunks': self._chunks,
+            'rows': self.rows_written,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'config': self.config,
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp, self.path)
+
+    def _next_chunk(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"{os.path.basename(self.base_path)}_{len(self._chunks):05d}.f64"
+        self._chunks.append(name)
+        self._chunk_rows = 0
+        self._file = open(os.path.join(os.path.dirname(self.path), name), 'wb')
+        # 新块登记到描述文件后再写数据，崩溃时读取端也能找到全部块
+        self._write_sidecar()
+
+    def open(self):
+        if self._file is None:
+            self._next_chunk()
+
+    def write_row(self, row):
+        """
+        写入数据。row 为 {列名: 数值} (单行，缺失列为 NaN) 或形状 (n, len(columns)) 的数组 (批量)。
+        """
+        if isinstance(row, dict):
+            data = np.array([[row.get(c, np.nan) for c in self.columns]], dtype=self.DTYPE)
+        else:
+            data = np.asarray(row, dtype=self.DTYPE).reshape(-1, len(self.columns))
+        if self._file is None:
+            self.open()
+        start = 0
+        while start < len(data):
+            if self._chunk_rows == self.rows_per_chunk:
+                self._next_chunk()
+            n = min(len(data) - start, self.rows_per_chunk - self._chunk_rows)
+            self._file.write(data[start:start + n].tobytes())
+            self._chunk_rows += n
+            self.rows_written += n
+            start += n
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        self._write_sidecar()
+
+
+class BinaryRun:
+    """
+    以内存映射方式读取 BinaryRunWriter 写出的文件，列以 NumPy 数组形式访问。
+
+    用法:
+        run = BinaryRun('measurement_data_20.0K_2024-01-01.json')
+        T = run['Temperature']
+    """
+
+    def __init__(self, path):
+        """
+        参数:
+            path (str): JSON 描述文件路径 (也可省略 .json 扩展名)。
+        """
+        if not path.endswith('.json'):
+            path += '.json'
+        with open(path, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self.config = self.meta.get('config', {})
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        directory = os.path.dirname(path)
+        dtype = np.dtype(self.meta['dtype'])
+        width = len(self.columns)
+        self._chunks = []
+        for name in self.meta['chunks']:
+            chunk_path = os.path.join(directory, name)
+            # 只映射完整的行，忽略写入中断留下的半行
+            rows = os.path.getsize(chunk_path) // (dtype.itemsize * width)
+            if rows:
+                self._chunks.append(np.memmap(chunk_path, dtype=dtype, mode='r', shape=(rows, width)))
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        """返回一列；单块时为内存映射上的零拷贝视图，多块时拼接为新数组。"""
+        i = self._index[name]
+        if not self._chunks:
+            return np.empty(0)
+        if len(self._chunks) == 1:
+            return self._chunks[0][:, i]
+        return np.concatenate([chunk[:, i] for chunk in self._chunks])
+
+    def to_dict(self):
+        return {name: self[name] for name in self.columns}
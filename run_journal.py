@@ -0,0 +1,110 @@
+# 文件名: run_journal.py
+import json
+import math
+import os
+import time
+
+
+class RunJournal:
+    """
+    运行日志：与一次测量 (可能跨多个温度、多个测量文件) 的第一个测量文件同名的 .journal 文件，
+    每行一个 JSON 记录，记录每个已完成的 (设定温度, 电流幅值) 步骤及当时的仪器状态，用于中断后续测。
+
+    记录类型:
+        {"event": "start", "run_file": ..., "config": {...}, "time": ...}
+        {"event": "point", "run_file": ..., "T_set": 20.0 或 null, "amplitude": 0.001, "row": 17,
+         "lockins": [{...}, {...}]}
+
+    与 RunFileWriter 接口相同 (write_row / flush / close)，由 AsyncRowWriter 写入；
+    日志行排在对应数据行和测量文件的 fsync 之后入队，因此日志中记为完成的点一定已写入测量文件并落盘。
+    """
+    EXTENSION = '.journal'
+
+    def __init__(self, run_file, config=None, path=None):
+        """
+        参数:
+            run_file (str): 第一个测量文件 (.txt) 路径。
+            config (dict): 运行配置，写入 start 记录，续测时据此恢复。
+            path (str): 日志路径，默认由 run_file 得出 (续测时传入已有日志)。
+        """
+        self.run_file = run_file
+        self.path = path or self.path_for(run_file)
+        self.config = config or {}
+        self._file = None
+
+    @classmethod
+    def path_for(cls, run_file):
+        return os.path.splitext(run_file)[0] + cls.EXTENSION
+
+    def open(self):
+        if self._file is not None:
+            return
+        resume = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if not resume:
+            self.write_row({'event': 'start', 'run_file': os.path.basename(self.run_file),
+                            'config': self.config, 'time': time.time()})
+
+    def write_row(self, record):
+        if self._file is None:
+            self.open()
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+    @staticmethod
+    def point_record(run_file, T_set, amplitude, row, lockin_states):
+        return {'event': 'point', 'run_file': os.path.basename(run_file), 'T_set': T_set,
+                'amplitude': float(amplitude), 'row': row, 'lockins': lockin_states, 'time': time.time()}
+
+    @staticmethod
+    def step_key(T_set, amplitude):
+        return (None if T_set is None else float(T_set), float(amplitude))
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取日志 (可传入 .journal 或测量文件路径)，忽略写入中断留下的不完整末行。
+
+        返回:
+            dict: path (日志路径)、run_file (最后写入的测量文件完整路径)、config、
+                  done (已完成步骤的 step_key 集合)、lockins (最后一个点的仪器状态)、points (已完成点数)。
+        """
+        if not path.endswith(cls.EXTENSION):
+            path = cls.path_for(path)
+        info = {'path': path, 'run_file': None, 'config': {}, 'done': set(), 'lockins': None, 'points': 0}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('event') == 'start':
+                    info['run_file'] = os.path.join(os.path.dirname(path), record['run_file'])
+                    info['config'] = record.get('config', {})
+                elif record.get('event') == 'point':
+                    info['run_file'] = os.path.join(os.path.dirname(path), record['run_file'])
+                    info['done'].add(cls.step_key(record['T_set'], record['amplitude']))
+                    info['lockins'] = record.get('lockins')
+                    info['points'] += 1
+        return info
+
+
+def lockin_state(inst, row, prefix):
+    """不发额外查询的仪器状态快照：缓存的谐波/ACGAIN，SEN 取自刚保存的数据行。"""
+    def sen(n):
+        value = row.get(f'{prefix}SEN{n}')
+        return None if value is None or math.isnan(value) else int(value)
+    return {'harmonic': inst.harmonic, 'dual_harmonics': inst.dual_harmonics, 'acgain': inst.acgain,
+            'sen1': sen(1), 'sen2': sen(2)}
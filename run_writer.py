@@ -0,0 +1,156 @@
+# 文件名: run_writer.py
+import math
+import os
+import queue
+import threading
+import time
+
+
+class RunFileWriter:
+    """
+    追加写入的测量文件：打开一次、表头只写一次、每个测量点追加一行。
+
+    输出格式与 DataFrame.to_csv(sep='\\t', index=False) 一致 (制表符分隔、首行为列名、
+    NaN 写为空字段)，现有分析脚本可继续用 pandas.read_csv(sep='\\t') 读取。
+    """
+
+    def __init__(self, path, columns, flush_every=1, fsync=False, resume=False):
+        """
+        参数:
+            path (str): 文件路径。
+            columns (list): 列名，决定每行的字段顺序。
+            flush_every (int): 每写入多少行 flush 一次；0 表示交给操作系统缓冲，直到 close()。
+            fsync (bool): flush 后是否 os.fsync，确保断电时数据已落盘。
+            resume (bool): 续写已有文件 (RunJournal 续测)；为 False 时文件已存在则拒绝写入，
+                           不会把两次运行的数据混在一个文件里。
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.resume = resume
+        self.rows_written = 0
+        self._file = None
+
+    def open(self):
+        """
+        打开文件并写表头。resume=True 时追加到已有文件 (非空则不重复写表头)；
+        否则以独占方式新建，文件已存在时抛出 FileExistsError。
+        """
+        if self._file is not None:
+            return
+        has_rows = self.resume and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, 'a' if self.resume else 'x', encoding='utf-8', newline='')
+        if not has_rows:
+            self._file.write('\t'.join(self.columns) + '\n')
+            self.flush()
+
+    @staticmethod
+    def _format(value):
+        if value is None:
+            return ''
+        if isinstance(value, float) and math.isnan(value):
+            return ''
+        return str(value)
+
+    def write_row(self, row):
+        """追加一行。row 为 {列名: 数值}，缺失的列写为空字段。"""
+        if self._file is None:
+            self.open()
+        self._file.write('\t'.join(self._format(row.get(c)) for c in self.columns) + '\n')
+        self.rows_written += 1
+        if self.flush_every and self.rows_written % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def sync(self):
+        """不论 flush 策略，立即 flush 并 fsync 已写入的行 (运行日志标记完成之前调用)。"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+class AsyncRowWriter(threading.Thread):
+    """
+    测量线程与磁盘之间的有界队列：后台线程负责真正的写文件，采集循环只做入队。
+
+    队列满时 submit() 阻塞 (背压)，保证内存占用有上限；drain() 等待已入队的行全部落盘。
+    row 为 SYNC 时调用 writer.sync()，使之前入队的行在后续记录之前落盘。
+    """
+    SYNC = object()
+
+    def __init__(self, maxsize=1024):
+        super().__init__(daemon=True)
+        self._queue = queue.Queue(maxsize)
+        self._stats_lock = threading.Lock()
+        self._stats = {'written': 0, 'errors': 0, 'max_depth': 0,
+                       'last_latency': None, 'max_latency': 0.0, 'total_latency': 0.0}
+
+    def submit(self, writer, row):
+        """将一行交给 writer 写入；row 为 None 表示关闭 writer，为 SYNC 表示落盘。"""
+        self._queue.put((writer, row))
+        with self._stats_lock:
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                writer, row = item
+                start = time.perf_counter()
+                try:
+                    if row is None:
+                        writer.close()
+                    elif row is self.SYNC:
+                        writer.sync()
+                        continue
+                    else:
+                        writer.write_row(row)
+                except Exception as e:
+                    print(f"Error writing to {writer.path}: {e}")
+                    with self._stats_lock:
+                        self._stats['errors'] += 1
+                    continue
+                latency = time.perf_counter() - start
+                with self._stats_lock:
+                    self._stats['last_latency'] = latency
+                    self._stats['max_latency'] = max(self._stats['max_latency'], latency)
+                    if row is not None:
+                        self._stats['written'] += 1
+                        self._stats['total_latency'] += latency
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """阻塞直到队列中已有的行全部写完。"""
+        self._queue.join()
+
+    def stop(self, timeout=None):
+        """写完剩余的行后结束线程。"""
+        if self.is_alive():
+            self._queue.put(None)
+            self.join(timeout)
+
+    def stats(self):
+        """返回 depth (当前队列长度)、written、errors、max_depth 以及写入延迟 (s)。"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['depth'] = self._queue.qsize()
+        stats['mean_latency'] = stats.pop('total_latency') / stats['written'] if stats['written'] else 0.0
+        return stats
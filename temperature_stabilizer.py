@@ -0,0 +1,184 @@
+# 文件名: temperature_stabilizer.py
+import time
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class StabilityCriterion:
+    """
+    温度稳定判据：在最近 stable_sec 秒的滚动窗口内，
+
+    - 每个采样与目标温度的偏差都不超过 tol，且
+    - 线性拟合斜率在整个窗口上引起的漂移 |slope| * stable_sec 也不超过 tol，
+
+    并且窗口已覆盖满 stable_sec 秒时判定为稳定。偶尔一个超出范围的采样只会把进度退回到
+    该采样之后，而不是从头开始计数。
+    """
+
+    def __init__(self, target, tol, stable_sec):
+        """
+        参数:
+            target (float): 目标温度 (K)。
+            tol (float): 允许偏差 (K)。
+            stable_sec (float): 需要持续满足判据的时间 (s)。
+        """
+        self.target = target
+        self.tol = tol
+        self.stable_sec = stable_sec
+
+    def evaluate(self, t, T):
+        """
+        参数:
+            t (ndarray): 采样时刻 (s，单调)。
+            T (ndarray): 对应温度 (K)。
+
+        返回:
+            tuple: (stable, progress 0~1, eta (s) 或 None, slope (K/s))。
+        """
+        t = np.asarray(t, dtype=float)
+        T = np.asarray(T, dtype=float)
+        if len(t) == 0:
+            return False, 0.0, None, 0.0
+        window = t >= t[-1] - self.stable_sec
+        tw, Tw = t[window], T[window]
+        slope = float(np.polyfit(tw - tw[0], Tw, 1)[0]) if len(tw) >= 2 and tw[-1] > tw[0] else 0.0
+
+        # 最近一段连续在偏差范围内的时长
+        outside = np.flatnonzero(np.abs(T - self.target) > self.tol)
+        if len(outside) and outside[-1] == len(t) - 1:
+            in_band_for = 0.0
+        else:
+            first = outside[-1] + 1 if len(outside) else 0
+            in_band_for = float(t[-1] - t[first])
+        drift_ok = abs(slope) * self.stable_sec <= self.tol
+        stable = bool(in_band_for >= self.stable_sec and drift_ok)
+        progress = min(1.0, in_band_for / self.stable_sec) if self.stable_sec > 0 else 1.0
+
+        if stable:
+            eta = 0.0
+        elif in_band_for > 0:
+            eta = self.stable_sec - in_band_for if drift_ok else None
+        else:
+            # 尚未进入范围：按当前斜率估计到达时间 (斜率背离目标时无法估计)
+            distance = float(self.target - T[-1])
+            eta = abs(distance) / abs(slope) + self.stable_sec if slope * distance > 0 else None
+        return stable, progress, eta, slope
+
+
+def wait_until_stable(criterion, read_temperature, interval=1.0, timeout=None, should_stop=None,
+                      on_progress=None):
+    """
+    轮询温度直到满足 criterion。
+
+    参数:
+        criterion (StabilityCriterion): 稳定判据。
+        read_temperature (callable): 返回当前温度 (K) 的函数。
+        interval (float): 轮询间隔 (s)。
+        timeout (float): 超时 (s)，None 表示不限。
+        should_stop (callable): 返回 True 时提前结束。
+        on_progress (callable): 每次轮询后以 (progress, eta, T, slope) 调用。
+
+    返回:
+        bool: 是否已稳定 (超时或被停止时为 False)。
+    """
+    start = time.monotonic()
+    ts, Ts = [], []
+    while True:
+        if should_stop is not None and should_stop():
+            return False
+        now = time.monotonic()
+        if timeout is not None and now - start > timeout:
+            print(f"Temperature not stable within {timeout:.0f} s")
+            return False
+        try:
+            T = read_temperature()
+        except Exception as e:
+            print(f"Error reading temperature: {e}")
+            T = None
+        if T is not None and np.isfinite(T):
+            ts.append(now)
+            Ts.append(T)
+            # 只保留判据窗口需要的采样
+            while len(ts) > 2 and ts[1] < now - 2 * criterion.stable_sec:
+                ts.pop(0)
+                Ts.pop(0)
+            stable, progress, eta, slope = criterion.evaluate(ts, Ts)
+            if on_progress is not None:
+                on_progress(progress, eta, T, slope)
+            if stable:
+                print(f"Temperature stable at {T} K (slope {slope * 60:.2e} K/min)")
+                return True
+        time.sleep(max(0.0, interval - (time.monotonic() - now)))
+
+
+def temperature_reader(session, telemetry=None, max_age_intervals=3):
+    """
+    返回读取当前温度的函数：有运行中的遥测线程且其最新采样不超过 max_age_intervals 个采样间隔时
+    读其缓存，否则直接查询 PPMS (遥测持续读取失败时，旧温度不会被当作新采样判为稳定)。
+    """
+    def read():
+        if telemetry is not None and telemetry.is_alive():
+            sample = telemetry.latest()
+            if sample is not None and time.monotonic() - sample[0] <= max_age_intervals * telemetry.interval:
+                return sample[1]
+        T, sT = session.get_temperature()
+        return T
+    return read
+
+
+class TemperatureStabilizer(QThread):
+    """
+    后台温度稳定服务：设置目标温度后在工作线程中等待稳定，通过信号报告进度和预计剩余时间，
+    GUI 线程不再被阻塞。
+    """
+    progress = pyqtSignal(float, float, float)  # progress 0~1, eta (s, -1 = unknown), T (K)
+    stabilized = pyqtSignal(float)              # target T
+    failed = pyqtSignal(str)
+
+    def __init__(self, session, telemetry=None, parent=None):
+        """
+        参数:
+            session (PPMSSession): 共享的 PPMS 连接。
+            telemetry (PPMSTelemetry): 可选的遥测线程，用于无额外查询地读取温度。
+        """
+        super().__init__(parent)
+        self.session = session
+        self.telemetry = telemetry
+        self.target = None
+        self._params = None
+        self._stop_requested = False
+
+    def stabilize(self, target, rate, tol, stable_sec, timeout_min, approach='no_overshoot'):
+        """设置目标温度并开始在后台等待稳定；已有任务在运行时先将其取消。"""
+        self.cancel()
+        self.wait()
+        self.target = target
+        self._params = (target, rate, tol, stable_sec, timeout_min, approach)
+        self._stop_requested = False
+        self.start()
+
+    def cancel(self):
+        self._stop_requested = True
+
+    def _emit_progress(self, progress, eta, T, slope):
+        self.progress.emit(progress, -1.0 if eta is None else eta, T)
+
+    def run(self):
+        target, rate, tol, stable_sec, timeout_min, approach = self._params
+        try:
+            print(f"Setting temperature to {target} K at rate {rate} K/min")
+            self.session.set_temperature(target, rate, approach)
+            interval = self.telemetry.interval if self.telemetry is not None else 1.0
+            stable = wait_until_stable(StabilityCriterion(target, tol, stable_sec),
+                                       temperature_reader(self.session, self.telemetry),
+                                       interval=interval, timeout=timeout_min * 60,
+                                       should_stop=lambda: self._stop_requested,
+                                       on_progress=self._emit_progress)
+        except Exception as e:
+            print(f"Error setting temperature: {e}")
+            self.failed.emit(str(e))
+            return
+        if stable:
+            self.stabilized.emit(target)
+        elif not self._stop_requested:
+            self.failed.emit("Temperature setting timeout")
@@ -0,0 +1,51 @@
+"""A stand-in for the 7270's TCPIP SOCKET resource, used instead of hardware in the driver tests."""
+import pyvisa
+
+
+class FakeLockinSocket:
+    """
+    Replies the way the 7270 does over Ethernet: every command of a compound line is answered with one
+    NULL-terminated frame (or ending in whatever read_termination the driver set), an empty one for set
+    commands. Queries are answered from `replies`
+    ({command: str or callable(command) -> str}). A reply containing '|' is split into separate frames
+    at that point. Reading with nothing pending raises a VISA timeout at once.
+    """
+
+    def __init__(self, replies=None):
+        self.replies = dict(replies or {})
+        self.written = []
+        self.frames = []
+        self.timeout = 2000
+        self.read_termination = None
+        self.clears = 0
+
+    def write_raw(self, data):
+        line = data.decode('ascii').rstrip('\r')
+        self.written.append(line)
+        for command in line.split(';'):
+            reply = self.replies.get(command, '')
+            if callable(reply):
+                reply = reply(command)
+            end = self.read_termination or '\0'
+            self.frames.extend((part + end).encode('ascii') for part in reply.split('|'))
+
+    def read_raw(self, size=None):
+        if not self.frames:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+        return self.frames.pop(0)
+
+    def clear(self):
+        self.clears += 1
+        self.frames = []
+
+
+class FakePool:
+    """Hands out one fake resource for whatever address the driver asks for."""
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.opened = []
+
+    def open(self, address, probe=None, **options):
+        self.opened.append(address)
+        return self.resource
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import async_drivers
+from async_drivers import AsyncInstrument, InstrumentLoop, SyncInstrument, gather_calls, open_instrument
+from fake_7270 import FakeLockinSocket, FakePool
+from lockin7270_controller import InstrumentLockin7270, LockinRecord
+
+ACQUIRE_REPLY = '1.0E-03,2.0E-03,3.0E-03,45.0,21,4.0E-06,5.0E-06,6.0E-06,-30.0,12'
+
+
+class SlowDriver:
+    """Blocking driver whose calls take `delay` seconds; records how many run at once."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.level = 1.0
+        self._guard = threading.Lock()
+
+    def work(self, value):
+        with self._guard:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._guard:
+            self.active -= 1
+        return value
+
+    def fail(self):
+        raise RuntimeError('instrument error')
+
+
+@pytest.fixture
+def event_loop():
+    loop = InstrumentLoop(max_workers=4).start()
+    yield loop
+    loop.stop()
+
+
+def test_facade_keeps_driver_interface(event_loop):
+    socket = FakeLockinSocket({'?.': ACQUIRE_REPLY, 'N': '64'})
+    lockin = open_instrument(InstrumentLockin7270, '127.0.0.1', query_timeout=0.2,
+                             pool=FakePool(socket), event_loop=event_loop)
+    record = lockin.acquire()
+    assert isinstance(record, LockinRecord)
+    assert record.demod2.sensitivity == 12
+    assert lockin.inst is socket                      # attributes pass through
+    lockin.harmonic = 2                               # and are set on the driver
+    assert lockin.instrument.driver.harmonic == 2
+
+
+def test_calls_on_one_instrument_are_serialized(event_loop):
+    driver = SlowDriver(0.05)
+    inst = SyncInstrument(AsyncInstrument(driver), event_loop)
+    threads = [threading.Thread(target=inst.work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert driver.max_active == 1
+
+
+def test_instruments_run_concurrently_on_one_loop(event_loop):
+    a, b = AsyncInstrument(SlowDriver(0.2)), AsyncInstrument(SlowDriver(0.2))
+    start = time.perf_counter()
+    assert event_loop.run(gather_calls((a, 'work', 1), (b, 'work', 2))) == [1, 2]
+    assert time.perf_counter() - start < 0.35
+
+
+def test_driver_errors_reach_the_caller(event_loop):
+    inst = SyncInstrument(AsyncInstrument(SlowDriver()), event_loop)
+    with pytest.raises(RuntimeError, match='instrument error'):
+        inst.fail()
+    assert inst.level == 1.0
+
+
+def test_sleep_does_not_block_the_loop(event_loop):
+    inst = AsyncInstrument(SlowDriver(0.0))
+
+    async def both():
+        return await asyncio.gather(inst.sleep(0.2), inst.call('work', 3))
+
+    start = time.perf_counter()
+    event_loop.run(both())
+    assert time.perf_counter() - start < 0.35
+
+
+def test_run_from_loop_thread_is_rejected(event_loop):
+    inst = SyncInstrument(AsyncInstrument(SlowDriver(0.0)), event_loop)
+
+    async def nested():
+        return inst.work(1)
+
+    with pytest.raises(RuntimeError):
+        event_loop.run(nested())
+
+
+def test_default_loop_is_shared():
+    inst = SyncInstrument(AsyncInstrument(SlowDriver(0.0)))
+    assert inst.loop is async_drivers.loop
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from column_store import ColumnStore
+
+
+def test_append_and_views():
+    store = ColumnStore(['T', 'V'], capacity=2)
+    store.append({'T': 10.0, 'V': 1e-6})
+    store.append({'T': 11.0})
+    assert len(store) == 2
+    np.testing.assert_array_equal(store['T'], [10.0, 11.0])
+    assert np.isnan(store['V'][1])
+
+
+def test_grows_past_capacity():
+    store = ColumnStore(['x'], capacity=1)
+    for i in range(100):
+        store.append({'x': float(i)})
+    assert store.capacity >= 100
+    np.testing.assert_array_equal(store['x'], np.arange(100.0))
+
+
+def test_last_row_and_keys():
+    store = ColumnStore(['a', 'b'])
+    store.append({'a': 1.0, 'b': 2.0})
+    assert store.keys() == ['a', 'b']
+    assert store.last_row() == {'a': 1.0, 'b': 2.0}
+    assert 'a' in store and 'c' not in store
+
+
+def test_unknown_column_and_empty_last_row():
+    store = ColumnStore(['a'])
+    with pytest.raises(KeyError):
+        store.append({'c': 1.0})
+    with pytest.raises(IndexError):
+        ColumnStore(['a']).last_row()
+
+
+def test_clear():
+    store = ColumnStore(['a'])
+    store.append({'a': 1.0})
+    store.clear()
+    assert len(store) == 0
+    store.append({})
+    assert np.isnan(store.last_row()['a'])
@@ -0,0 +1,123 @@
+import pyvisa
+import pytest
+
+from fake_7270 import FakePool
+from keithley_drivers import Keithley2400_DCSource, Keithley6221_ACSource, Keithley6221_DCSource, KeithleySCPI
+
+
+class FakeSCPIResource:
+    """
+    A Keithley-like VISA resource: *OPC sets the ESB bit after `opc_polls` status-byte reads,
+    *ESR? clears it, SYST:ERR? pops from `errors`. With `stb=False` serial polls are unsupported.
+    """
+
+    def __init__(self, opc_polls=2, stb=True, opc_reply='1'):
+        self.opc_polls = opc_polls
+        self.stb = stb
+        self.opc_reply = opc_reply
+        self.errors = []
+        self.written = []
+        self.queries = []
+        self.timeout = 2000
+        self.timeouts = []
+        self._pending_opc = None
+
+    def write(self, line):
+        self.written.append(line)
+        if line.endswith('*OPC'):
+            self._pending_opc = self.opc_polls
+
+    def read_stb(self):
+        if not self.stb:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_nonsupported_operation)
+        if self._pending_opc is None:
+            return 0
+        if self._pending_opc > 0:
+            self._pending_opc -= 1
+            return 0
+        return KeithleySCPI.ESB
+
+    def query(self, command):
+        self.queries.append(command)
+        if command == '*IDN?':
+            return 'KEITHLEY INSTRUMENTS INC.,MODEL 6221,0,A01'
+        if command == '*ESR?':
+            self._pending_opc = None
+            return '1'
+        if command == '*OPC?':
+            self.timeouts.append(self.timeout)
+            return self.opc_reply
+        if command == 'SYST:ERR?':
+            return self.errors.pop(0) if self.errors else '0,"No error"'
+        raise AssertionError(f'unexpected query {command}')
+
+
+@pytest.fixture
+def resource():
+    return FakeSCPIResource()
+
+
+def connect(cls, resource):
+    return cls('GPIB0::12::INSTR', pool=FakePool(resource))
+
+
+def test_reset_is_one_batched_write(resource):
+    connect(Keithley2400_DCSource, resource)
+    assert resource.written == ['*RST;*CLS;*ESE 1;*OPC']
+    assert resource.queries == ['*IDN?', '*ESR?', 'SYST:ERR?']
+
+
+def test_configure_batches_and_roots_commands(resource):
+    source = connect(Keithley2400_DCSource, resource)
+    source.setup_current_source(1e-5, 21)
+    assert resource.written[-1] == (':SOUR:FUNC CURR;:SOUR:CURR:MODE FIX;:SENS:VOLT:PROT 21;'
+                                    ':SOUR:CURR:LEV 1e-05;*ESE 1;*OPC')
+
+
+def test_stb_polling_times_out(resource):
+    source = connect(Keithley2400_DCSource, resource)
+    resource.opc_polls = 10 ** 9
+    with pytest.raises(TimeoutError):
+        source.configure([':OUTP ON'], timeout=0.05)
+
+
+def test_opc_query_fallback_restores_timeout():
+    resource = FakeSCPIResource(stb=False)
+    source = connect(Keithley2400_DCSource, resource)
+    assert '*OPC?' in resource.queries
+    assert resource.timeouts == [KeithleySCPI.RESET_TIMEOUT * 1000]
+    assert resource.timeout == 2000
+    resource.opc_reply = '0'
+    with pytest.raises(RuntimeError, match='OPC'):
+        source.configure([':OUTP ON'])
+
+
+def test_error_queue_is_drained_and_raised(resource):
+    source = connect(Keithley6221_ACSource, resource)
+    resource.errors = ['-113,"Undefined header"', '-221,"Settings conflict"']
+    with pytest.raises(RuntimeError, match='Undefined header"; -221'):
+        source.set_amplitude(1e-3)
+    assert resource.errors == []
+
+
+def test_error_queue_read_is_bounded(resource):
+    source = connect(Keithley2400_DCSource, resource)
+    resource.errors = ['-100,"Command error"'] * 50
+    with pytest.raises(RuntimeError):
+        source.check_errors()
+    assert len(resource.errors) == 50 - KeithleySCPI.ERROR_QUEUE_DEPTH
+
+
+def test_6221_dc_mode_aborts_waveform(resource):
+    source = connect(Keithley6221_DCSource, resource)
+    source.setup_current_source(1e-5, 10)
+    assert resource.written[-1].startswith(':SOUR:WAVE:ABOR;:SOUR:CURR:RANG:AUTO ON;')
+
+
+def test_6221_amplitude_step_keeps_waveform(resource):
+    source = connect(Keithley6221_ACSource, resource)
+    source.setup_sine_wave(17.777, 0)
+    source.enable_output()
+    source.set_amplitude(2e-3)
+    assert resource.written[-1] == ':SOUR:WAVE:AMPL 0.002;*ESE 1;*OPC'
+    assert source.output_enabled and source.frequency == 17.777
@@ -0,0 +1,97 @@
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from live_plot import BlitPlotRenderer, minmax_indices
+
+
+def test_short_traces_are_kept():
+    np.testing.assert_array_equal(minmax_indices(np.arange(10.0), 5), np.arange(10))
+
+
+def test_minmax_keeps_extremes_in_order():
+    y = np.sin(np.linspace(0, 20, 10000))
+    y[1234] = 5.0    # a spike must survive decimation
+    y[8765] = -5.0
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 200
+    assert np.all(np.diff(idx) > 0)
+    assert 1234 in idx and 8765 in idx
+    assert y[idx].max() == y.max() and y[idx].min() == y.min()
+
+
+def test_nan_is_ignored():
+    y = np.full(1000, np.nan)
+    y[500] = 1.0
+    assert 500 in minmax_indices(y, 10)
+
+
+def test_decimation_follows_visible_range():
+    fig = Figure(figsize=(4, 3), dpi=50)
+    ax = fig.add_subplot()
+    renderer = BlitPlotRenderer(FigureCanvasAgg(fig), data_logger=None)
+    x = np.arange(100000.0)
+    y = np.random.default_rng(0).normal(size=x.size)
+    ax.set_xlim(1000, 2000)
+    xd, yd = renderer._decimated(ax, x, y)
+    assert len(xd) <= 2 * int(ax.bbox.width) + 2
+    assert xd.min() >= 999 and xd.max() <= 2001
+
+    renderer.lod = False
+    assert len(renderer._decimated(ax, x, y)[0]) == x.size
+
+
+class _Source:
+    """Stand-in for DataLogger.line_data(): one growing trace on one axis."""
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.line, = ax.plot([], [], 'o-')
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+    def append(self, x, y):
+        self.x = np.append(self.x, x)
+        self.y = np.append(self.y, y)
+
+    def line_data(self):
+        return [(self.ax, self.line, self.x, self.y)] if len(self.x) else []
+
+
+def _renderer_with_default_limits():
+    fig = Figure(figsize=(4, 3), dpi=50)
+    ax = fig.add_subplot()
+    ax.set_xlim(-0.055, 0.055)
+    ax.set_ylim(-0.055, 0.055)
+    source = _Source(ax)
+    canvas = FigureCanvasAgg(fig)
+    renderer = BlitPlotRenderer(canvas, source)
+    canvas.draw()  # startup draw captures backgrounds for the default limits
+    return renderer, source, ax
+
+
+def test_limits_tighten_to_small_data():
+    renderer, source, ax = _renderer_with_default_limits()
+    for I in np.linspace(1e-5, 3e-3, 300):
+        source.append(I, I ** 2)
+        renderer.refresh()
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    assert renderer.full_redraws > 0
+    assert x1 - x0 < 2 * 3e-3 and x1 > 3e-3
+    assert y1 - y0 < 2 * 9e-6 and y1 > 9e-6
+    # Still incremental: a monotonic sweep redraws fully only every so often
+    assert renderer.full_redraws < 60
+
+
+def test_invalidate_forces_rescale():
+    renderer, source, ax = _renderer_with_default_limits()
+    for I in np.linspace(1e-3, 2e-3, 20):
+        source.append(I, 1.0)
+        renderer.refresh()
+    redraws = renderer.full_redraws
+    renderer.refresh()
+    assert renderer.full_redraws == redraws
+    renderer.invalidate()
+    renderer.refresh()
+    assert renderer.full_redraws == redraws + 1
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from fake_7270 import FakeLockinSocket, FakePool
+from lockin7270_controller import InstrumentLockin7270, LockinRecord
+
+ACQUIRE_REPLY = '1.0E-03,2.0E-03,3.0E-03,45.0,21,4.0E-06,5.0E-06,6.0E-06,-30.0,12'
+
+
+@pytest.fixture
+def socket():
+    return FakeLockinSocket({'MAG1.': '1.5E-06', '?.': ACQUIRE_REPLY, 'N': '64', 'TC1.': '0.1',
+                             'TC2.': '0.2', 'SLOPE1': '1', 'SLOPE2': '3'})
+
+
+@pytest.fixture
+def lockin(socket):
+    return InstrumentLockin7270('127.0.0.1', query_timeout=0.2, pool=FakePool(socket))
+
+
+def test_connects_to_socket_port(lockin, socket):
+    assert lockin.pool.opened == ['TCPIP0::127.0.0.1::50001::SOCKET']
+    assert socket.read_termination == '\0'
+
+
+def test_query_skips_null_acknowledgements(lockin, socket):
+    lockin._write_command('SEN1 20')   # leaves an empty frame behind
+    assert lockin._query_device('MAG1.') == '1.5E-06'
+    assert socket.written == ['SEN1 20', 'MAG1.']
+
+
+def test_read_response_times_out_without_waiting(lockin):
+    start = time.perf_counter()
+    assert lockin._read_response(0.5) == ''
+    assert time.perf_counter() - start < 0.1
+
+
+def test_query_is_fast(lockin):
+    # The byte-by-byte reader spent about 1.8 s on a reply of this size
+    lockin._query_device('MAG1.')
+    assert lockin.last_query_latency < 0.05
+
+
+def test_query_fields_across_frames(lockin, socket):
+    socket.replies['?.'] = ACQUIRE_REPLY.replace(',5.0E-06', '|5.0E-06')
+    fields = lockin._query_fields('?.;N', 11)
+    assert fields[:5] == ['1.0E-03', '2.0E-03', '3.0E-03', '45.0', '21']
+    assert fields[-1] == '64'
+
+
+def test_query_fields_incomplete_raises(lockin, socket):
+    socket.replies['N'] = ''
+    with pytest.raises(RuntimeError):
+        lockin._query_fields('?.;N', 11, retries=2, delay=0)
+    assert socket.clears == 2
+
+
+def test_acquire_parses_both_demodulators(lockin, socket):
+    record = lockin.acquire()
+    assert socket.written[0] == 'CBD 2031647'
+    assert (record.demod1.x, record.demod1.y, record.demod1.magnitude) == (1e-3, 2e-3, 3e-3)
+    assert record.demod1.phase == 45.0 and record.demod1.sensitivity == 21
+    assert record.demod2.magnitude == 6e-6 and record.demod2.sensitivity == 12
+    assert record.input_overload and not record.reference_unlocked
+    assert record.demod1.full_scale == 10e-3
+
+
+def test_acquire_selects_outputs_once(lockin, socket):
+    lockin.acquire()
+    lockin.acquire()
+    assert [c for c in socket.written if c.startswith('CBD')] == ['CBD 2031647']
+
+
+def test_record_columns(lockin):
+    columns = lockin.acquire().to_columns('L1_')
+    assert list(columns) == LockinRecord.column_names('L1_')
+    assert columns['L1_MAG2'] == 6e-6 and columns['L1_SEN1'] == 21.0
+
+
+def test_latency_stats(lockin):
+    for _ in range(3):
+        lockin._query_device('MAG1.')
+    stats = lockin.query_latency_stats()
+    assert stats['count'] == 3
+    assert 0 < stats['mean'] <= stats['max']
+    lockin.reset_query_stats()
+    assert lockin.query_latency_stats()['count'] == 0
+
+
+def test_settling_time_uses_slowest_demodulator(lockin):
+    # demod1: 0.1 s at 12 dB/oct -> 0.7 s; demod2: 0.2 s at 24 dB/oct -> 2.0 s
+    assert lockin.settling_time() == pytest.approx(2.0)
+    assert lockin.settling_time(3) == pytest.approx(6.0)
+
+
+def test_failed_filter_read_backs_off_and_recovers(lockin, socket):
+    del socket.replies['TC1.']
+    assert lockin.settling_time() == lockin.FALLBACK_SETTLE
+    assert lockin.settling_time(fallback=None) is None
+    written = len(socket.written)
+    assert lockin.settling_time() == lockin.FALLBACK_SETTLE
+    assert len(socket.written) == written   # no new query within FILTER_RETRY_INTERVAL
+    socket.replies['TC1.'] = '0.1'
+    lockin._filter_retry_at = 0.0           # retry interval elapsed
+    assert lockin.settling_time() == pytest.approx(2.0)
+
+
+def test_trailing_cr_is_stripped(lockin, socket):
+    socket.replies['MAG1.'] = '1.5E-06\r'
+    assert lockin._query_device('MAG1.') == '1.5E-06'
+
+
+def test_cr_separated_responses_in_one_frame(lockin, socket):
+    socket.replies['TC1.'] = '0.1\r2'
+    assert lockin._query_fields('TC1.', 2) == ['0.1', '2']
+    lockin._write_command('TC1.')
+    assert lockin._read_response() == '0.1'
+    assert lockin._read_response() == '2'
+
+
+def test_cr_terminated_device():
+    socket = FakeLockinSocket({'MAG1.': '1.5E-06'})
+    lockin = InstrumentLockin7270('127.0.0.1', query_timeout=0.2, pool=FakePool(socket), terminator='\r')
+    assert socket.read_termination == '\r'
+    assert lockin._query_device('MAG1.') == '1.5E-06'
@@ -0,0 +1,39 @@
+import pytest
+
+from measurement_plan import MeasurementPlan, PlanStep
+
+
+def test_json_round_trip(tmp_path):
+    plan = MeasurementPlan.from_dict({'steps': [
+        {'step': 'set_temperature', 'T': 10, 'rate': 2},
+        {'step': 'wait_stable', 'T': 10, 'tol': 0.01},
+        {'step': 'harmonic', 'lock1': 2, 'lock2': 4},
+        {'step': 'sweep', 'points': [0.001, 0.002], 'wait_time': 30},
+    ]})
+    path = str(tmp_path / 'plan.json')
+    plan.save(path)
+    loaded = MeasurementPlan.load(path)
+    assert loaded.to_dict() == plan.to_dict()
+    assert [s.kind for s in loaded] == ['set_temperature', 'wait_stable', 'harmonic', 'sweep']
+    assert loaded.steps[3].params['points'] == [0.001, 0.002]
+
+
+def test_unknown_step_is_rejected():
+    with pytest.raises(ValueError):
+        PlanStep('anneal', {})
+
+
+def test_preparation_steps():
+    assert PlanStep('mode', {'mode_key': 'rt'}).is_preparation
+    assert not PlanStep('sweep', {'points': []}).is_preparation
+
+
+def test_describe_counts_points():
+    assert PlanStep('sweep', {'points': [1, 2, 3], 'wait_time': 5}).describe() == 'sweep(wait_time=5, 3 points)'
+
+
+def test_temperature_series():
+    plan = MeasurementPlan.temperature_series([10, 20], [1e-3], rate=2, mode_key='fig2', harmonics=(2, 4))
+    assert [s.kind for s in plan] == ['set_temperature', 'wait_stable', 'mode', 'harmonic', 'sweep',
+                                      'set_temperature', 'wait_stable', 'sweep']
+    assert plan.steps[5].params == {'T': 20, 'rate': 2}
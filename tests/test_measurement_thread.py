@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from MeasurementThread import MeasurementThread
+from measurement_plan import MeasurementPlan, PlanStep
+from run_journal import RunJournal
+
+
+class FakeLogger:
+    ppms_session = None
+    telemetry = None
+
+    def close_journal(self):
+        pass
+
+
+def make_thread(**kwargs):
+    args = dict(gui=None, data_logger=FakeLogger(), host='127.0.0.1', port=5000, inst1=None, inst2=None,
+                my_instrument_current=None, amplitude_values=[1e-3, 2e-3], wait_time=10,
+                temperature_changing=False, temp_list=[], rate=2.0, current_dc_val=1e-6)
+    args.update(kwargs)
+    return MeasurementThread(**args)
+
+
+def test_temperature_list_runs_as_plan(monkeypatch):
+    thread = make_thread(temperature_changing=True, temp_list=[10.0, 20.0])
+    executed = []
+    monkeypatch.setattr(thread, '_prepare_lockins', lambda: None)
+    monkeypatch.setattr(thread, '_restore_lockins', lambda: None)
+    monkeypatch.setattr(thread, '_run_step', lambda step: executed.append((step.kind, dict(step.params))))
+    thread.run()
+    assert [kind for kind, params in executed] == ['set_temperature', 'wait_stable', 'sweep'] * 2
+    assert executed[0][1] == {'T': 10.0, 'rate': 2.0}
+    assert executed[2][1]['points'] == [1e-3, 2e-3]
+
+
+def resumed_thread(done):
+    return make_thread(resume={'done': [RunJournal.step_key(T, a) for T, a in done]})
+
+
+def test_completed_setpoints_without_journal():
+    plan = MeasurementPlan.temperature_series([10.0, 20.0], [1e-3, 2e-3], 2.0)
+    assert make_thread()._completed_setpoints(list(plan)) == set()
+
+
+def test_completed_setpoints_skips_only_fully_journaled_setpoints():
+    steps = list(MeasurementPlan.temperature_series([10.0, 20.0, 30.0], [1e-3, 2e-3], 2.0))
+    # 10 K finished, 20 K interrupted after its first amplitude, 30 K never started
+    thread = resumed_thread([(10.0, 1e-3), (10.0, 2e-3), (20.0, 1e-3)])
+    skip = thread._completed_setpoints(steps)
+    assert sorted(steps[i].kind for i in skip) == ['set_temperature', 'wait_stable']
+    assert {steps[i].params['T'] for i in skip} == {10.0}
+
+
+def test_completed_setpoints_needs_every_sweep_of_the_setpoint():
+    steps = [PlanStep('set_temperature', {'T': 10.0}), PlanStep('wait_stable', {'T': 10.0}),
+             PlanStep('sweep', {'points': [1e-3]}), PlanStep('harmonic', {'lock1': 2}),
+             PlanStep('sweep', {'points': [1e-3, 3e-3]})]
+    thread = resumed_thread([(10.0, 1e-3)])
+    assert thread._completed_setpoints(steps) == set()
+    thread.completed.add(RunJournal.step_key(10.0, 3e-3))
+    assert thread._completed_setpoints(steps) == {0, 1}
+
+
+def test_completed_setpoints_never_skips_ramps_or_empty_setpoints():
+    steps = [PlanStep('set_temperature', {'T': 10.0}), PlanStep('wait_stable', {'T': 10.0}),
+             PlanStep('set_temperature', {'T': 20.0}), PlanStep('sweep', {'points': [1e-3]}),
+             PlanStep('rt_ramp', {'end': 30.0, 'rate': 1.0, 'interval': 5.0})]
+    thread = resumed_thread([(10.0, 1e-3), (20.0, 1e-3)])
+    assert thread._completed_setpoints(steps) == set()
@@ -0,0 +1,47 @@
+import pytest
+
+from ppms_telemetry import PPMSTelemetry
+
+
+def make_telemetry(rows=(), capacity=16):
+    telemetry = PPMSTelemetry(session=None, capacity=capacity)   # buffer only, the thread is never started
+    for t, T, F in rows:
+        telemetry._push((t, T, 0, F, 0))
+    return telemetry
+
+
+def test_empty_buffer():
+    telemetry = make_telemetry()
+    assert telemetry.latest() is None
+    assert telemetry.interpolate(1.0) is None
+    assert telemetry.interpolate(1.0, max_gap=10.0) is None
+    assert telemetry.wait_until(0.0, timeout=0) is False
+
+
+def test_interpolates_between_samples():
+    telemetry = make_telemetry([(10.0, 2.0, 0.0), (12.0, 4.0, 100.0)])
+    assert telemetry.interpolate(11.0) == pytest.approx((3.0, 50.0))
+    assert telemetry.interpolate(11.5, max_gap=0.5) == pytest.approx((3.5, 75.0))
+
+
+def test_outside_range_clamps_without_max_gap():
+    telemetry = make_telemetry([(10.0, 2.0, 0.0), (12.0, 4.0, 100.0)])
+    assert telemetry.interpolate(5.0) == (2.0, 0.0)
+    assert telemetry.interpolate(1000.0) == (4.0, 100.0)
+
+
+def test_max_gap_rejects_stale_endpoints():
+    telemetry = make_telemetry([(10.0, 2.0, 0.0), (12.0, 4.0, 100.0)])
+    assert telemetry.interpolate(12.5, max_gap=1.0) == (4.0, 100.0)   # within the gap: clamped
+    assert telemetry.interpolate(9.5, max_gap=1.0) == (2.0, 0.0)
+    assert telemetry.interpolate(13.5, max_gap=1.0) is None           # telemetry stopped updating
+    assert telemetry.interpolate(8.5, max_gap=1.0) is None            # older than the buffer
+
+
+def test_ring_buffer_wraps_in_time_order():
+    telemetry = make_telemetry([(float(t), float(t), 0.0) for t in range(10)], capacity=4)
+    assert list(telemetry.snapshot()[:, 0]) == [6.0, 7.0, 8.0, 9.0]
+    assert telemetry.latest()[0] == 9.0
+    assert telemetry.interpolate(7.5) == pytest.approx((7.5, 0.0))
+    assert telemetry.interpolate(2.0, max_gap=1.0) is None            # overwritten samples are gone
+    assert telemetry.wait_until(9.0, timeout=0) is True
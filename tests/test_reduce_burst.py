@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from measurement_data_logger import DataLogger
+
+
+def test_mean_std_and_slope_per_channel():
+    t = np.linspace(0.0, 1.0, 50)
+    values = np.vstack([np.full(50, 2.0), 1.0 + 3.0 * t])
+    mean, std, slope = DataLogger.reduce_burst(t, values)
+    np.testing.assert_allclose(mean, [2.0, 2.5])
+    assert std[0] == 0.0 and std[1] == pytest.approx(np.std(3.0 * t, ddof=1))
+    np.testing.assert_allclose(slope, [0.0, 3.0], atol=1e-12)
+
+
+def test_spike_moves_mean_and_std_but_not_the_others():
+    t = np.linspace(0.0, 1.0, 101)
+    values = np.zeros((2, 101))
+    values[0, 50] = 101.0      # a single glitch in the middle of channel 0
+    mean, std, slope = DataLogger.reduce_burst(t, values)
+    assert mean[0] == pytest.approx(1.0) and std[0] > 9.0
+    assert slope[0] == pytest.approx(0.0, abs=1e-9)   # symmetric about the centre: no false drift
+    assert mean[1] == std[1] == slope[1] == 0.0
+
+
+def test_single_and_empty_bursts():
+    mean, std, slope = DataLogger.reduce_burst(np.array([0.0]), np.array([[4.0], [5.0]]))
+    np.testing.assert_array_equal(mean, [4.0, 5.0])
+    np.testing.assert_array_equal(std, [0.0, 0.0])
+    np.testing.assert_array_equal(slope, [0.0, 0.0])
+    with np.errstate(all='raise'):
+        mean, std, slope = DataLogger.reduce_burst(np.array([]), np.empty((2, 0)))
+    assert np.isnan(mean).all() and np.isnan(std).all() and np.isnan(slope).all()
@@ -0,0 +1,52 @@
+import json
+import os
+
+import numpy as np
+
+from run_binary import BinaryRun, BinaryRunWriter
+
+
+def test_round_trip_across_chunks(tmp_path):
+    base = str(tmp_path / 'run')
+    writer = BinaryRunWriter(base, ['T', 'V'], config={'rate': 2}, rows_per_chunk=3)
+    for i in range(5):
+        writer.write_row({'T': float(i), 'V': i * 1e-6})
+    writer.write_row(np.array([[5.0, 5e-6], [6.0, 6e-6]]))
+    writer.close()
+
+    run = BinaryRun(base)
+    assert len(run) == 7
+    assert len(run.meta['chunks']) == 3
+    np.testing.assert_array_equal(run['T'], np.arange(7.0))
+    assert run.config == {'rate': 2}
+    assert run.meta['rows'] == 7
+
+
+def test_missing_columns_are_nan(tmp_path):
+    writer = BinaryRunWriter(str(tmp_path / 'run'), ['T', 'V'])
+    writer.write_row({'T': 1.0})
+    writer.close()
+    run = BinaryRun(str(tmp_path / 'run.json'))
+    assert np.isnan(run['V'][0])
+
+
+def test_partial_row_is_ignored(tmp_path):
+    # A crash mid-write leaves a half row; the reader maps complete rows only
+    writer = BinaryRunWriter(str(tmp_path / 'run'), ['T', 'V'])
+    writer.write_row({'T': 1.0, 'V': 2.0})
+    writer.flush()
+    chunk = tmp_path / json.load(open(writer.path))['chunks'][0]
+    with open(chunk, 'ab') as f:
+        f.write(np.float64(3.0).tobytes())
+    run = BinaryRun(writer.path)
+    assert len(run) == 1
+    writer.close()
+
+
+def test_empty_run(tmp_path):
+    writer = BinaryRunWriter(str(tmp_path / 'run'), ['T'])
+    writer.open()
+    writer.close()
+    run = BinaryRun(writer.path)
+    assert len(run) == 0 and len(run['T']) == 0
+    assert os.path.exists(writer.path)
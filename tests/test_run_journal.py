@@ -0,0 +1,56 @@
+import json
+
+from run_journal import RunJournal, lockin_state
+
+
+def _write_journal(tmp_path):
+    run_file = str(tmp_path / 'measurement_data_10.0K.txt')
+    journal = RunJournal(run_file, {'sweep': {'points': [1e-3, 2e-3]}})
+    for amplitude in (1e-3, 2e-3):
+        journal.write_row(RunJournal.point_record(run_file, 10.0, amplitude, 0, [{'harmonic': 2}]))
+    journal.close()
+    return run_file, journal.path
+
+
+def test_load_completed_steps(tmp_path):
+    run_file, path = _write_journal(tmp_path)
+    assert path.endswith('measurement_data_10.0K.journal')
+    info = RunJournal.load(path)
+    assert info['run_file'] == run_file
+    assert info['config'] == {'sweep': {'points': [1e-3, 2e-3]}}
+    assert info['done'] == {RunJournal.step_key(10.0, 1e-3), RunJournal.step_key(10.0, 2e-3)}
+    assert info['points'] == 2
+    assert info['lockins'] == [{'harmonic': 2}]
+
+
+def test_load_from_run_file_path(tmp_path):
+    run_file, path = _write_journal(tmp_path)
+    assert RunJournal.load(run_file)['path'] == path
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    run_file, path = _write_journal(tmp_path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "point", "run_file": "x.txt", "T_se')
+    assert RunJournal.load(path)['points'] == 2
+
+
+def test_reopen_appends_without_second_start(tmp_path):
+    run_file, path = _write_journal(tmp_path)
+    journal = RunJournal(run_file, path=path)
+    journal.write_row(RunJournal.point_record(run_file, None, 3e-3, 2, []))
+    journal.close()
+    events = [json.loads(line)['event'] for line in open(path, encoding='utf-8')]
+    assert events == ['start', 'point', 'point', 'point']
+    assert RunJournal.step_key(None, 3e-3) in RunJournal.load(path)['done']
+
+
+def test_step_key_normalizes_numbers():
+    assert RunJournal.step_key(10, 1) == RunJournal.step_key(10.0, 1.0) == (10.0, 1.0)
+
+
+def test_lockin_state_reads_sen_from_row():
+    class Lockin:
+        harmonic, dual_harmonics, acgain = 2, (1, 2), 5
+    state = lockin_state(Lockin(), {'L1_SEN1': 21.0, 'L1_SEN2': float('nan')}, 'L1_')
+    assert state == {'harmonic': 2, 'dual_harmonics': (1, 2), 'acgain': 5, 'sen1': 21, 'sen2': None}
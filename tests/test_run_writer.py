@@ -0,0 +1,76 @@
+import math
+import os
+
+import pytest
+
+from run_writer import AsyncRowWriter, RunFileWriter
+
+
+def _lines(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def test_header_once_and_blank_nan(tmp_path):
+    path = str(tmp_path / 'run.txt')
+    writer = RunFileWriter(path, ['T', 'V'])
+    writer.write_row({'T': 10.0, 'V': 1e-06})
+    writer.write_row({'T': 11.0, 'V': math.nan})
+    writer.write_row({'T': 12.0})
+    writer.close()
+    assert _lines(path) == ['T\tV', '10.0\t1e-06', '11.0\t', '12.0\t']
+
+
+def test_readable_by_pandas(tmp_path):
+    pd = pytest.importorskip('pandas')
+    path = str(tmp_path / 'run.txt')
+    writer = RunFileWriter(path, ['T', 'V'])
+    writer.write_row({'T': 10.0, 'V': 1e-06})
+    writer.close()
+    frame = pd.read_csv(path, sep='\t')
+    assert list(frame.columns) == ['T', 'V'] and frame['V'][0] == 1e-06
+
+
+def test_existing_file_is_never_appended_to(tmp_path):
+    path = tmp_path / 'run.txt'
+    path.write_text('T\n1.0\n', encoding='utf-8')
+    with pytest.raises(FileExistsError):
+        RunFileWriter(str(path), ['T']).open()
+    assert path.read_text(encoding='utf-8') == 'T\n1.0\n'
+
+
+def test_resume_appends_without_header(tmp_path):
+    path = tmp_path / 'run.txt'
+    path.write_text('T\n1.0\n', encoding='utf-8')
+    writer = RunFileWriter(str(path), ['T'], resume=True)
+    writer.write_row({'T': 2.0})
+    writer.close()
+    assert _lines(path) == ['T', '1.0', '2.0']
+
+
+def test_resume_of_missing_file_writes_header(tmp_path):
+    path = str(tmp_path / 'run.txt')
+    writer = RunFileWriter(path, ['T'], resume=True)
+    writer.write_row({'T': 2.0})
+    writer.close()
+    assert _lines(path) == ['T', '2.0']
+
+
+def test_async_writer_order_and_sync(tmp_path):
+    path = str(tmp_path / 'run.txt')
+    writer = RunFileWriter(path, ['T'], flush_every=0)
+    synced = []
+    writer.sync = lambda: synced.append(writer.rows_written)
+    queue = AsyncRowWriter(maxsize=4)
+    queue.start()
+    for T in range(10):
+        queue.submit(writer, {'T': float(T)})
+    queue.submit(writer, AsyncRowWriter.SYNC)
+    queue.submit(writer, None)
+    queue.drain()
+    queue.stop()
+    assert synced == [10]
+    assert _lines(path)[1:] == [f'{float(T)}' for T in range(10)]
+    stats = queue.stats()
+    assert stats['written'] == 10 and stats['errors'] == 0 and stats['depth'] == 0
+    assert os.path.exists(path)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from lockin7270_controller import InstrumentLockin7270, LockinReading, SensitivityPredictor
+
+
+def reading(magnitude, sensitivity=12, overload=False):
+    return LockinReading(magnitude, 0.0, magnitude, 0.0, sensitivity, overload)
+
+
+def test_predictor_extrapolates_power_law():
+    predictor = SensitivityPredictor(exponent=2)
+    predictor.update(1e-3, reading(2e-6))
+    predictor.update(2e-3, reading(8e-6))
+    assert predictor.predict(4e-3) == pytest.approx(32e-6)
+
+
+def test_predictor_median_rejects_one_outlier():
+    predictor = SensitivityPredictor(exponent=2, history=3)
+    predictor.update(1e-3, reading(2e-6))
+    predictor.update(2e-3, reading(5e-3))      # glitch, 600x off
+    predictor.update(3e-3, reading(18e-6))
+    assert predictor.predict(4e-3) == pytest.approx(32e-6)
+
+
+def test_predictor_ignores_overloaded_and_invalid_readings():
+    predictor = SensitivityPredictor(exponent=2)
+    assert predictor.predict(1e-3) is None
+    predictor.update(1e-3, reading(1.0, sensitivity=27, overload=True))   # clipped at full scale
+    predictor.update(1e-3, reading(np.nan))
+    predictor.update(0.0, reading(1e-6))
+    predictor.update(1e-3, reading(0.0))
+    assert predictor.predict(1e-3) is None
+    assert predictor.sensitivity == 12           # the range is still tracked
+    predictor.update(1e-3, reading(2e-6))
+    assert predictor.predict(0.0) is None
+    predictor.reset()
+    assert predictor.predict(1e-3) is None
+
+
+def test_predictor_keeps_recent_history():
+    predictor = SensitivityPredictor(exponent=1, history=2)
+    for current, magnitude in ((1.0, 100.0), (1.0, 1.0), (1.0, 1.0)):
+        predictor.update(current, reading(magnitude))
+    assert predictor.predict(2.0) == pytest.approx(2.0)
+
+
+@pytest.fixture
+def lockin():
+    return InstrumentLockin7270.__new__(InstrumentLockin7270)   # range logic only, no connection
+
+
+def test_best_sensitivity_key_edges(lockin):
+    scale = InstrumentLockin7270.SENSITIVITY_SCALE
+    assert lockin.best_sensitivity_key(0.0) == min(scale)
+    assert lockin.best_sensitivity_key(0.9 * scale[12]) == 12
+    assert lockin.best_sensitivity_key(0.91 * scale[12]) == 13
+    assert lockin.best_sensitivity_key(5.0) == max(scale)         # beyond the largest range
+    assert lockin.best_sensitivity_key(np.nan) == max(scale)      # unknown: safest range
+
+
+def test_sensitivity_ok_edges(lockin):
+    fs = InstrumentLockin7270.SENSITIVITY_SCALE[12]
+    assert lockin.sensitivity_ok(reading(0.5 * fs))
+    assert not lockin.sensitivity_ok(reading(0.5 * fs, overload=True))
+    assert not lockin.sensitivity_ok(reading(0.95 * fs))
+    assert not lockin.sensitivity_ok(reading(0.05 * fs))
+    assert lockin.sensitivity_ok(reading(1e-12, sensitivity=1))  # already on the smallest range
+    assert not lockin.sensitivity_ok(reading(1e-6, sensitivity=99))  # unknown range code
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+
+import temperature_stabilizer
+from temperature_stabilizer import StabilityCriterion, temperature_reader, wait_until_stable
+
+
+def test_no_samples():
+    assert StabilityCriterion(10.0, 0.02, 60).evaluate([], []) == (False, 0.0, None, 0.0)
+
+
+def test_stable_after_full_window_in_band():
+    t = np.arange(0, 61.0)
+    stable, progress, eta, slope = StabilityCriterion(10.0, 0.02, 60).evaluate(t, np.full(t.size, 10.01))
+    assert stable and progress == 1.0 and eta == 0.0
+    assert slope == pytest.approx(0.0, abs=1e-12)
+
+
+def test_partial_window_reports_progress_and_eta():
+    t = np.arange(0, 31.0)
+    stable, progress, eta, slope = StabilityCriterion(10.0, 0.02, 60).evaluate(t, np.full(t.size, 10.0))
+    assert not stable
+    assert progress == pytest.approx(0.5)
+    assert eta == pytest.approx(30.0)
+
+
+def test_outlier_restarts_after_itself_only():
+    t = np.arange(0, 91.0)
+    T = np.full(t.size, 10.0)
+    T[40] = 10.5
+    stable, progress, eta, slope = StabilityCriterion(10.0, 0.02, 60).evaluate(t, T)
+    assert not stable
+    assert progress == pytest.approx(49 / 60)  # counted from the sample after the outlier
+    T[20] = 10.5                                # an outlier before the window does not matter
+    T[40] = 10.0
+    assert StabilityCriterion(10.0, 0.02, 60).evaluate(t, T)[0]
+
+
+def test_drift_within_band_is_not_stable():
+    t = np.arange(0, 61.0)
+    T = 9.985 + t * 0.0005   # stays within 0.02 K but drifts 0.03 K over the window
+    stable, progress, eta, slope = StabilityCriterion(10.0, 0.02, 60).evaluate(t, T)
+    assert not stable and progress == 1.0
+    assert eta is None
+    assert slope == pytest.approx(0.0005)
+
+
+def test_eta_while_approaching_and_receding():
+    criterion = StabilityCriterion(10.0, 0.02, 60)
+    t = np.arange(0, 11.0)
+    approaching = 9.0 + 0.01 * t        # 0.9 K to go at 0.01 K/s
+    stable, progress, eta, slope = criterion.evaluate(t, approaching)
+    assert progress == 0.0
+    assert eta == pytest.approx(0.9 / 0.01 + 60)
+    assert criterion.evaluate(t, 9.0 - 0.01 * t)[2] is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(temperature_stabilizer, 'time', clock)
+    return clock
+
+
+def test_wait_until_stable(clock):
+    readings = iter([12.0, 11.0, float('nan')] + [10.0] * 100)
+    progress = []
+    stable = wait_until_stable(StabilityCriterion(10.0, 0.02, 30), lambda: next(readings), interval=1.0,
+                               on_progress=lambda *args: progress.append(args))
+    assert stable
+    assert len(progress) == 2 + 31      # NaN readings are skipped
+    assert 30 <= clock.now <= 40
+
+
+def test_wait_until_stable_times_out_and_stops(clock):
+    assert not wait_until_stable(StabilityCriterion(10.0, 0.02, 30), lambda: 12.0, interval=1.0, timeout=60)
+    assert clock.now == pytest.approx(61.0)
+    assert not wait_until_stable(StabilityCriterion(10.0, 0.02, 30), lambda: 10.0, should_stop=lambda: True)
+
+
+class FakeSession:
+    def __init__(self, T):
+        self.T = T
+
+    def get_temperature(self):
+        return self.T, 'Stable'
+
+
+class FakeTelemetry:
+    interval = 1.0
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def is_alive(self):
+        return True
+
+    def latest(self):
+        return self.sample
+
+
+def test_reader_ignores_stale_telemetry(clock):
+    clock.now = 100.0
+    fresh = FakeTelemetry((99.0, 4.2, 0, 0.0, 0))
+    assert temperature_reader(FakeSession(5.0), fresh)() == 4.2
+    stale = FakeTelemetry((90.0, 4.2, 0, 0.0, 0))
+    assert temperature_reader(FakeSession(5.0), stale)() == 5.0
+    assert temperature_reader(FakeSession(5.0), FakeTelemetry(None))() == 5.0
@@ -0,0 +1,142 @@
+import pytest
+import pyvisa
+
+import visa_pool
+from visa_pool import VisaPool
+
+LOST = pyvisa.constants.StatusCode.error_connection_lost
+TIMEOUT = pyvisa.constants.StatusCode.error_timeout
+
+
+class FakeResource:
+    def __init__(self, name):
+        self.resource_name = name
+        self.timeout = 2000
+        self.dead = False
+        self.closed = False
+        self.written = []
+
+    def _check(self):
+        if self.dead:
+            raise pyvisa.errors.VisaIOError(LOST)
+
+    def write(self, cmd):
+        self._check()
+        self.written.append(cmd)
+
+    def read_raw(self, size=None):
+        self._check()
+        raise pyvisa.errors.VisaIOError(TIMEOUT)
+
+    def read_stb(self):
+        self._check()
+        return 0
+
+    def close(self):
+        self.closed = True
+
+
+class FakeResourceManager:
+    def __init__(self, backend=''):
+        self.backend = backend
+        self.opened = []
+
+    def open_resource(self, address, **options):
+        resource = FakeResource(address)
+        self.opened.append((resource, options))
+        return resource
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(visa_pool.pyvisa, 'ResourceManager', FakeResourceManager)
+    return VisaPool('default')
+
+
+def test_backend_names(monkeypatch):
+    assert VisaPool.resolve_backend('py') == '@py'
+    assert VisaPool.resolve_backend('sim') == '@sim'
+    assert VisaPool.resolve_backend('devices.yaml@sim') == 'devices.yaml@sim'
+    monkeypatch.setenv('VISA_BACKEND', 'py')
+    assert VisaPool.resolve_backend(None) == '@py'
+    monkeypatch.delenv('VISA_BACKEND')
+    assert VisaPool.resolve_backend(None) == ''
+
+
+def test_one_session_per_address(pool):
+    a = pool.open('GPIB0::5::INSTR')
+    assert pool.open('GPIB0::5::INSTR') is a
+    assert pool.open('GPIB0::6::INSTR') is not a
+    assert len(pool.resource_manager.opened) == 2
+
+
+def test_dead_session_reopened_on_reuse(pool):
+    session = pool.open('GPIB0::5::INSTR', read_termination='\n')
+    session.timeout = 1234
+    first = session.resource
+    first.dead = True
+    assert pool.open('GPIB0::5::INSTR') is session
+    assert session.resource is not first and first.closed
+    assert session.resource.timeout == 1234
+    assert pool.resource_manager.opened[-1][1] == {'read_termination': '\n'}
+
+
+def test_lost_connection_retries_write(pool):
+    session = pool.open('GPIB0::5::INSTR')
+    session.resource.dead = True
+    session.write('*RST')
+    assert session.resource.written == ['*RST']
+
+
+def test_lost_connection_on_read_reopens_and_raises(pool):
+    session = pool.open('GPIB0::5::INSTR')
+    first = session.resource
+    first.dead = True
+    with pytest.raises(pyvisa.errors.VisaIOError):
+        session.read_raw()
+    assert session.resource is not first
+
+
+def test_timeout_is_not_a_lost_connection(pool):
+    session = pool.open('GPIB0::5::INSTR')
+    first = session.resource
+    with pytest.raises(pyvisa.errors.VisaIOError):
+        session.read_raw()
+    assert session.resource is first
+
+
+def test_custom_probe(pool):
+    calls = []
+    pool.open('TCPIP0::10.0.0.1::50001::SOCKET', probe=calls.append)
+    assert pool.alive('TCPIP0::10.0.0.1::50001::SOCKET')
+    assert len(calls) == 1
+
+
+def test_check_all(pool):
+    a = pool.open('GPIB0::5::INSTR')
+    pool.open('GPIB0::6::INSTR')
+    a.resource.dead = True
+    assert pool.check_all() == {'GPIB0::5::INSTR': True, 'GPIB0::6::INSTR': True}
+
+
+def test_backend_change_closes_sessions(pool):
+    session = pool.open('GPIB0::5::INSTR')
+    pool.configure('py')
+    assert session.resource.closed
+    assert pool.resource_manager.backend == '@py'
+    assert pool.open('GPIB0::5::INSTR') is not session
+
+
+def test_simulated_backend():
+    pytest.importorskip('pyvisa_sim')
+    pool = VisaPool('sim')
+    options = {'read_termination': '\n', 'write_termination': '\r\n'}
+    session = pool.open('ASRL1::INSTR', probe=lambda r: r.query('?IDN'), **options)
+    assert session.query('?IDN').startswith('LSG')
+    pool.reopen('ASRL1::INSTR')
+    assert session.query('?IDN').startswith('LSG')
+    assert pool.check_all() == {'ASRL1::INSTR': True}
+    pool.close_all()
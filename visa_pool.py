@@ -0,0 +1,221 @@
+# 文件名: visa_pool.py
+import os
+import threading
+import time
+import pyvisa
+
+
+class PooledResource:
+    """
+    资源池交给驱动的 VISA 会话代理，用法与 pyvisa 资源相同 (inst.write / query / timeout ...)。
+
+    - 设置的属性 (timeout、read_termination 等) 会被记住，重开会话后自动恢复。
+    - 调用因连接断开而失败时，由资源池重开会话；幂等的调用 (write / query 等) 自动重试一次，
+      其余调用把异常抛给驱动，下一次调用使用新会话。
+    """
+    RETRYABLE = ('write', 'write_raw', 'query', 'read_stb', 'clear')
+
+    def __init__(self, pool, address, resource, probe=None):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, 'address', address)
+        object.__setattr__(self, 'resource', resource)
+        object.__setattr__(self, 'probe', probe)
+        object.__setattr__(self, '_attrs', {})
+
+    def __getattr__(self, name):
+        attr = getattr(self.resource, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            try:
+                return getattr(self.resource, name)(*args, **kwargs)
+            except Exception as e:
+                if not self._pool.connection_lost(e):
+                    raise
+                print(f"VISA session {self.address} lost ({e}), reopening...")
+                self._pool.reopen(self.address)
+                if name not in self.RETRYABLE:
+                    raise
+                return getattr(self.resource, name)(*args, **kwargs)
+        return call
+
+    def __setattr__(self, name, value):
+        self._attrs[name] = value
+        setattr(self.resource, name, value)
+
+    def _attach(self, resource):
+        object.__setattr__(self, 'resource', resource)
+        for name, value in self._attrs.items():
+            setattr(resource, name, value)
+
+
+class VisaPool:
+    """
+    进程内共享的 VISA 资源池：所有驱动共用一个 ResourceManager，按地址发放会话。
+
+    - 后端可配置: 'default' (系统 VISA 库)、'py' (pyvisa-py)、'sim' (pyvisa-sim)，
+      也可以直接给出 pyvisa 的后端字符串 (如 'devices.yaml@sim' 或 VISA 库路径)。
+      未指定时读取环境变量 VISA_BACKEND。
+    - 同一地址再次 open() 时先做一次廉价的存活检查，会话失效则只重开该会话，
+      ResourceManager 保持不变，重连只需几毫秒。
+    """
+    BACKENDS = {'default': '', 'ivi': '', 'py': '@py', 'sim': '@sim'}
+    ENV_VAR = 'VISA_BACKEND'
+    PROBE_TIMEOUT = 500  # 存活检查的超时 (ms)
+
+    def __init__(self, backend=None):
+        """
+        参数:
+            backend (str): 后端名称或 pyvisa 后端字符串，None 时读取环境变量 VISA_BACKEND。
+        """
+        self.backend = self.resolve_backend(backend)
+        self._rm = None
+        self._sessions = {}  # address -> PooledResource
+        self._options = {}   # address -> open_resource 参数
+        self._lock = threading.RLock()
+
+    @classmethod
+    def resolve_backend(cls, backend=None):
+        if not backend:
+            backend = os.environ.get(cls.ENV_VAR, 'default')
+        return cls.BACKENDS.get(backend, backend)
+
+    def configure(self, backend=None):
+        """切换后端；后端变化时关闭全部会话和 ResourceManager，下次 open() 时按新后端重开。"""
+        backend = self.resolve_backend(backend)
+        with self._lock:
+            if backend == self.backend:
+                return
+            self.close_all()
+            self.backend = backend
+
+    @property
+    def resource_manager(self):
+        with self._lock:
+            if self._rm is None:
+                print(f"Opening VISA resource manager (backend: {self.backend or 'default'})")
+                self._rm = pyvisa.ResourceManager(self.backend)
+            return self._rm
+
+    def open(self, address, probe=None, **options):
+        """
+        返回地址对应的会话 (PooledResource)；已有会话存活时直接复用，失效时重开。
+
+        参数:
+            address (str): VISA 资源地址。
+            probe (callable): 以底层 pyvisa 资源为参数的存活检查，失败时抛出异常；
+                              默认对 INSTR 资源做串行轮询，对 SOCKET 资源查询 *IDN?。
+            options: 传给 open_resource() 的参数。
+        """
+        with self._lock:
+            session = self._sessions.get(address)
+            if session is not None:
+                if probe is not None:
+                    object.__setattr__(session, 'probe', probe)
+                if not self.alive(address):
+                    self.reopen(address)
+                return session
+            self._options[address] = options
+            session = PooledResource(self, address, self.resource_manager.open_resource(address, **options), probe)
+            self._sessions[address] = session
+            return session
+
+    def alive(self, address):
+        """对已打开的会话做一次存活检查。"""
+        with self._lock:
+            session = self._sessions.get(address)
+            if session is None:
+                return False
+            resource = session.resource
+            previous = resource.timeout
+            try:
+                resource.timeout = self.PROBE_TIMEOUT
+                (session.probe or self.default_probe)(resource)
+                return True
+            except Exception as e:
+                print(f"VISA session {address} not responding: {e}")
+                return False
+            finally:
+                try:
+                    resource.timeout = previous
+                except Exception:
+                    pass
+
+    @staticmethod
+    def default_probe(resource):
+        if resource.resource_name.endswith('::SOCKET'):
+            resource.query('*IDN?')
+        else:
+            resource.read_stb()
+
+    def reopen(self, address):
+        """关闭并重新打开地址对应的会话；驱动持有的 PooledResource 不变。"""
+        with self._lock:
+            session = self._sessions[address]
+            try:
+                session.resource.close()
+            except Exception:
+                pass
+            start = time.perf_counter()
+            session._attach(self.resource_manager.open_resource(address, **self._options[address]))
+            print(f"Reopened VISA session {address} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def check_all(self):
+        """
+        检查所有会话，失效的重开。
+
+        返回:
+            dict: address -> 检查后是否可用。
+        """
+        status = {}
+        with self._lock:
+            for address in list(self._sessions):
+                if self.alive(address):
+                    status[address] = True
+                    continue
+                try:
+                    self.reopen(address)
+                    status[address] = self.alive(address)
+                except Exception as e:
+                    print(f"Error reopening VISA session {address}: {e}")
+                    status[address] = False
+        return status
+
+    def close(self, address):
+        with self._lock:
+            session = self._sessions.pop(address, None)
+            self._options.pop(address, None)
+            if session is not None:
+                try:
+                    session.resource.close()
+                except Exception as e:
+                    print(f"Error closing VISA session {address}: {e}")
+
+    def close_all(self):
+        with self._lock:
+            for address in list(self._sessions):
+                self.close(address)
+            if self._rm is not None:
+                try:
+                    self._rm.close()
+                except Exception as e:
+                    print(f"Error closing VISA resource manager: {e}")
+                self._rm = None
+
+    @staticmethod
+    def connection_lost(error):
+        """判断异常是否表示连接已断开 (超时等普通错误不算)。"""
+        if isinstance(error, (pyvisa.errors.InvalidSession, ConnectionError)):
+            return True
+        if isinstance(error, pyvisa.errors.VisaIOError):
+            return error.error_code in _LOST_CODES
+        return False
+
+
+_LOST_CODES = {getattr(pyvisa.constants.StatusCode, name) for name in
+               ('error_connection_lost', 'error_invalid_object', 'error_io', 'error_resource_not_found')
+               if hasattr(pyvisa.constants.StatusCode, name)}
+
+# 进程内默认的资源池，驱动未指定 pool 时使用
+pool = VisaPool()